@@ -48,9 +48,7 @@ def create_test_data():
     store = Store.objects.create(
         name='サンプルレストラン',
         opening_time=time(10, 0),
-        closing_time=time(22, 0),
-        preparation_minutes=30,
-        cleanup_minutes=30
+        closing_time=time(22, 0)
     )
     print(f"   ✓ 店舗作成: {store.name}")
     
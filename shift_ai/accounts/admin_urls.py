@@ -22,4 +22,7 @@ urlpatterns = [
     path('announcements/create/', admin_views.admin_announcement_create, name='announcement_create'),
     path('announcements/<int:announcement_id>/edit/', admin_views.admin_announcement_edit, name='announcement_edit'),
     path('announcements/<int:announcement_id>/delete/', admin_views.admin_announcement_delete, name='announcement_delete'),
+    
+    # 性能計測
+    path('api/performance/', admin_views.admin_performance_metrics, name='performance_metrics'),
 ]
@@ -9,6 +9,7 @@ from django.db import transaction
 from django.contrib.auth.models import User
 from .models import Store, Staff, StaffRequirement, Announcement
 from .forms import StoreForm, StaffForm, StaffRequirementForm, UserRegistrationForm, StaffRegistrationForm
+from shift_ai.instrumentation import registry as performance_registry
 
 
 def admin_required(view_func):
@@ -43,7 +44,8 @@ def admin_dashboard(request):
     
     # 今月のシフト状況を取得
     from datetime import datetime, date, timedelta
-    from shift.models import Shift
+    from django.db.models import Sum
+    from shift.models import DailyStoreStats
     
     today = date.today()
     month_start = today.replace(day=1)
@@ -52,18 +54,22 @@ def admin_dashboard(request):
     else:
         month_end = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
     
-    # 今月のシフト統計
-    monthly_shifts = Shift.objects.filter(
+    # 今月のシフト統計（日別集計テーブルを1クエリで合計）
+    monthly_stats = DailyStoreStats.objects.filter(
         store=store,
         date__range=[month_start, month_end]
+    ).aggregate(
+        total_shifts=Sum('shift_count'),
+        confirmed_shifts=Sum('confirmed_count'),
+        total_cost=Sum('confirmed_cost'),
     )
     
-    total_shifts = monthly_shifts.count()
-    confirmed_shifts = monthly_shifts.filter(is_confirmed=True).count()
+    total_shifts = monthly_stats['total_shifts'] or 0
+    confirmed_shifts = monthly_stats['confirmed_shifts'] or 0
     unconfirmed_shifts = total_shifts - confirmed_shifts
     
-    # 人件費計算
-    total_cost = sum(shift.wage_cost for shift in monthly_shifts.filter(is_confirmed=True))
+    # 人件費（確定シフト）
+    total_cost = monthly_stats['total_cost'] or 0
     
     # 確定率計算
     confirmation_rate = (confirmed_shifts / total_shifts * 100) if total_shifts > 0 else 0
@@ -404,3 +410,18 @@ def admin_announcement_delete(request, announcement_id):
         'announcement': announcement,
     }
     return render(request, 'admin/announcement_delete.html', context)
+
+
+@login_required
+@admin_required
+def admin_performance_metrics(request):
+    """ビューごとのクエリ数・処理時間の集計（直近サンプルのパーセンタイル）"""
+    if request.method == 'POST' and request.POST.get('reset'):
+        performance_registry.reset()
+        return JsonResponse({'success': True})
+    
+    return JsonResponse({
+        'success': True,
+        'sample_size': performance_registry.sample_size,
+        'views': performance_registry.summary(),
+    })
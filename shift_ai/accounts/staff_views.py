@@ -56,8 +56,8 @@ def staff_dashboard(request):
     confirmed_shifts = monthly_shifts.filter(is_confirmed=True)
     unconfirmed_shifts = monthly_shifts.filter(is_confirmed=False)
     
-    # 勤務時間集計
-    total_hours = sum(shift.duration_hours for shift in confirmed_shifts)
+    # 勤務時間集計（データベース側で1クエリ）
+    total_hours = confirmed_shifts.totals()['hours']
     
     # スキルレベルのパーセンテージ計算
     hall_skill_percentage = staff.hall_skill_level * 20
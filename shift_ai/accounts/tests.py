@@ -1,3 +1,65 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from accounts.models import Announcement, Staff, StaffRequirement, Store
+from shift.models import Shift
+from shift_ai.testing import QueryBudgetMixin
 
-# Create your tests here.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'accounts-tests'},
+    'calendar': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'accounts-tests-calendar'},
+}
+
+
+def create_staff(store, username, hourly_wage=1000, is_manager=False, **fields):
+    user = User.objects.create_user(
+        username=username, password='password', first_name='太郎', last_name=username
+    )
+    return Staff.objects.create(
+        user=user, store=store, hourly_wage=hourly_wage, is_manager=is_manager, **fields
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AccountsQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """ダッシュボード・スタッフ管理画面のクエリ数が予算内であること"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = Store.objects.create(name='テスト店舗', opening_time=time(10), closing_time=time(23))
+        cls.manager = create_staff(cls.store, 'manager', is_manager=True)
+        cls.staff = [create_staff(cls.store, f'staff{i}', hourly_wage=1000 + i * 50) for i in range(8)]
+        for day_of_week in range(7):
+            StaffRequirement.objects.create(
+                store=cls.store, day_of_week=day_of_week,
+                start_time=time(10), end_time=time(15), required_staff=2
+            )
+        month_start = date.today().replace(day=1)
+        Shift.objects.bulk_create([
+            Shift(store=cls.store, staff=member, date=month_start + timedelta(days=offset),
+                  start_time=time(10), end_time=time(15), is_confirmed=True)
+            for offset in range(28) for member in cls.staff[offset % 2::2]
+        ])
+        cls.announcements = [
+            Announcement.objects.create(store=cls.store, title=f'お知らせ{i}', content='内容', created_by=cls.manager)
+            for i in range(10)
+        ]
+
+    def test_admin_pages(self):
+        self.client.force_login(self.manager.user)
+        self.assertQueryBudgets(
+            prefixes=['admin_accounts'],
+            url_kwargs={
+                'admin_accounts:staff_detail': {'staff_id': self.staff[0].id},
+                'admin_accounts:announcement_edit': {'announcement_id': self.announcements[0].id},
+            },
+        )
+
+    def test_staff_pages(self):
+        self.client.force_login(self.staff[0].user)
+        self.assertQueryBudgets(
+            prefixes=['staff_accounts'],
+            url_kwargs={
+                'staff_accounts:announcement_detail': {'announcement_id': self.announcements[0].id},
+            },
+        )
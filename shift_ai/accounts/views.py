@@ -252,8 +252,6 @@ def register(request):
                     defaults={
                         'opening_time': '09:00',
                         'closing_time': '22:00',
-                        'preparation_minutes': 60,
-                        'cleanup_minutes': 60,
                     }
                 )
                 
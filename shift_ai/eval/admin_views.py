@@ -41,7 +41,7 @@ def admin_evaluation_input(request):
         return redirect('login')
     
     # 評価対象スタッフを取得
-    target_staff = Staff.objects.filter(store=store)
+    target_staff = Staff.objects.filter(store=store).select_related('user')
     
     # 評価期間の設定
     current_period = datetime.now().strftime('%Y-%m')
@@ -57,6 +57,8 @@ def admin_evaluation_input(request):
     evaluations = Evaluation.objects.filter(
         evaluator=staff,
         evaluation_period=period
+    ).select_related('staff__user').prefetch_related(
+        'scores__evaluation_item'
     ).order_by('staff__user__last_name')
     
     if request.method == 'POST':
@@ -183,7 +185,7 @@ def admin_attendance_records(request):
     attendance_records = AttendanceRecord.objects.filter(
         staff__store=store,
         date__range=[month_start, month_end]
-    ).order_by('-date', 'staff__user__last_name')
+    ).select_related('staff__user').order_by('-date', 'staff__user__last_name')
     
     # 統計情報を計算
     total_count = attendance_records.count()
@@ -1,3 +1,63 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import Staff, Store
+from eval.models import AttendanceRecord, Evaluation, EvaluationItem
+from shift_ai.testing import QueryBudgetMixin
 
-# Create your tests here.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'eval-tests'},
+    'calendar': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'eval-tests-calendar'},
+}
+
+
+def create_staff(store, username, is_manager=False):
+    user = User.objects.create_user(
+        username=username, password='password', first_name='太郎', last_name=username
+    )
+    return Staff.objects.create(user=user, store=store, hourly_wage=1000, is_manager=is_manager)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EvalQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """評価・勤怠画面のクエリ数が予算内であること"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = Store.objects.create(name='テスト店舗', opening_time=time(10), closing_time=time(23))
+        cls.manager = create_staff(cls.store, 'manager', is_manager=True)
+        cls.staff = [create_staff(cls.store, f'staff{i}') for i in range(8)]
+        cls.item = EvaluationItem.objects.create(store=cls.store, name='接客', max_score=10)
+        period = date.today().strftime('%Y-%m')
+        cls.evaluations = [
+            Evaluation.objects.create(
+                staff=member, evaluator=cls.manager, evaluation_period=period,
+                attendance_score=20, skill_score=30, teamwork_score=15, customer_service_score=8
+            )
+            for member in cls.staff
+        ]
+        cls.records = []
+        for offset in range(10):
+            work_date = date.today() - timedelta(days=offset + 1)
+            for member in cls.staff:
+                cls.records.append(AttendanceRecord.objects.create(
+                    staff=member, date=work_date,
+                    clock_in=timezone.make_aware(datetime.combine(work_date, time(10))),
+                    clock_out=timezone.make_aware(datetime.combine(work_date, time(15))),
+                ))
+
+    def test_admin_pages(self):
+        self.client.force_login(self.manager.user)
+        self.assertQueryBudgets(
+            prefixes=['admin_eval'],
+            url_kwargs={
+                'admin_eval:evaluation_detail': {'evaluation_id': self.evaluations[0].id},
+                'admin_eval:attendance_detail': {'record_id': self.records[0].id},
+                'admin_eval:evaluation_item_edit': {'item_id': self.item.id},
+            },
+        )
+
+    def test_staff_pages(self):
+        self.client.force_login(self.staff[0].user)
+        self.assertQueryBudgets(prefixes=['staff_eval'])
@@ -9,6 +9,10 @@ urlpatterns = [
     path('shift-calendar/', admin_views.admin_shift_calendar, name='shift_calendar'),
     path('submission-status/', admin_views.admin_shift_submission_status, name='submission_status'),
     path('generate-ai/', admin_views.admin_generate_ai_shifts, name='generate_ai_shifts'),
+    path('api/generation-jobs/', admin_views.admin_submit_generation_job, name='submit_generation_job'),
+    path('api/generation-jobs/<int:job_id>/', admin_views.admin_generation_job_status, name='generation_job_status'),
+    path('api/generation-jobs/<int:job_id>/cancel/', admin_views.admin_cancel_generation_job, name='cancel_generation_job'),
+    path('api/generate-parallel/', admin_views.admin_generate_parallel_api, name='generate_parallel_api'),
     path('shift/<int:shift_id>/', admin_views.admin_shift_detail, name='shift_detail'),
     path('shift/<int:shift_id>/delete/', admin_views.admin_delete_shift, name='delete_shift'),
     path('confirm-shifts/', admin_views.admin_confirm_shifts, name='confirm_shifts'),
@@ -16,9 +20,16 @@ urlpatterns = [
     path('staff-requests/', admin_views.admin_staff_shift_requests, name='staff_shift_requests'),
     path('shift-settings/', admin_views.admin_shift_settings, name='shift_settings'),
     path('api/submission-detail/<int:staff_id>/', admin_views.admin_submission_detail_api, name='submission_detail_api'),
+    path('api/submission-details/', admin_views.admin_submission_details_api, name='submission_details_api'),
     path('api/shift-detail-by-date/<str:shift_date>/', admin_views.admin_shift_detail_by_date, name='shift_detail_by_date'),
+    path('api/shift-gantt/', admin_views.admin_shift_gantt_api, name='shift_gantt_api'),
+    path('api/available-staff/', admin_views.admin_available_staff_api, name='available_staff_api'),
+    path('api/shift-feed/', admin_views.admin_shift_feed_api, name='shift_feed_api'),
     # チャット機能
     path('chat/', admin_views.admin_chat_list, name='chat_list'),
     path('chat/<int:room_id>/', admin_views.admin_chat_detail, name='chat_detail'),
+    path('chat/<int:room_id>/messages/', admin_views.admin_chat_messages_api, name='chat_messages_api'),
+    path('chat/<int:room_id>/send/', admin_views.admin_chat_send_api, name='chat_send_api'),
+    path('chat/<int:room_id>/stream/', admin_views.admin_chat_stream, name='chat_stream'),
     path('chat/create/<int:staff_id>/', admin_views.admin_chat_create, name='chat_create'),
 ]
@@ -2,31 +2,31 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Q
-from datetime import datetime, date, timedelta
+from django.db.models import Count, Max, Q
+from datetime import datetime, date, timedelta, timezone as dt_timezone
 import calendar
+import os
 import json
 from django.utils import timezone  # 追加
-from .models import Shift, ShiftRequest, ShiftSettings, ChatRoom, ChatMessage, ShiftSwapRequest
+from .models import Shift, ShiftRequest, ShiftSettings, ChatRoom, ChatMessage, ShiftSwapRequest, GenerationJob
 from .forms import ShiftSettingsForm, ChatMessageForm
-from .ai_shift_generator import AIShiftGenerator
+from .generation import ShiftConstraintError, generate_and_save_shifts
+from .jobs import cancel_job, submit_job
+from .solvers import get_solver
+from .time_grid import build_store_grid
+from .availability import AvailabilityIndex
+from .feeds import DEFAULT_FEED_DAYS, MAX_FEED_DAYS, build_shift_feed
+from .intervals import split_shifts
+from . import calendar_cache, chat, live
+from .rollups import stats_by_date, update_shifts
+from .tombstones import record_deleted_shifts
+from .utils import get_staff_name_japanese
 from accounts.models import Store, Staff
 
 
-def get_staff_name_japanese(user):
-    """日本語形式の名前を取得（姓 名の順）"""
-    if user.last_name and user.first_name:
-        return f"{user.last_name} {user.first_name}".strip()
-    elif user.last_name:
-        return user.last_name
-    elif user.first_name:
-        return user.first_name
-    else:
-        return user.username
-
-
 def admin_required(view_func):
     """管理者権限が必要なデコレータ"""
     def wrapper(request, *args, **kwargs):
@@ -95,43 +95,27 @@ def admin_shift_creation(request):
         selected_month_int = today.month
         period = 'all'
     
-    # 既存のシフトを取得
-    existing_shifts = Shift.objects.filter(
-        store=store,
-        date__range=[start_date_obj, end_date_obj]
-    ).select_related('staff', 'staff__user').order_by('date', 'start_time')
-    
-    # 日付ごとにシフトをグループ化
-    shifts_by_date = {}
-    for shift in existing_shifts:
-        shift_date = shift.date
-        if shift_date not in shifts_by_date:
-            shifts_by_date[shift_date] = []
-        shifts_by_date[shift_date].append(shift)
-    
-    # 日付ごとのスタッフ数を計算
+    # 日ごとの集計（日別集計テーブルから取得、人数・人件費は暦日ごとに按分した値）
     date_summary = []
-    for shift_date in sorted(shifts_by_date.keys()):
-        shifts_on_date = shifts_by_date[shift_date]
-        staff_count = len(set(shift.staff.id for shift in shifts_on_date))
-        confirmed_count = sum(1 for shift in shifts_on_date if shift.is_confirmed)
-        total_cost_on_date = sum(shift.wage_cost for shift in shifts_on_date if shift.is_confirmed)
-        
+    period_stats = stats_by_date(store, start_date_obj, end_date_obj).values()
+    for row in period_stats:
+        if not row.shift_count:
+            continue
         date_summary.append({
-            'date': shift_date,
-            'staff_count': staff_count,
-            'total_shifts': len(shifts_on_date),
-            'confirmed_shifts': confirmed_count,
-            'unconfirmed_shifts': len(shifts_on_date) - confirmed_count,
-            'total_cost': total_cost_on_date,
-            'shifts': shifts_on_date,
+            'date': row.date,
+            'staff_count': row.staff_count,
+            'total_shifts': row.shift_count,
+            'confirmed_shifts': row.confirmed_count,
+            'unconfirmed_shifts': row.pending_count,
+            'total_cost': row.confirmed_cost,
         })
     
-    # シフト統計を計算
-    total_shifts = existing_shifts.count()
-    confirmed_shifts = existing_shifts.filter(is_confirmed=True).count()
+    # シフト統計
+    total_shifts = sum(summary['total_shifts'] for summary in date_summary)
+    confirmed_shifts = sum(summary['confirmed_shifts'] for summary in date_summary)
     unconfirmed_shifts = total_shifts - confirmed_shifts
-    total_cost = sum(shift.wage_cost for shift in existing_shifts.filter(is_confirmed=True))
+    # 人件費は前日から続くシフトだけの日も含める（カレンダー・ダッシュボードと同じ合計）
+    total_cost = sum(row.confirmed_cost for row in period_stats)
     
     # 年と月の選択肢を準備
     current_year = today.year
@@ -155,7 +139,6 @@ def admin_shift_creation(request):
         'years': years,
         'months': months,
         'period_choices': period_choices,
-        'existing_shifts': existing_shifts,
         'date_summary': date_summary,
         'total_shifts': total_shifts,
         'confirmed_shifts': confirmed_shifts,
@@ -166,8 +149,90 @@ def admin_shift_creation(request):
     return render(request, 'admin/shift_creation.html', context)
 
 
+def build_gantt_days(store, start_date, end_date):
+    """
+    期間の日ごとのガントチャートデータ（シフトは1クエリ、日をまたぐシフトは各日の区間に分割）
+
+    Returns:
+        {'YYYY-MM-DD': {'date', 'date_display', 'shifts', 'coverage'}, ...}
+    """
+    # 期間内開始のシフトと、前日以前から続くシフト
+    shifts = list(Shift.objects.filter(
+        Q(date__range=[start_date - timedelta(days=1), end_date])
+        | Q(date__lt=start_date, end_date__gte=start_date),
+        store=store
+    ).select_related('staff', 'staff__user'))
+    shifts.sort(key=lambda s: (s.staff.user.last_name or s.staff.user.username, s.start_time))
+    
+    days = {}
+    for offset in range((end_date - start_date).days + 1):
+        target_date = start_date + timedelta(days=offset)
+        days[target_date] = {
+            'date': target_date.strftime('%Y-%m-%d'),
+            'date_display': target_date.strftime('%Y年%m月%d日'),
+            'shifts': [],
+        }
+    
+    # ガントチャート用のデータを準備（日をまたぐシフトは各日の部分を表示）
+    for segment in split_shifts(shifts, start_date, end_date):
+        shift = segment.shift
+        days[segment.date]['shifts'].append({
+            'staff_id': shift.staff_id,
+            'staff_name': get_staff_name_japanese(shift.staff.user),
+            'start_time': shift.start_time.strftime('%H:%M'),
+            'end_time': shift.end_time.strftime('%H:%M'),
+            'start_minutes': segment.start_minutes,
+            'end_minutes': segment.end_minutes,
+            'spans_midnight': False,  # 日ごとのガントチャートでは日をまたがない
+            'is_from_previous': segment.is_continuation,  # 前日から続くシフトの当日部分
+            'duration_hours': segment.shift_hours,
+            'is_confirmed': shift.is_confirmed,
+            'shift_id': shift.id,
+        })
+    
+    # 時間グリッド上の需要と供給（ガントチャートの充足表示用）
+    coverage = build_store_grid(store, start_date, end_date).coverage()
+    for target_date, day in days.items():
+        day['coverage'] = coverage.day_profile(target_date)
+    
+    return {day['date']: day for day in days.values()}
+
+
+def _gantt_range(request, shift_date=None):
+    """ガントチャートの (店舗ID, 開始日, 終了日)。不正な指定は None"""
+    try:
+        store_id = request.user.staff.store_id
+        if shift_date is not None:
+            start_date = end_date = datetime.strptime(shift_date, '%Y-%m-%d').date()
+        else:
+            start_date = datetime.strptime(request.GET.get('from', ''), '%Y-%m-%d').date()
+            if request.GET.get('to'):
+                end_date = datetime.strptime(request.GET['to'], '%Y-%m-%d').date()
+            else:
+                end_date = start_date + timedelta(days=DEFAULT_FEED_DAYS - 1)
+    except (AttributeError, Staff.DoesNotExist, ValueError):
+        return None
+    if start_date > end_date or (end_date - start_date).days >= MAX_FEED_DAYS:
+        return None
+    return store_id, start_date, end_date
+
+
+def _gantt_etag(request, shift_date=None):
+    gantt_range = _gantt_range(request, shift_date)
+    return calendar_cache.range_etag(*gantt_range) if gantt_range else None
+
+
+def _gantt_last_modified(request, shift_date=None):
+    gantt_range = _gantt_range(request, shift_date)
+    if gantt_range is None:
+        return None
+    return datetime.fromtimestamp(calendar_cache.range_last_modified(*gantt_range), tz=dt_timezone.utc)
+
+
 @login_required
 @admin_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_gantt_etag, last_modified_func=_gantt_last_modified)
 def admin_shift_detail_by_date(request, shift_date):
     """指定日のシフト詳細をJSONで返す（ガントチャート用）"""
     try:
@@ -181,91 +246,43 @@ def admin_shift_detail_by_date(request, shift_date):
     except ValueError:
         return JsonResponse({'error': '無効な日付形式です。'}, status=400)
     
-    # その日のシフトを取得
-    previous_date = target_date - timedelta(days=1)
-    next_date = target_date + timedelta(days=1)
-    
-    # 1. 当日開始のシフト（当日に開始して当日または翌日に終了）
-    shifts_today = Shift.objects.filter(
-        store=store,
-        date=target_date
-    ).select_related('staff', 'staff__user')
-    
-    # 2. 前日から続くシフトの当日部分（前日に開始して当日に終了するシフトの0時〜終了時刻）
-    shifts_from_previous = Shift.objects.filter(
-        store=store,
-        date=previous_date,
-        end_date=target_date
-    ).select_related('staff', 'staff__user')
-    
-    # 3. 当日開始で翌日に終了するシフトの前日部分（当日に開始して翌日に終了するシフトの開始時刻〜23時）
-    # これは前日のガントチャートで表示されるため、ここでは取得しない
-    
-    # シフトを結合
-    shifts = list(shifts_today) + list(shifts_from_previous)
-    shifts.sort(key=lambda s: (s.staff.user.last_name or s.staff.user.username, s.start_time))
+    days = build_gantt_days(store, target_date, target_date)
+    return JsonResponse(days[target_date.strftime('%Y-%m-%d')])
+
+
+@login_required
+@admin_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_gantt_etag, last_modified_func=_gantt_last_modified)
+def admin_shift_gantt_api(request):
+    """
+    期間の日ごとのガントチャートデータをまとめて返す
+    from（必須）〜to（省略時は from から1週間）。変更がなければ 304 を返すため、画面側で先読み・保持できる
+    """
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
     
-    # ガントチャート用のデータを準備
-    gantt_data = []
-    for shift in shifts:
-        start_hour, start_min = shift.start_time.hour, shift.start_time.minute
-        end_hour, end_min = shift.end_time.hour, shift.end_time.minute
-        
-        # シフトの開始日と終了日を取得
-        shift_start_date = shift.date
-        shift_end_date = shift.end_date if shift.end_date else shift.date
-        
-        # 日をまたぐかどうか
-        spans_midnight = shift_end_date > shift_start_date or (shift_end_date == shift_start_date and end_hour < start_hour)
-        
-        # 前日から続くシフトの場合、当日の部分（0時〜終了時刻）のみを表示
-        if spans_midnight and shift_start_date == previous_date:
-            # 前日から続くシフトの当日部分：0時〜終了時刻
-            gantt_data.append({
-                'staff_id': shift.staff.id,
-                'staff_name': get_staff_name_japanese(shift.staff.user),
-                'start_time': shift.start_time.strftime('%H:%M'),
-                'end_time': shift.end_time.strftime('%H:%M'),
-                'start_minutes': 0,  # 当日の0時から
-                'end_minutes': end_hour * 60 + end_min,  # 当日の終了時刻まで
-                'spans_midnight': False,  # 当日のガントチャートでは日をまたがない
-                'is_from_previous': True,  # 前日から続くシフトの当日部分
-                'duration_hours': shift.duration_hours,
-                'is_confirmed': shift.is_confirmed,
-                'shift_id': shift.id,
-            })
-        elif shift_start_date == target_date:
-            # 当日開始のシフト
-            start_minutes = start_hour * 60 + start_min
-            
-            # 日をまたぐ場合（当日中に開始して翌日に終了）
-            # 当日のガントチャートには開始時刻〜23時59分までしか表示しない
-            if spans_midnight:
-                # 当日の部分のみを表示（開始時刻〜23時59分）
-                end_minutes = 24 * 60  # 23時59分まで
-            else:
-                # 当日中に終了するシフト
-                end_minutes = end_hour * 60 + end_min
-            
-            gantt_data.append({
-                'staff_id': shift.staff.id,
-                'staff_name': get_staff_name_japanese(shift.staff.user),
-                'start_time': shift.start_time.strftime('%H:%M'),
-                'end_time': shift.end_time.strftime('%H:%M'),
-                'start_minutes': start_minutes,
-                'end_minutes': end_minutes,
-                'spans_midnight': False,  # 当日のガントチャートでは日をまたがない
-                'is_from_previous': False,
-                'duration_hours': shift.duration_hours,
-                'is_confirmed': shift.is_confirmed,
-                'shift_id': shift.id,
-            })
+    try:
+        start_date_obj = datetime.strptime(request.GET.get('from', ''), '%Y-%m-%d').date()
+        if request.GET.get('to'):
+            end_date_obj = datetime.strptime(request.GET['to'], '%Y-%m-%d').date()
+        else:
+            end_date_obj = start_date_obj + timedelta(days=DEFAULT_FEED_DAYS - 1)
+    except ValueError:
+        return JsonResponse({'error': '無効な日付形式です。'}, status=400)
+    if start_date_obj > end_date_obj:
+        return JsonResponse({'error': '開始日は終了日以前にしてください。'}, status=400)
+    if (end_date_obj - start_date_obj).days >= MAX_FEED_DAYS:
+        return JsonResponse({'error': f'期間は{MAX_FEED_DAYS}日以内で指定してください。'}, status=400)
     
     return JsonResponse({
-        'date': target_date.strftime('%Y-%m-%d'),
-        'date_display': target_date.strftime('%Y年%m月%d日'),
-        'shifts': gantt_data,
-    })
+        'from': start_date_obj.strftime('%Y-%m-%d'),
+        'to': end_date_obj.strftime('%Y-%m-%d'),
+        'days': build_gantt_days(store, start_date_obj, end_date_obj),
+    }, json_dumps_params={'ensure_ascii': False})
 
 
 @login_required
@@ -288,44 +305,149 @@ def admin_generate_ai_shifts(request):
         except ValueError:
             return JsonResponse({'error': '無効な日付形式です。'}, status=400)
         
-        # AIシフト生成
-        generator = AIShiftGenerator(store)
-        generated_shifts = generator.generate_shifts(start_date_obj, end_date_obj)
-        
-        # 制約チェック
-        errors = generator.validate_shift_constraints(generated_shifts)
-        if errors:
-            return JsonResponse({'error': 'シフト制約エラー', 'details': errors}, status=400)
-        
-        # シフトを保存
-        created_shifts = []
-        for shift_data in generated_shifts:
-            shift, created = Shift.objects.get_or_create(
-                store=shift_data['store'],
-                staff=shift_data['staff'],
-                date=shift_data['date'],
-                start_time=shift_data['start_time'],
-                defaults={
-                    'end_time': shift_data['end_time'],
-                    'is_confirmed': shift_data['is_confirmed']
-                }
-            )
-            if created:
-                created_shifts.append(shift)
-        
-        # 人件費計算
-        total_cost = generator.calculate_shift_cost(generated_shifts)
+        # AIシフト生成（ソルバーと制限時間は任意指定）
+        try:
+            time_limit = float(request.POST['time_limit']) if request.POST.get('time_limit') else None
+            solver = get_solver(request.POST.get('solver') or None, time_limit=time_limit)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        try:
+            result = generate_and_save_shifts(store, start_date_obj, end_date_obj, solver=solver)
+        except ShiftConstraintError as e:
+            return JsonResponse({'error': 'シフト制約エラー', 'details': e.details}, status=400)
         
-        return JsonResponse({
-            'success': True,
-            'created_count': len(created_shifts),
-            'total_cost': total_cost,
-            'message': f'{len(created_shifts)}件のシフトを生成しました。'
-        })
+        return JsonResponse({'success': True, **result})
     
     return JsonResponse({'error': '無効なリクエストです。'}, status=400)
 
 
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def admin_submit_generation_job(request):
+    """管理者用AIシフト生成ジョブの登録（バックグラウンドで実行）"""
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    try:
+        start_date_obj = datetime.strptime(request.POST.get('start_date', ''), '%Y-%m-%d').date()
+        end_date_obj = datetime.strptime(request.POST.get('end_date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': '無効な日付形式です。'}, status=400)
+    if start_date_obj > end_date_obj:
+        return JsonResponse({'error': '開始日は終了日以前にしてください。'}, status=400)
+    
+    # ソルバー名・制限時間は登録時に検証しておく
+    solver_name = request.POST.get('solver') or ''
+    try:
+        time_limit = float(request.POST['time_limit']) if request.POST.get('time_limit') else None
+        get_solver(solver_name or None, time_limit=time_limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    mode = request.POST.get('mode') or 'full'
+    if mode not in dict(GenerationJob.MODE_CHOICES):
+        return JsonResponse({'error': '無効な生成方法です。'}, status=400)
+    
+    job = submit_job(store, start_date_obj, end_date_obj, requested_by=staff,
+                     solver=solver_name, time_limit=time_limit, mode=mode)
+    return JsonResponse({'success': True, 'job': job.to_dict()})
+
+
+@login_required
+@admin_required
+def admin_generation_job_status(request, job_id):
+    """管理者用AIシフト生成ジョブの進捗取得"""
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    job = get_object_or_404(GenerationJob, id=job_id, store=store)
+    return JsonResponse({'success': True, 'job': job.to_dict()})
+
+
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def admin_cancel_generation_job(request, job_id):
+    """管理者用AIシフト生成ジョブのキャンセル"""
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    job = get_object_or_404(GenerationJob, id=job_id, store=store)
+    if job.is_finished:
+        return JsonResponse({'error': 'このジョブは既に終了しています。'}, status=400)
+    job = cancel_job(job)
+    return JsonResponse({'success': True, 'job': job.to_dict()})
+
+
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def admin_generate_parallel_api(request):
+    """
+    管理者用AIシフト並列生成ジョブの登録
+    自店舗の期間を週ごとに分割して並列に生成するジョブをキューに登録し、ワーカーで実行する
+    （スーパーユーザーは store_ids で複数店舗を指定可能、店舗ごとに1ジョブ）
+    """
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    try:
+        start_date_obj = datetime.strptime(request.POST.get('start_date', ''), '%Y-%m-%d').date()
+        end_date_obj = datetime.strptime(request.POST.get('end_date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': '無効な日付形式です。'}, status=400)
+    if start_date_obj > end_date_obj:
+        return JsonResponse({'error': '開始日は終了日以前にしてください。'}, status=400)
+    
+    stores = [store]
+    if request.user.is_superuser and request.POST.get('store_ids'):
+        try:
+            store_ids = {int(value) for value in request.POST['store_ids'].split(',')}
+        except ValueError:
+            return JsonResponse({'error': '無効な店舗IDです。'}, status=400)
+        stores = list(Store.objects.filter(id__in=store_ids).order_by('id'))
+        if len(stores) != len(store_ids):
+            return JsonResponse({'error': '存在しない店舗IDが含まれています。'}, status=400)
+    
+    solver_name = request.POST.get('solver') or ''
+    try:
+        time_limit = float(request.POST['time_limit']) if request.POST.get('time_limit') else None
+        get_solver(solver_name or None, time_limit=time_limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # ワーカー数は1以上の整数（CPU数を上限とする）
+    workers = None
+    if request.POST.get('workers'):
+        try:
+            workers = int(request.POST['workers'])
+        except ValueError:
+            workers = 0
+        if workers < 1:
+            return JsonResponse({'error': 'ワーカー数は1以上の整数で指定してください。'}, status=400)
+        workers = min(workers, os.cpu_count() or 1)
+    
+    jobs = [
+        submit_job(target_store, start_date_obj, end_date_obj, requested_by=staff,
+                   solver=solver_name, time_limit=time_limit, mode='parallel', workers=workers)
+        for target_store in stores
+    ]
+    return JsonResponse({'success': True, 'jobs': [job.to_dict() for job in jobs]})
+
+
 @login_required
 @admin_required
 def admin_shift_detail(request, shift_id):
@@ -339,6 +461,11 @@ def admin_shift_detail(request, shift_id):
     
     shift = get_object_or_404(Shift, id=shift_id, store=store)
     
+    # 編集対象のシフトを除いた空き状況インデックス
+    availability = AvailabilityIndex.load(
+        store, shift.date, shift.end_date or shift.date, exclude_shift_ids=[shift.id]
+    )
+    
     if request.method == 'POST':
         # シフト編集
         start_time = request.POST.get('start_time')
@@ -351,12 +478,110 @@ def admin_shift_detail(request, shift_id):
             shift.is_confirmed = is_confirmed
             shift.save()
             messages.success(request, "シフトを更新しました。")
+            if not availability.is_free(shift.staff_id, shift.date, shift.start_time, shift.end_time, shift.end_date):
+                messages.warning(request, "このスタッフには同じ時間帯に別のシフトがあります。")
         except ValueError:
             messages.error(request, "無効な時間形式です。")
         
         return redirect('admin_shift:shift_creation')
     
-    return render(request, 'admin/shift_detail.html', {'shift': shift})
+    # 同じ時間帯に空いているスタッフ（交代・追加の候補）
+    staff_by_id = Staff.objects.filter(store=store).select_related('user').in_bulk()
+    requested_ids = set(availability.requested_staff(shift.date, shift.start_time, shift.end_time, shift.end_date))
+    available_staff = [
+        {'staff': staff_by_id[staff_id], 'requested': staff_id in requested_ids}
+        for staff_id in availability.free_staff(shift.date, shift.start_time, shift.end_time, shift.end_date)
+        if staff_id != shift.staff_id and staff_id in staff_by_id
+    ]
+    available_staff.sort(key=lambda item: not item['requested'])
+    
+    context = {
+        'shift': shift,
+        'available_staff': available_staff,
+    }
+    
+    return render(request, 'admin/shift_detail.html', context)
+
+
+@login_required
+@admin_required
+def admin_available_staff_api(request):
+    """指定時間帯に空いているスタッフをJSONで返す（手動編集用）"""
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    try:
+        target_date = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+        start_time = datetime.strptime(request.GET.get('start_time', ''), '%H:%M').time()
+        end_time = datetime.strptime(request.GET.get('end_time', ''), '%H:%M').time()
+        exclude_shift_ids = [int(value) for value in request.GET.getlist('exclude_shift')]
+    except ValueError:
+        return JsonResponse({'error': '無効な日付・時刻形式です。'}, status=400)
+    
+    availability = AvailabilityIndex.load(
+        store, target_date, target_date + timedelta(days=1), exclude_shift_ids=exclude_shift_ids
+    )
+    free_ids = availability.free_staff(target_date, start_time, end_time)
+    requested_ids = set(availability.requested_staff(target_date, start_time, end_time))
+    staff_by_id = Staff.objects.filter(id__in=free_ids).select_related('user').in_bulk()
+    
+    return JsonResponse({
+        'date': target_date.strftime('%Y-%m-%d'),
+        'staff': [
+            {
+                'staff_id': staff_id,
+                'staff_name': get_staff_name_japanese(staff_by_id[staff_id].user),
+                'requested': staff_id in requested_ids,
+                'is_manager': staff_by_id[staff_id].is_manager,
+            }
+            for staff_id in free_ids if staff_id in staff_by_id
+        ],
+    })
+
+
+@login_required
+@admin_required
+def admin_shift_feed_api(request):
+    """
+    期間指定のシフトデータ（列指向JSON）
+    from（必須）〜to（省略時は from から1週間）、staff_id で絞り込み。prev_from / next_from で前後の週を読み込める
+    （スーパーユーザーは store_id で他店舗を指定可能）
+    """
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    try:
+        start_date_obj = datetime.strptime(request.GET.get('from', ''), '%Y-%m-%d').date()
+        if request.GET.get('to'):
+            end_date_obj = datetime.strptime(request.GET['to'], '%Y-%m-%d').date()
+        else:
+            end_date_obj = start_date_obj + timedelta(days=DEFAULT_FEED_DAYS - 1)
+    except ValueError:
+        return JsonResponse({'error': '無効な日付形式です。'}, status=400)
+    if start_date_obj > end_date_obj:
+        return JsonResponse({'error': '開始日は終了日以前にしてください。'}, status=400)
+    if (end_date_obj - start_date_obj).days >= MAX_FEED_DAYS:
+        return JsonResponse({'error': f'期間は{MAX_FEED_DAYS}日以内で指定してください。'}, status=400)
+    
+    try:
+        staff_id = int(request.GET['staff_id']) if request.GET.get('staff_id') else None
+        store_id = store.id
+        if request.user.is_superuser and request.GET.get('store_id'):
+            store_id = int(request.GET['store_id'])
+    except ValueError:
+        return JsonResponse({'error': '無効なIDです。'}, status=400)
+    
+    feed = build_shift_feed(store_id, start_date_obj, end_date_obj, staff_id=staff_id)
+    return JsonResponse(
+        {'store_id': store_id, **feed},
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
 
 
 @login_required
@@ -374,6 +599,7 @@ def admin_delete_shift(request, shift_id):
     
     if request.method == 'POST':
         shift.delete()
+        record_deleted_shifts(store.id, [shift])
         messages.success(request, "シフトを削除しました。")
     
     return redirect('admin_shift:shift_creation')
@@ -488,10 +714,10 @@ def admin_confirm_shifts(request):
             return JsonResponse({'error': 'シフトが選択されていません。'}, status=400)
         
         # シフトを確定
-        updated_count = Shift.objects.filter(
-            id__in=shift_ids,
-            store=store
-        ).update(is_confirmed=True)
+        updated_count = update_shifts(
+            Shift.objects.filter(id__in=shift_ids, store=store),
+            is_confirmed=True
+        )
         
         return JsonResponse({
             'success': True,
@@ -587,226 +813,155 @@ def admin_staff_shift_requests(request):
     return render(request, 'admin/staff_shift_requests.html', context)
 
 
-@login_required
-@admin_required
-def admin_shift_calendar(request):
-    """管理者用シフトカレンダー"""
-    try:
-        staff = request.user.staff
-        store = staff.store
-    except Staff.DoesNotExist:
-        messages.error(request, "スタッフ情報が見つかりません。")
-        return redirect('login')
-    
-    # 表示する月を取得（GETパラメータから、または今月）
+def _calendar_month(request):
+    """表示する月の (月初日, 月末日)（GETパラメータから、または今月）"""
     today = date.today()
     try:
         year = int(request.GET.get('year', today.year))
         month = int(request.GET.get('month', today.month))
         month_start = date(year, month, 1)
-        if month == 12:
-            month_end = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            month_end = date(year, month + 1, 1) - timedelta(days=1)
     except (ValueError, TypeError):
         month_start = today.replace(day=1)
-        if today.month == 12:
-            month_end = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            month_end = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-    
-    # シフトを取得（当月開始のシフト + 前月から続くシフトの当月部分）
+    _, last_day = calendar.monthrange(month_start.year, month_start.month)
+    return month_start, month_start.replace(day=last_day)
+
+
+def _calendar_etag(request):
+    """カレンダーのETag（フラッシュメッセージがある場合は条件付きGETにしない）"""
+    try:
+        store_id = request.user.staff.store_id
+    except (AttributeError, Staff.DoesNotExist):
+        return None
+    if len(messages.get_messages(request)):
+        return None
+    month_start, _ = _calendar_month(request)
+    return calendar_cache.etag(store_id, month_start, request.user.pk)
+
+
+def _calendar_last_modified(request):
+    if _calendar_etag(request) is None:
+        return None
+    month_start, _ = _calendar_month(request)
+    timestamp = calendar_cache.last_modified(request.user.staff.store_id, month_start)
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def _build_calendar_payload(store, month_start, month_end):
+    """カレンダーの表示データ（JSONはシリアライズ済みの文字列）"""
+    # シフトを取得（当月開始のシフト + 前月から続くシフト）
     shifts = Shift.objects.filter(
-        store=store,
-        date__range=[month_start, month_end]
+        Q(date__range=[month_start, month_end])
+        | Q(date=month_start - timedelta(days=1))
+        | Q(date__lt=month_start, end_date__gte=month_start),
+        store=store
     ).select_related('staff', 'staff__user').order_by('date', 'start_time')
     
-    # 前月から続くシフトの当月部分も取得
-    previous_month_end = month_start - timedelta(days=1)
-    shifts_from_previous = Shift.objects.filter(
-        store=store,
-        date__lte=previous_month_end,
-        end_date__gte=month_start
-    ).select_related('staff', 'staff__user')
-    
-    # 日付ごとにシフトをグループ化し、各日の従業員数と人件費を計算
-    shifts_by_date = {}
-    
-    # 当月開始のシフト
-    for shift in shifts:
-        shift_date = shift.date
-        shift_end_date = shift.end_date if shift.end_date else shift.date
-        start_hour = shift.start_time.hour
-        end_hour = shift.end_time.hour
-        start_min = shift.start_time.minute
-        end_min = shift.end_time.minute
-        
-        # 日をまたぐかどうか
-        spans_midnight = shift_end_date > shift_date or (shift_end_date == shift_date and end_hour < start_hour)
-        
-        if shift_date not in shifts_by_date:
-            shifts_by_date[shift_date] = {
-                'shifts': [],
-                'staff_ids': set(),
-                'total_cost': 0,
-            }
-        shifts_by_date[shift_date]['shifts'].append(shift)
-        shifts_by_date[shift_date]['staff_ids'].add(shift.staff.id)
-        
-        if shift.is_confirmed:
-            if spans_midnight:
-                # 日をまたぐ場合：当日の部分（開始時刻〜23時59分）の人件費を計算
-                start_datetime = datetime.combine(shift_date, shift.start_time)
-                end_datetime = datetime.combine(shift_date, datetime.max.time().replace(microsecond=0))  # 23:59:59
-                duration_hours = (end_datetime - start_datetime).total_seconds() / 3600
-                if duration_hours < 0:
-                    duration_hours += 24
-                daily_cost = duration_hours * shift.staff.hourly_wage
-                shifts_by_date[shift_date]['total_cost'] += daily_cost
-            else:
-                # 当日中に終了するシフト
-                shifts_by_date[shift_date]['total_cost'] += shift.wage_cost
-        
-        # 日をまたぐ場合、翌日の部分も追加
-        if spans_midnight and shift_end_date <= month_end:
-            if shift_end_date not in shifts_by_date:
-                shifts_by_date[shift_end_date] = {
-                    'shifts': [],
-                    'staff_ids': set(),
-                    'total_cost': 0,
-                }
-            # 翌日の部分としてシフトを追加（表示用）
-            shifts_by_date[shift_end_date]['shifts'].append(shift)
-            shifts_by_date[shift_end_date]['staff_ids'].add(shift.staff.id)
-            if shift.is_confirmed:
-                # 翌日の部分（0時〜終了時刻）の人件費を計算
-                start_datetime = datetime.combine(shift_end_date, datetime.min.time())  # 0時
-                end_datetime = datetime.combine(shift_end_date, shift.end_time)
-                duration_hours = (end_datetime - start_datetime).total_seconds() / 3600
-                if duration_hours < 0:
-                    duration_hours += 24
-                daily_cost = duration_hours * shift.staff.hourly_wage
-                shifts_by_date[shift_end_date]['total_cost'] += daily_cost
-    
-    # 前月から続くシフトの当月部分
-    for shift in shifts_from_previous:
-        shift_start_date = shift.date
-        shift_end_date = shift.end_date if shift.end_date else shift.date
-        
-        # 前日部分が当月内の場合
-        if month_start <= shift_start_date <= month_end:
-            if shift_start_date not in shifts_by_date:
-                shifts_by_date[shift_start_date] = {
-                    'shifts': [],
-                    'staff_ids': set(),
-                    'total_cost': 0,
-                }
-            shifts_by_date[shift_start_date]['shifts'].append(shift)
-            shifts_by_date[shift_start_date]['staff_ids'].add(shift.staff.id)
-            if shift.is_confirmed:
-                # 前日の部分（開始時刻〜23時59分）の人件費を計算
-                start_datetime = datetime.combine(shift_start_date, shift.start_time)
-                end_datetime = datetime.combine(shift_start_date, datetime.max.time().replace(microsecond=0))  # 23:59:59
-                duration_hours = (end_datetime - start_datetime).total_seconds() / 3600
-                if duration_hours < 0:
-                    duration_hours += 24
-                daily_cost = duration_hours * shift.staff.hourly_wage
-                shifts_by_date[shift_start_date]['total_cost'] += daily_cost
-        
-        # 当日部分が当月内の場合
-        if shift_end_date and month_start <= shift_end_date <= month_end:
-            if shift_end_date not in shifts_by_date:
-                shifts_by_date[shift_end_date] = {
-                    'shifts': [],
-                    'staff_ids': set(),
-                    'total_cost': 0,
-                }
-            # 前月から続くシフトの当日部分として追加
-            shifts_by_date[shift_end_date]['shifts'].append(shift)
-            shifts_by_date[shift_end_date]['staff_ids'].add(shift.staff.id)
-            if shift.is_confirmed:
-                # 当日部分（0時〜終了時刻）の人件費を計算
-                end_datetime = datetime.combine(shift_end_date, shift.end_time)
-                start_datetime = datetime.combine(shift_end_date, datetime.min.time())  # 当日の0時
-                duration_hours = (end_datetime - start_datetime).total_seconds() / 3600
-                if duration_hours < 0:
-                    duration_hours += 24
-                daily_cost = duration_hours * shift.staff.hourly_wage
-                shifts_by_date[shift_end_date]['total_cost'] += daily_cost
-    
-    # 前月から続くシフトも含めてJSON形式で準備
-    all_shifts_for_json = list(shifts) + list(shifts_from_previous)
-    
-    # シフトデータをJSON形式で準備（日をまたぐシフトは両方の日に含める）
-    shifts_json = []
-    for shift in all_shifts_for_json:
-        shift_date = shift.date
-        shift_end_date = shift.end_date if shift.end_date else shift.date
-        start_hour = shift.start_time.hour
-        end_hour = shift.end_time.hour
-        
-        # 日をまたぐかどうか
-        spans_midnight = shift_end_date > shift_date or (shift_end_date == shift_date and end_hour < start_hour)
-        
-        # 開始日のシフトデータ
-        if month_start <= shift_date <= month_end:
-            shifts_json.append({
-                'id': shift.id,
-                'date': shift_date.strftime('%Y-%m-%d'),
-                'start_time': shift.start_time.strftime('%H:%M'),
-                'end_time': shift.end_time.strftime('%H:%M'),
-                'staff_id': shift.staff.id,
-                'staff_name': get_staff_name_japanese(shift.staff.user),
-                'is_confirmed': shift.is_confirmed,
-                'wage_cost': shift.wage_cost,
-                'spans_midnight': spans_midnight,
-            })
-        
-        # 日をまたぐ場合、終了日のシフトデータも追加
-        if spans_midnight and month_start <= shift_end_date <= month_end:
-            shifts_json.append({
-                'id': shift.id,
-                'date': shift_end_date.strftime('%Y-%m-%d'),
-                'start_time': shift.start_time.strftime('%H:%M'),
-                'end_time': shift.end_time.strftime('%H:%M'),
-                'staff_id': shift.staff.id,
-                'staff_name': get_staff_name_japanese(shift.staff.user),
-                'is_confirmed': shift.is_confirmed,
-                'wage_cost': shift.wage_cost,
-                'spans_midnight': spans_midnight,
-                'is_continuation': True,  # 前日から続くシフトの当日部分であることを示す
-            })
-    
-    # 日付ごとの統計情報を準備
+    # 日ごとの人数・確定人件費と月の統計は日別集計テーブルから取得
+    # （日をまたぐシフトは両方の日に含め、人件費は各日の時間で按分する）
     date_stats = {}
-    for shift_date, data in shifts_by_date.items():
-        date_stats[shift_date.strftime('%Y-%m-%d')] = {
-            'staff_count': len(data['staff_ids']),
-            'total_cost': data['total_cost'],
+    total_shifts = 0
+    confirmed_shifts = 0
+    total_cost = 0
+    for row in stats_by_date(store, month_start, month_end).values():
+        date_stats[row.date.strftime('%Y-%m-%d')] = {
+            'staff_count': row.staff_count,
+            'total_cost': row.confirmed_cost,
         }
+        total_shifts += row.shift_count
+        confirmed_shifts += row.confirmed_count
+        total_cost += row.confirmed_cost
     
-    # 統計情報を計算
-    total_shifts = shifts.count()
-    confirmed_shifts = shifts.filter(is_confirmed=True).count()
-    pending_shifts = total_shifts - confirmed_shifts
-    total_cost = sum(shift.wage_cost for shift in shifts.filter(is_confirmed=True))
+    # カレンダー表示用のJSON（暦日ごとの区間に分割）
+    shifts_json = []
+    for segment in split_shifts(shifts, month_start, month_end):
+        shift = segment.shift
+        shifts_json.append({
+            'id': shift.id,
+            'date': segment.date.strftime('%Y-%m-%d'),
+            'start_time': shift.start_time.strftime('%H:%M'),
+            'end_time': shift.end_time.strftime('%H:%M'),
+            'staff_id': shift.staff_id,
+            'staff_name': get_staff_name_japanese(shift.staff.user),
+            'is_confirmed': shift.is_confirmed,
+            'wage_cost': segment.shift_cost,
+            'spans_midnight': segment.spans_midnight,
+            'is_continuation': segment.is_continuation,  # 前日から続くシフトの当日部分
+        })
     
-    context = {
-        'store': store,
-        'month_start': month_start,
-        'month_end': month_end,
-        'shifts': shifts,
+    # 時間グリッドで日ごとの人員不足・過剰（人×分）を計算
+    coverage = build_store_grid(store, month_start, month_end).coverage()
+    shortage_minutes = coverage.shortage_minutes_by_day()
+    overstaffing_minutes = coverage.overstaffing_minutes_by_day()
+    for offset in range((month_end - month_start).days + 1):
+        date_key = (month_start + timedelta(days=offset)).strftime('%Y-%m-%d')
+        stats = date_stats.setdefault(date_key, {'staff_count': 0, 'total_cost': 0})
+        stats['shortage_minutes'] = int(shortage_minutes[offset])
+        stats['overstaffing_minutes'] = int(overstaffing_minutes[offset])
+    
+    return {
         'shifts_json': json.dumps(shifts_json, ensure_ascii=False),
         'date_stats_json': json.dumps(date_stats, ensure_ascii=False),
         'total_shifts': total_shifts,
         'confirmed_shifts': confirmed_shifts,
-        'pending_shifts': pending_shifts,
+        'pending_shifts': total_shifts - confirmed_shifts,
         'total_cost': total_cost,
     }
+
+
+@login_required
+@admin_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_calendar_etag, last_modified_func=_calendar_last_modified)
+def admin_shift_calendar(request):
+    """管理者用シフトカレンダー（表示データは月ごとにキャッシュし、変更がなければ 304 を返す）"""
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        messages.error(request, "スタッフ情報が見つかりません。")
+        return redirect('login')
+    
+    month_start, month_end = _calendar_month(request)
+    payload = calendar_cache.get_or_build(
+        store.id, month_start, lambda: _build_calendar_payload(store, month_start, month_end)
+    )
+    
+    context = {
+        'store': store,
+        'month_start': month_start,
+        'month_end': month_end,
+        **payload,
+    }
     
     return render(request, 'admin/shift_calendar.html', context)
 
 
+def _submission_month(value=None):
+    """提出状況の対象月の (月初日, 月末日)（'YYYY-MM'、省略時は来月）。不正な値は ValueError"""
+    if value:
+        month_start = datetime.strptime(value, '%Y-%m').date()
+    else:
+        today = date.today()
+        month_start = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+    _, last_day = calendar.monthrange(month_start.year, month_start.month)
+    return month_start, month_start.replace(day=last_day)
+
+
+def _shift_request_json(req):
+    """希望シフト1件のJSON"""
+    return {
+        'date': req.date.strftime('%Y-%m-%d'),
+        'weekday': req.date.strftime('%a'),
+        'request_type': req.get_request_type_display(),
+        'start_time': req.start_time.strftime('%H:%M') if req.start_time else '',
+        'end_time': req.end_time.strftime('%H:%M') if req.end_time else '',
+    }
+
+
+def _submission_period(month_start, month_end):
+    return f"{month_start.strftime('%Y年%m月%d日')} 〜 {month_end.strftime('%Y年%m月%d日')}"
+
+
 @login_required
 @admin_required
 def admin_shift_submission_status(request):
@@ -818,50 +973,38 @@ def admin_shift_submission_status(request):
         messages.error(request, "スタッフ情報が見つかりません。")
         return redirect('login')
     
-    # 来月の日付範囲を取得
-    today = date.today()
-    if today.month == 12:
-        next_month_start = date(today.year + 1, 1, 1)
-        next_month_end = date(today.year + 1, 2, 1) - timedelta(days=1)
-    else:
-        next_month_start = date(today.year, today.month + 1, 1)
-        if today.month == 11:
-            next_month_end = date(today.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            next_month_end = date(today.year, today.month + 2, 1) - timedelta(days=1)
+    # 対象月（?month=YYYY-MM、省略時は来月）
+    try:
+        next_month_start, next_month_end = _submission_month(request.GET.get('month'))
+    except ValueError:
+        next_month_start, next_month_end = _submission_month()
     
-    # スタッフリストを取得
-    all_staff = Staff.objects.filter(store=store).select_related('user')
+    # スタッフごとの希望件数・最終提出日時を1クエリで集計
+    in_month = Q(shiftrequest__date__range=[next_month_start, next_month_end])
+    all_staff = Staff.objects.filter(store=store).select_related('user').annotate(
+        request_count=Count('shiftrequest', filter=in_month),
+        work_request_count=Count('shiftrequest', filter=in_month & Q(shiftrequest__request_type='work')),
+        last_submitted_at=Max('shiftrequest__submitted_at', filter=in_month),
+    ).order_by('id')
     
-    # 各スタッフの提出状況を確認
+    # 各スタッフの提出状況
     staff_status_list = []
     for staff_member in all_staff:
-        requests = ShiftRequest.objects.filter(
-            staff=staff_member,
-            date__range=[next_month_start, next_month_end]
-        )
-        
-        work_requests = requests.filter(request_type='work').count()
         # 現在のモデルには「休み希望」タイプがないため、0を設定
-        # 将来的に「休み希望」タイプを追加する場合は、以下のように変更:
-        # off_requests = requests.filter(request_type='off').count()
         off_requests = 0
-        is_submitted = requests.exists()
-        
-        last_request = requests.order_by('-submitted_at').first()
         
         # 日本時間に変換してフォーマット
         submitted_at_str = None
-        if last_request and last_request.submitted_at:
-            jst_time = timezone.localtime(last_request.submitted_at)
+        if staff_member.last_submitted_at:
+            jst_time = timezone.localtime(staff_member.last_submitted_at)
             submitted_at_str = jst_time.strftime('%Y-%m-%d %H:%M:%S')
         
         staff_status_list.append({
             'id': staff_member.id,
             'name': get_staff_name_japanese(staff_member.user),
             'employment_type': staff_member.get_employment_type_display(),
-            'is_submitted': is_submitted,
-            'work_requests': work_requests,
+            'is_submitted': staff_member.request_count > 0,
+            'work_requests': staff_member.work_request_count,
             'off_requests': off_requests,
             'submitted_at': submitted_at_str,  # 日本時間でフォーマット済み
         })
@@ -874,12 +1017,10 @@ def admin_shift_submission_status(request):
     # 総希望日数計算
     total_requests = sum(s['work_requests'] for s in staff_status_list)
     
-    # 提出期限を店舗設定から取得
-    if next_month_start.month == 1:
-        # 来月が1月の場合、前月（今月）は12月
-        submission_deadline = date(today.year, 12, store.shift_submission_deadline_day)
-    else:
-        submission_deadline = date(today.year, today.month, store.shift_submission_deadline_day)
+    # 提出期限を店舗設定から取得（対象月の前月）
+    deadline_month = (next_month_start - timedelta(days=1)).replace(day=1)
+    _, deadline_last_day = calendar.monthrange(deadline_month.year, deadline_month.month)
+    submission_deadline = deadline_month.replace(day=min(store.shift_submission_deadline_day, deadline_last_day))
     
     context = {
         'store': store,
@@ -902,35 +1043,19 @@ def admin_submission_detail_api(request, staff_id):
     """スタッフのシフト提出詳細を取得（API）"""
     try:
         staff = request.user.staff
-        target_staff = Staff.objects.get(id=staff_id)
+        target_staff = Staff.objects.select_related('user').get(id=staff_id)
         
         # スタッフのストアが一致するか確認
-        if staff.store != target_staff.store:
+        if staff.store_id != target_staff.store_id:
             return JsonResponse({'error': '権限がありません。'}, status=403)
     except Staff.DoesNotExist:
         return JsonResponse({'error': 'スタッフが見つかりません。'}, status=404)
     
-    # 対象月を取得（リクエストパラメータまたは今月）
-    target_month = request.GET.get('month')
-    if target_month:
-        year, month = map(int, target_month.split('-'))
-        month_start = date(year, month, 1)
-        if month == 12:
-            month_end = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            month_end = date(year, month + 1, 1) - timedelta(days=1)
-    else:
-        # 今月
-        today = date.today()
-        if today.month == 12:
-            month_start = date(today.year + 1, 1, 1)
-            month_end = date(today.year + 1, 2, 1) - timedelta(days=1)
-        else:
-            month_start = date(today.year, today.month + 1, 1)
-            if today.month == 11:
-                month_end = date(today.year + 1, 1, 1) - timedelta(days=1)
-            else:
-                month_end = date(today.year, today.month + 2, 1) - timedelta(days=1)
+    # 対象月を取得（リクエストパラメータまたは来月）
+    try:
+        month_start, month_end = _submission_month(request.GET.get('month'))
+    except ValueError:
+        return JsonResponse({'error': '無効な月の形式です。'}, status=400)
     
     # シフトリクエストを取得
     requests = ShiftRequest.objects.filter(
@@ -938,21 +1063,44 @@ def admin_submission_detail_api(request, staff_id):
         date__range=[month_start, month_end]
     ).order_by('date')
     
-    # JSON形式で返す
-    request_list = []
-    for req in requests:
-        request_list.append({
-            'date': req.date.strftime('%Y-%m-%d'),
-            'weekday': req.date.strftime('%a'),
-            'request_type': req.get_request_type_display(),
-            'start_time': req.start_time.strftime('%H:%M') if req.start_time else '',
-            'end_time': req.end_time.strftime('%H:%M') if req.end_time else '',
-        })
-    
     return JsonResponse({
         'staff_name': get_staff_name_japanese(target_staff.user),
-        'requests': request_list,
-        'period': f"{month_start.strftime('%Y年%m月%d日')} 〜 {month_end.strftime('%Y年%m月%d日')}"
+        'requests': [_shift_request_json(req) for req in requests],
+        'period': _submission_period(month_start, month_end),
+    })
+
+
+@login_required
+@admin_required
+def admin_submission_details_api(request):
+    """店舗の全スタッフのシフト提出詳細を一括で取得（API、希望シフトは1クエリ）"""
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    try:
+        month_start, month_end = _submission_month(request.GET.get('month'))
+    except ValueError:
+        return JsonResponse({'error': '無効な月の形式です。'}, status=400)
+    
+    requests_by_staff = {}
+    for req in ShiftRequest.objects.filter(
+        staff__store=store,
+        date__range=[month_start, month_end]
+    ).order_by('date'):
+        requests_by_staff.setdefault(req.staff_id, []).append(_shift_request_json(req))
+    
+    return JsonResponse({
+        'period': _submission_period(month_start, month_end),
+        'staff': {
+            member.id: {
+                'staff_name': get_staff_name_japanese(member.user),
+                'requests': requests_by_staff.get(member.id, []),
+            }
+            for member in Staff.objects.filter(store=store).select_related('user')
+        },
     })
 
 
@@ -1001,20 +1149,17 @@ def admin_chat_list(request):
         messages.error(request, "スタッフ情報が見つかりません。")
         return redirect('login')
     
-    # 自分が参加しているチャットルームを取得
-    chat_rooms = ChatRoom.objects.filter(
+    # 自分が参加しているチャットルームを取得（未読数・最新メッセージは同じクエリで集計）
+    chat_rooms = list(ChatRoom.objects.filter(
         Q(participant1=staff) | Q(participant2=staff),
         store=store
-    ).select_related('participant1', 'participant2', 'swap_request').prefetch_related('messages').order_by('-updated_at')
+    ).with_summary(staff).order_by('-updated_at'))
     
-    # 各ルームの最新メッセージと未読数を取得
     for room in chat_rooms:
         room.other_participant = room.get_other_participant(staff)
-        room.unread_count = room.get_unread_count(staff)
-        room.last_message = room.messages.last()
     
     # 同じ店舗のスタッフ一覧（新規チャット作成用）
-    other_staff = Staff.objects.filter(store=store).exclude(id=staff.id).order_by('user__last_name', 'user__first_name')
+    other_staff = Staff.objects.filter(store=store).exclude(id=staff.id).select_related('user').order_by('user__last_name', 'user__first_name')
     
     context = {
         'staff': staff,
@@ -1050,25 +1195,17 @@ def admin_chat_detail(request, room_id):
     
     other_participant = room.get_other_participant(staff)
     
-    # メッセージを取得
-    messages_list = room.messages.all().select_related('sender').order_by('created_at')
+    # メッセージを取得（最新の1ページ分、古いものは画面から履歴APIで読み込む）
+    messages_list, has_more_history = chat.history_page(room)
     
     # 未読メッセージを既読にする
-    unread_messages = room.messages.filter(is_read=False).exclude(sender=staff)
-    unread_messages.update(is_read=True)
+    chat.mark_read(room, staff)
     
-    # メッセージ送信処理
+    # メッセージ送信処理（JavaScriptが無効な場合のフォーム送信）
     if request.method == 'POST':
         form = ChatMessageForm(request.POST)
         if form.is_valid():
-            message = form.save(commit=False)
-            message.room = room
-            message.sender = staff
-            message.save()
-            
-            # ルームの更新日時を更新
-            room.save()
-            
+            chat.post_message(room, staff, form.cleaned_data['message'])
             messages.success(request, "メッセージを送信しました。")
             return redirect('admin_shift:chat_detail', room_id=room.id)
     else:
@@ -1080,12 +1217,79 @@ def admin_chat_detail(request, room_id):
         'room': room,
         'other_participant': other_participant,
         'messages_list': messages_list,
+        'has_more_history': has_more_history,
+        'history_cursor': chat.encode_cursor(messages_list[0]) if messages_list else '',
+        'latest_cursor': chat.encode_cursor(messages_list[-1]) if messages_list else '',
         'form': form,
     }
     
     return render(request, 'admin/chat_detail.html', context)
 
 
+@login_required
+@admin_required
+def admin_chat_messages_api(request, room_id):
+    """
+    チャットメッセージをJSONで返す
+    before=カーソル で古い履歴、after=カーソル で新着のみ（新着取得時は既読にする）
+    """
+    try:
+        staff = request.user.staff
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    room = chat.get_participant_room(staff, room_id)
+    if room is None:
+        return JsonResponse({'error': 'このチャットルームにアクセスする権限がありません。'}, status=403)
+    
+    try:
+        limit = max(1, min(int(request.GET.get('limit', chat.HISTORY_PAGE_SIZE)), chat.MAX_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': '無効な件数です。'}, status=400)
+    
+    try:
+        if request.GET.get('after'):
+            message_list, has_more = chat.messages_after(room, request.GET['after'], limit)
+            chat.mark_read(room, staff)
+        else:
+            message_list, has_more = chat.history_page(room, request.GET.get('before'), limit)
+    except ValueError:
+        return JsonResponse({'error': '無効なカーソルです。'}, status=400)
+    
+    return JsonResponse({
+        'messages': [chat.message_json(message, staff) for message in message_list],
+        'has_more': has_more,
+    })
+
+
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def admin_chat_send_api(request, room_id):
+    """チャットメッセージを送信し、作成したメッセージをJSONで返す"""
+    try:
+        staff = request.user.staff
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    room = chat.get_participant_room(staff, room_id)
+    if room is None:
+        return JsonResponse({'error': 'このチャットルームにアクセスする権限がありません。'}, status=403)
+    
+    form = ChatMessageForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors['message'][0]}, status=400)
+    
+    message = chat.post_message(room, staff, form.cleaned_data['message'])
+    return JsonResponse({'success': True, 'message': chat.message_json(message, staff)})
+
+
+@login_required
+async def admin_chat_stream(request, room_id):
+    """チャットの新着メッセージ・既読のイベントストリーム（Server-Sent Events）"""
+    return await live.chat_stream_response(request, room_id, managers_only=True)
+
+
 @login_required
 @admin_required
 def admin_chat_create(request, staff_id):
@@ -2,20 +2,35 @@
 AIシフト生成機能
 最適化アルゴリズムを使用してシフトを自動生成
 """
-from datetime import datetime, timedelta, time
+from datetime import date, datetime, timedelta, time
 from typing import List, Dict, Tuple, Optional
 from django.db.models import Q
 from accounts.models import Store, Staff, StaffRequirement
-from shift.models import Shift, ShiftRequest
+from shift.models import ScheduleTombstone, Shift, ShiftRequest
+from shift.problem_snapshot import ProblemSnapshot, ShiftSlot
+from shift.rollups import shift_dates
+from shift.solvers import BaseSolver, SolverResult, get_solver
+from shift.time_grid import CHANNELS, CoverageReport, DEFAULT_SLOT_MINUTES, TimeGrid, build_store_grid
+
+
+def _date_range(first: date, last: date) -> List[date]:
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
 
 
 class AIShiftGenerator:
     """AIシフト生成クラス"""
     
-    def __init__(self, store: Store):
+    def __init__(
+        self,
+        store: Store,
+        snapshot: Optional[ProblemSnapshot] = None,
+        solver: Optional[BaseSolver] = None,
+    ):
         self.store = store
-        self.staff_list = Staff.objects.filter(store=store)
-        self.requirements = StaffRequirement.objects.filter(store=store)
+        self.snapshot = snapshot
+        self.solver = solver or get_solver()
+        self.last_result: Optional[SolverResult] = None
+        self.released_shifts: List[ShiftSlot] = []
     
     def generate_shifts(self, start_date: datetime, end_date: datetime) -> List[Dict]:
         """
@@ -28,160 +43,122 @@ class AIShiftGenerator:
         Returns:
             生成されたシフトのリスト
         """
-        generated_shifts = []
-        current_date = start_date.date()
-        end_date_only = end_date.date()
+        start_date_only = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_date_only = end_date.date() if isinstance(end_date, datetime) else end_date
         
-        while current_date <= end_date_only:
-            day_shifts = self._generate_daily_shifts(current_date)
-            generated_shifts.extend(day_shifts)
-            current_date += timedelta(days=1)
+        # 期間全体の問題データを一括で読み込む（以降はDBアクセスなし）
+        if self.snapshot is None or (
+            self.snapshot.start_date, self.snapshot.end_date
+        ) != (start_date_only, end_date_only):
+            self.snapshot = ProblemSnapshot.load(self.store, start_date_only, end_date_only)
         
-        return generated_shifts
+        return self._solve()
     
-    def _generate_daily_shifts(self, date: datetime.date) -> List[Dict]:
-        """1日分のシフトを生成"""
-        day_of_week = date.weekday()
-        daily_requirements = self.requirements.filter(day_of_week=day_of_week)
+    def generate_incremental(self, start_date: date, end_date: date, since: datetime,
+                             coverage_since: Optional[datetime] = None) -> List[Dict]:
+        """
+        前回生成以降に変更のあった日だけを再生成（差分再生成）
         
-        if not daily_requirements.exists():
-            return []
+        対象日の未確定シフトは作り直し、確定済みシフトとそれ以外の日のシフトはそのまま使用する。
+        作り直すシフトは released_shifts に保持する（保存時に削除する）
         
-        # 既存のシフトと希望を取得
-        existing_shifts = Shift.objects.filter(
-            store=self.store,
-            date=date
-        )
-        
-        shift_requests = ShiftRequest.objects.filter(
-            staff__store=self.store,
-            date=date
-        )
-        
-        generated_shifts = []
+        Args:
+            start_date: 開始日
+            end_date: 終了日
+            since: 前回生成の日時
+            coverage_since: シフトの変更を判定する基準日時（省略時は since）
+            
+        Returns:
+            生成されたシフトのリスト（対象日分のみ）
+        """
+        target_dates = self.affected_dates(start_date, end_date, since, coverage_since)
+        self.snapshot = ProblemSnapshot.load(self.store, start_date, end_date)
+        self.released_shifts = self.snapshot.release_dates(target_dates)
+        return self._solve()
+    
+    def affected_dates(self, start_date: date, end_date: date, since: datetime,
+                       coverage_since: Optional[datetime] = None) -> List[date]:
+        """
+        再生成が必要な日
         
-        for requirement in daily_requirements:
-            shifts = self._assign_staff_to_time_slot(
-                date, requirement, existing_shifts, shift_requests
-            )
-            generated_shifts.extend(shifts)
+        - since 以降に更新・削除された希望シフトの日
+        - since 以降に更新された必要人数設定の曜日
+        - coverage_since 以降にシフトが変更・削除され、必要人数・スキルが不足している日
         
-        return generated_shifts
-    
-    def _assign_staff_to_time_slot(
-        self, 
-        date: datetime.date, 
-        requirement: StaffRequirement,
-        existing_shifts: List[Shift],
-        shift_requests: List[ShiftRequest]
-    ) -> List[Dict]:
-        """特定の時間帯にスタッフを割り当て"""
-        
-        # 既に割り当て済みのスタッフを取得
-        assigned_staff = existing_shifts.filter(
-            start_time__lt=requirement.end_time,
-            end_time__gt=requirement.start_time
-        ).values_list('staff_id', flat=True)
-        
-        # 勤務希望のスタッフを優先
-        work_requests = shift_requests.filter(
-            request_type='work',
-            start_time__lte=requirement.start_time,
-            end_time__gte=requirement.end_time
+        coverage_since には前回生成の終了日時を渡す（前回生成が保存したシフトを変更として扱わないため）。
+        変更のない日の不足は再生成しても解消できないため対象にしない
+        """
+        coverage_since = coverage_since or since
+        affected = set(
+            ShiftRequest.objects.filter(
+                staff__store=self.store,
+                date__range=[start_date, end_date],
+                updated_at__gte=since
+            ).values_list('date', flat=True)
         )
-        
-        # 利用可能なスタッフを取得
-        available_staff = self.staff_list.exclude(
-            id__in=assigned_staff
+        for tombstone_date, tombstone_end in ScheduleTombstone.objects.filter(
+            store=self.store,
+            kind='shift_request',
+            deleted_at__gte=since,
+            date__lte=end_date,
+            end_date__gte=start_date
+        ).values_list('date', 'end_date'):
+            affected.update(_date_range(tombstone_date, tombstone_end))
+        
+        changed_weekdays = set(
+            StaffRequirement.objects.filter(
+                store=self.store,
+                updated_at__gte=since
+            ).values_list('day_of_week', flat=True)
         )
         
-        # 責任者が必要な場合
-        managers_needed = requirement.required_managers
-        managers_available = available_staff.filter(is_manager=True)
-        
-        # スキル要件を満たすスタッフ
-        hall_skilled = available_staff.filter(
-            hall_skill_level__gte=3
-        ) if requirement.required_hall_skill > 0 else available_staff
-        
-        kitchen_skilled = available_staff.filter(
-            kitchen_skill_level__gte=3
-        ) if requirement.required_kitchen_skill > 0 else available_staff
-        
-        # 最適なスタッフを選択
-        selected_staff = self._select_optimal_staff(
-            available_staff,
-            work_requests,
-            managers_needed,
-            hall_skilled,
-            kitchen_skilled,
-            requirement.required_staff
-        )
+        # シフトが変わった日（日をまたぐシフトは翌日も）
+        coverage_changed = set()
+        for shift in Shift.objects.filter(
+            Q(date__range=[start_date - timedelta(days=1), end_date]) | Q(date__lt=start_date, end_date__gte=start_date),
+            store=self.store,
+            updated_at__gte=coverage_since
+        ).only('date', 'start_time', 'end_time', 'end_date'):
+            coverage_changed.update(shift_dates(shift))
+        for tombstone_date, tombstone_end in ScheduleTombstone.objects.filter(
+            store=self.store,
+            kind='shift',
+            deleted_at__gte=coverage_since,
+            date__lte=end_date,
+            end_date__gte=start_date
+        ).values_list('date', 'end_date'):
+            coverage_changed.update(_date_range(tombstone_date, tombstone_end))
+        
+        shortage = None
+        if coverage_changed:
+            coverage = build_store_grid(self.store, start_date, end_date).coverage()
+            shortage = sum(coverage.shortage_minutes_by_day(channel) for channel in CHANNELS)
+        
+        for offset in range((end_date - start_date).days + 1):
+            target_date = start_date + timedelta(days=offset)
+            if target_date.weekday() in changed_weekdays:
+                affected.add(target_date)
+            elif target_date in coverage_changed and shortage[offset] > 0:
+                affected.add(target_date)
+        return sorted(d for d in affected if start_date <= d <= end_date)
+    
+    def _solve(self) -> List[Dict]:
+        """スナップショットに対してソルバーを実行し、生成結果を辞書のリストで返す"""
+        # ソルバーで割当を最適化
+        self.last_result = self.solver.solve(self.snapshot)
         
-        shifts = []
-        for staff in selected_staff:
-            shift_data = {
+        generated_shifts = []
+        for slot, staff_id in self.last_result.iter_assignments():
+            generated_shifts.append({
                 'store': self.store,
-                'staff': staff,
-                'date': date,
-                'start_time': requirement.start_time,
-                'end_time': requirement.end_time,
+                'staff': self.snapshot.staff[staff_id],
+                'date': slot.date,
+                'start_time': slot.requirement.start_time,
+                'end_time': slot.requirement.end_time,
                 'is_confirmed': False
-            }
-            shifts.append(shift_data)
+            })
         
-        return shifts
-    
-    def _select_optimal_staff(
-        self,
-        available_staff,
-        work_requests,
-        managers_needed: int,
-        hall_skilled,
-        kitchen_skilled,
-        total_needed: int
-    ) -> List[Staff]:
-        """最適なスタッフを選択"""
-        
-        selected = []
-        
-        # 1. 勤務希望者を優先
-        for request in work_requests:
-            if len(selected) >= total_needed:
-                break
-            if request.staff not in selected:
-                selected.append(request.staff)
-        
-        # 2. 責任者を確保
-        managers_selected = 0
-        for staff in available_staff.filter(is_manager=True):
-            if managers_selected >= managers_needed or len(selected) >= total_needed:
-                break
-            if staff not in selected:
-                selected.append(staff)
-                managers_selected += 1
-        
-        # 3. スキル要件を満たすスタッフを追加
-        for staff in hall_skilled:
-            if len(selected) >= total_needed:
-                break
-            if staff not in selected:
-                selected.append(staff)
-        
-        for staff in kitchen_skilled:
-            if len(selected) >= total_needed:
-                break
-            if staff not in selected:
-                selected.append(staff)
-        
-        # 4. 残りをランダムに選択
-        remaining_staff = available_staff.exclude(id__in=[s.id for s in selected])
-        for staff in remaining_staff:
-            if len(selected) >= total_needed:
-                break
-            selected.append(staff)
-        
-        return selected[:total_needed]
+        return generated_shifts
     
     def calculate_shift_cost(self, shifts: List[Dict]) -> float:
         """シフトの人件費を計算"""
@@ -239,3 +216,18 @@ class AIShiftGenerator:
                 )
         
         return errors
+    
+    def coverage_report(self, shifts: List[Dict], slot_minutes: int = DEFAULT_SLOT_MINUTES) -> CoverageReport:
+        """
+        既存シフトと生成シフトを合わせた充足状況を時間グリッド上で計算
+        （generate_shifts 実行後のスナップショットを使用）
+        """
+        snapshot = self.snapshot
+        grid = TimeGrid(snapshot.start_date, snapshot.end_date, slot_minutes)
+        grid.add_requirements(snapshot.requirements_by_weekday)
+        grid.add_shifts(
+            [shift for day_shifts in snapshot.shifts_by_date.values() for shift in day_shifts],
+            snapshot.staff
+        )
+        grid.add_generated_shifts(shifts)
+        return grid.coverage()
@@ -0,0 +1,173 @@
+"""
+スタッフ×時間スロットの空き状況インデックス
+各スタッフの勤務希望時間と割当済み時間を、日ごとに時間グリッド上の整数ビットマスクとして保持し、
+「指定時間帯に希望を出していて、かつ空いているスタッフ」をスタッフ数分のビット演算で求める
+"""
+from collections import defaultdict
+from datetime import date, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from shift.problem_snapshot import span_minutes, time_to_minutes
+from shift.time_grid import DEFAULT_SLOT_MINUTES, MINUTES_PER_DAY
+
+
+class AvailabilityIndex:
+    """日付ごとの {スタッフID: ビットマスク} で希望・割当を保持するインデックス"""
+
+    def __init__(self, staff_ids: Iterable[int], slot_minutes: int = DEFAULT_SLOT_MINUTES):
+        if MINUTES_PER_DAY % slot_minutes != 0:
+            raise ValueError("スロット間隔は1日（1440分）を割り切れる値にしてください。")
+        self.staff_ids = list(staff_ids)
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = MINUTES_PER_DAY // slot_minutes
+        self.requested: Dict[date, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.assigned: Dict[date, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    # ---- マスク計算 ----
+
+    def window_masks(self, target_date: date, start_time: time, end_time: time,
+                     end_date: Optional[date] = None, inner: bool = False) -> List[Tuple[date, int]]:
+        """
+        時間帯を日ごとのビットマスクに分割
+
+        Args:
+            inner: True の場合は時間帯に完全に含まれるスロットのみ（希望時間用）、
+                   False の場合は少しでも重なるスロットを含める（割当・検索用）
+        """
+        start_minute = time_to_minutes(start_time)
+        if end_date and end_date > target_date:
+            end_minute = (end_date - target_date).days * MINUTES_PER_DAY + time_to_minutes(end_time)
+        else:
+            end_minute = start_minute + span_minutes(start_time, end_time)
+
+        if inner:
+            first = -(-start_minute // self.slot_minutes)
+            last = end_minute // self.slot_minutes
+        else:
+            first = start_minute // self.slot_minutes
+            last = -(-end_minute // self.slot_minutes)
+
+        masks = []
+        day_offset = 0
+        while first < last:
+            day_end = (day_offset + 1) * self.slots_per_day
+            segment_end = min(last, day_end)
+            if first < segment_end:
+                width = segment_end - first
+                shift = first - day_offset * self.slots_per_day
+                masks.append((target_date + timedelta(days=day_offset), ((1 << width) - 1) << shift))
+            first = segment_end
+            day_offset += 1
+        return masks
+
+    # ---- 登録 ----
+
+    def add_request(self, staff_id: int, target_date: date, start_time: Optional[time],
+                    end_time: Optional[time], end_date: Optional[date] = None):
+        """勤務希望を登録（時間未設定の希望は対象外）"""
+        if start_time is None or end_time is None:
+            return
+        for day, mask in self.window_masks(target_date, start_time, end_time, end_date, inner=True):
+            self.requested[day][staff_id] |= mask
+
+    def add_assignment(self, staff_id: int, target_date: date, start_time: time,
+                       end_time: time, end_date: Optional[date] = None):
+        """割当済みシフトを登録"""
+        for day, mask in self.window_masks(target_date, start_time, end_time, end_date):
+            self.assigned[day][staff_id] |= mask
+
+    # ---- 検索 ----
+
+    def is_free(self, staff_id: int, target_date: date, start_time: time, end_time: time,
+                end_date: Optional[date] = None) -> bool:
+        """指定時間帯に割当がないかどうか"""
+        return all(
+            not (self.assigned.get(day, {}).get(staff_id, 0) & mask)
+            for day, mask in self.window_masks(target_date, start_time, end_time, end_date)
+        )
+
+    def has_requested(self, staff_id: int, target_date: date, start_time: time, end_time: time,
+                      end_date: Optional[date] = None) -> bool:
+        """指定時間帯全体に勤務希望を出しているかどうか"""
+        return all(
+            (self.requested.get(day, {}).get(staff_id, 0) & mask) == mask
+            for day, mask in self.window_masks(target_date, start_time, end_time, end_date)
+        )
+
+    def free_staff(self, target_date: date, start_time: time, end_time: time,
+                   end_date: Optional[date] = None, requested_only: bool = False) -> List[int]:
+        """
+        指定時間帯に空いているスタッフID（requested_only=True なら勤務希望者のみ）
+        """
+        masks = self.window_masks(target_date, start_time, end_time, end_date)
+        assigned = [(self.assigned.get(day, {}), mask) for day, mask in masks]
+        requested = [(self.requested.get(day, {}), mask) for day, mask in masks]
+        result = []
+        for staff_id in self.staff_ids:
+            if any(day_bits.get(staff_id, 0) & mask for day_bits, mask in assigned):
+                continue
+            if requested_only and any(
+                (day_bits.get(staff_id, 0) & mask) != mask for day_bits, mask in requested
+            ):
+                continue
+            result.append(staff_id)
+        return result
+
+    def requested_staff(self, target_date: date, start_time: time, end_time: time,
+                        end_date: Optional[date] = None) -> List[int]:
+        """指定時間帯全体に勤務希望を出しているスタッフID（割当の有無は問わない）"""
+        masks = self.window_masks(target_date, start_time, end_time, end_date)
+        return [
+            staff_id for staff_id in self.staff_ids
+            if all(
+                (self.requested.get(day, {}).get(staff_id, 0) & mask) == mask
+                for day, mask in masks
+            )
+        ]
+
+    # ---- 構築 ----
+
+    @classmethod
+    def from_snapshot(cls, snapshot, slot_minutes: int = DEFAULT_SLOT_MINUTES) -> 'AvailabilityIndex':
+        """ProblemSnapshotから構築（DBアクセスなし）"""
+        index = cls(snapshot.staff.keys(), slot_minutes)
+        for requests in snapshot.requests_by_date.values():
+            for req in requests:
+                if req.request_type == 'work':
+                    index.add_request(req.staff_id, req.date, req.start_time, req.end_time, req.end_date)
+        for shifts in snapshot.shifts_by_date.values():
+            for shift in shifts:
+                index.add_assignment(shift.staff_id, shift.date, shift.start_time, shift.end_time, shift.end_date)
+        return index
+
+    @classmethod
+    def load(cls, store, start_date: date, end_date: date,
+             slot_minutes: int = DEFAULT_SLOT_MINUTES, exclude_shift_ids: Iterable[int] = ()) -> 'AvailabilityIndex':
+        """
+        店舗の指定期間について構築（スタッフ・希望・シフトの3クエリ）
+
+        Args:
+            exclude_shift_ids: 割当として数えないシフト（編集中・交代対象のシフトなど）
+        """
+        from accounts.models import Staff
+        from shift.models import Shift, ShiftRequest
+
+        index = cls(
+            Staff.objects.filter(store=store).order_by('id').values_list('id', flat=True),
+            slot_minutes
+        )
+        request_rows = ShiftRequest.objects.filter(
+            staff__store=store,
+            request_type='work',
+            date__range=[start_date - timedelta(days=1), end_date]
+        ).values_list('staff_id', 'date', 'start_time', 'end_time', 'end_date')
+        for row in request_rows:
+            index.add_request(*row)
+        shift_rows = Shift.objects.filter(
+            store=store,
+            date__range=[start_date - timedelta(days=1), end_date]
+        ).exclude(id__in=list(exclude_shift_ids)).values_list(
+            'staff_id', 'date', 'start_time', 'end_time', 'end_date'
+        )
+        for row in shift_rows:
+            index.add_assignment(*row)
+        return index
@@ -0,0 +1,217 @@
+"""
+ベンチマーク・負荷確認用の大規模データ作成
+店舗数 × スタッフ数 × 月数を指定して、必要人数設定・希望シフト・シフト・勤怠・評価を作成する
+（同じシード値なら同じデータになる）
+
+最終月は「これから生成する月」として希望シフトのみを作成し、
+それより前の月は確定済みシフト・勤怠記録・評価を作成する
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import Store, Staff, StaffRequirement
+from eval.models import AttendanceRecord, Evaluation
+from shift.models import Shift, ShiftRequest, ShiftSettings
+from shift.rollups import rebuild_daily_stats
+
+DEFAULT_STORE_PREFIX = 'ベンチマーク店舗'
+DEFAULT_PASSWORD = 'benchmark'
+
+# 1日の時間帯（開始, 終了, スタッフ数に対する必要人数の割合）
+TIME_BLOCKS = [
+    (time(10, 0), time(14, 0), 0.15),
+    (time(14, 0), time(18, 0), 0.10),
+    (time(18, 0), time(23, 0), 0.20),
+]
+
+# 希望シフトとして出す時間帯の候補
+REQUEST_WINDOWS = [
+    (time(10, 0), time(14, 0)),
+    (time(10, 0), time(18, 0)),
+    (time(14, 0), time(18, 0)),
+    (time(14, 0), time(23, 0)),
+    (time(18, 0), time(23, 0)),
+    (time(10, 0), time(23, 0)),
+]
+
+
+def add_months(month_start: date, months: int) -> date:
+    """月初日に月数を加算"""
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def clear_dataset(prefix: str = DEFAULT_STORE_PREFIX) -> int:
+    """作成済みのベンチマーク店舗と関連データ・ユーザーを削除"""
+    stores = Store.objects.filter(name__startswith=prefix)
+    user_ids = list(Staff.objects.filter(store__in=stores).values_list('user_id', flat=True))
+    count = stores.count()
+    with transaction.atomic():
+        stores.delete()
+        User.objects.filter(id__in=user_ids).delete()
+    return count
+
+
+def seed_dataset(
+    stores: int,
+    staff_per_store: int,
+    months: int,
+    start_month: date,
+    seed: int = 0,
+    prefix: str = DEFAULT_STORE_PREFIX,
+    request_rate: float = 0.4,
+    stdout=None,
+) -> List[Store]:
+    """
+    ベンチマーク用データを作成
+
+    Args:
+        stores: 店舗数
+        staff_per_store: 1店舗あたりのスタッフ数
+        months: 月数（最終月は希望シフトのみ）
+        start_month: 開始月の月初日
+        seed: 乱数シード
+        prefix: 店舗名の接頭辞（clear_dataset で削除する際の目印）
+        request_rate: 1日あたりに勤務希望を出す確率
+
+    Returns:
+        作成した店舗のリスト
+    """
+    rnd = random.Random(seed)
+    password_hash = make_password(DEFAULT_PASSWORD)
+    history_end = add_months(start_month, max(months - 1, 0))
+    period_end = add_months(start_month, months) - timedelta(days=1)
+    days = [start_month + timedelta(days=i) for i in range((period_end - start_month).days + 1)]
+    created_stores = []
+
+    for store_index in range(stores):
+        with transaction.atomic():
+            store = Store.objects.create(
+                name=f'{prefix}{seed}-{store_index + 1}',
+                opening_time=time(10, 0),
+                closing_time=time(23, 0),
+            )
+            ShiftSettings.objects.create(store=store)
+
+            # スタッフ（ユーザー名＝社員ID、パスワードは共通）
+            users = User.objects.bulk_create([
+                User(
+                    username=f'b{seed}s{store.id}n{i}',
+                    password=password_hash,
+                    first_name=f'スタッフ{i + 1}',
+                    last_name=f'店舗{store_index + 1}',
+                )
+                for i in range(staff_per_store)
+            ])
+            users = list(User.objects.filter(username__in=[u.username for u in users]).order_by('id'))
+            Staff.objects.bulk_create([
+                Staff(
+                    user=user,
+                    store=store,
+                    employee_id=user.username,
+                    employment_type=rnd.choice(['fixed', 'flexible', 'flexible']),
+                    hourly_wage=rnd.randrange(1050, 1600, 50),
+                    hall_skill_level=rnd.randint(1, 5),
+                    kitchen_skill_level=rnd.randint(1, 5),
+                    is_manager=(i % 8 == 0),
+                    max_weekly_hours=rnd.choice([20, 28, 32, 40]),
+                )
+                for i, user in enumerate(users)
+            ])
+            staff_list = list(Staff.objects.filter(store=store).order_by('id'))
+
+            # 必要人数設定（スタッフ数に比例、週末は多め）
+            requirements = []
+            for day_of_week in range(7):
+                weekend = 1.3 if day_of_week >= 5 else 1.0
+                for start_time, end_time, ratio in TIME_BLOCKS:
+                    required = max(1, round(staff_per_store * ratio * weekend))
+                    requirements.append(StaffRequirement(
+                        store=store,
+                        day_of_week=day_of_week,
+                        start_time=start_time,
+                        end_time=end_time,
+                        required_staff=required,
+                        required_managers=1,
+                        required_hall_skill=max(0, required // 3),
+                        required_kitchen_skill=max(0, required // 3),
+                    ))
+            StaffRequirement.objects.bulk_create(requirements)
+
+            # 希望シフト・過去月の確定シフト・勤怠記録
+            requests, shifts, attendance = [], [], []
+            for member in staff_list:
+                for day in days:
+                    if rnd.random() >= request_rate:
+                        continue
+                    start_time, end_time = rnd.choice(REQUEST_WINDOWS)
+                    requests.append(ShiftRequest(
+                        staff=member, date=day, request_type='work',
+                        start_time=start_time, end_time=end_time,
+                    ))
+                    if day >= history_end:
+                        continue
+                    shifts.append(Shift(
+                        store=store, staff=member, date=day,
+                        start_time=start_time, end_time=end_time, is_confirmed=True,
+                    ))
+                    late_minutes = rnd.choice([0, 0, 0, 0, 5, 15])
+                    clock_in = timezone.make_aware(datetime.combine(day, start_time)) + timedelta(minutes=late_minutes)
+                    attendance.append(AttendanceRecord(
+                        staff=member, date=day,
+                        clock_in=clock_in,
+                        clock_out=timezone.make_aware(datetime.combine(day, end_time)),
+                        is_late=late_minutes > 0,
+                    ))
+            ShiftRequest.objects.bulk_create(requests, batch_size=1000)
+            Shift.objects.bulk_create(shifts, batch_size=1000)
+            AttendanceRecord.objects.bulk_create(attendance, batch_size=1000)
+
+            # 過去月の評価（責任者が評価者）
+            evaluator = next((member for member in staff_list if member.is_manager), staff_list[0] if staff_list else None)
+            evaluations = []
+            month = start_month
+            while evaluator and month < history_end:
+                for member in staff_list:
+                    scores = (rnd.randint(15, 30), rnd.randint(20, 40), rnd.randint(10, 20), rnd.randint(5, 10))
+                    evaluations.append(Evaluation(
+                        staff=member, evaluator=evaluator,
+                        evaluation_period=month.strftime('%Y-%m'),
+                        attendance_score=scores[0], skill_score=scores[1],
+                        teamwork_score=scores[2], customer_service_score=scores[3],
+                        total_score=sum(scores),
+                    ))
+                month = add_months(month, 1)
+            Evaluation.objects.bulk_create(evaluations, batch_size=1000)
+
+            # bulk_create したシフトの日別集計
+            rebuild_daily_stats([store.id])
+
+        created_stores.append(store)
+        if stdout:
+            stdout.write(
+                f"  {store.name}: スタッフ{len(staff_list)}人 / 希望{len(requests)}件 / "
+                f"シフト{len(shifts)}件 / 勤怠{len(attendance)}件 / 評価{len(evaluations)}件"
+            )
+    return created_stores
+
+
+def generation_month(start_month: date, months: int) -> date:
+    """seed_dataset で希望シフトのみを作成した月（生成対象の月）"""
+    return add_months(start_month, max(months - 1, 0))
+
+
+def month_end(month_start: date) -> date:
+    """月末日"""
+    return add_months(month_start, 1) - timedelta(days=1)
+
+
+def parse_month(value: Optional[str]) -> date:
+    """'YYYY-MM' を月初日に変換（省略時は来月）"""
+    if not value:
+        return add_months(date.today().replace(day=1), 1)
+    return datetime.strptime(value, '%Y-%m').date()
@@ -0,0 +1,93 @@
+"""
+シフトカレンダーの表示データのキャッシュ
+(店舗, 年月) ごとにシリアライズ済みの表示データを保持し、バージョン番号で無効化する。
+
+バージョンは店舗全体（スタッフ名・時給・必要人数の変更）と月ごと（シフトの変更）の2種類で、
+値は更新時刻（UNIXタイム）を使うため、そのまま Last-Modified・ETag にも使える
+"""
+import hashlib
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, Tuple
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _cache():
+    return caches[getattr(settings, 'CALENDAR_CACHE_ALIAS', 'default')]
+
+
+def _store_version_key(store_id: int) -> str:
+    return f'calendar:version:{store_id}'
+
+
+def _month_version_key(store_id: int, month_start: date) -> str:
+    return f'calendar:version:{store_id}:{month_start:%Y-%m}'
+
+
+def versions(store_id: int, month_start: date) -> Tuple[float, float]:
+    """(店舗のバージョン, 月のバージョン)（未設定なら現在時刻で初期化）"""
+    cache = _cache()
+    store_key = _store_version_key(store_id)
+    month_key = _month_version_key(store_id, month_start)
+    values = cache.get_many([store_key, month_key])
+    missing = {key: time.time() for key in (store_key, month_key) if key not in values}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        values.update(missing)
+    return values[store_key], values[month_key]
+
+
+def last_modified(store_id: int, month_start: date) -> float:
+    """表示データの最終更新時刻（UNIXタイム）"""
+    return max(versions(store_id, month_start))
+
+
+def etag(store_id: int, month_start: date, *extra) -> str:
+    """表示データのETag（ユーザーなど、ページごとに異なる値を extra に含める）"""
+    source = ':'.join(str(value) for value in (store_id, f'{month_start:%Y-%m}', *versions(store_id, month_start), *extra))
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def _months_in_range(start_date: date, end_date: date):
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def range_etag(store_id: int, start_date: date, end_date: date, *extra) -> str:
+    """期間（複数月にまたがってもよい）の表示データのETag"""
+    parts = [store_id, start_date, end_date, *extra]
+    for month in _months_in_range(start_date, end_date):
+        parts.extend(versions(store_id, month))
+    return hashlib.md5(':'.join(str(value) for value in parts).encode()).hexdigest()
+
+
+def range_last_modified(store_id: int, start_date: date, end_date: date) -> float:
+    """期間の表示データの最終更新時刻（UNIXタイム）"""
+    return max(last_modified(store_id, month) for month in _months_in_range(start_date, end_date))
+
+
+def get_or_build(store_id: int, month_start: date, build: Callable[[], Dict]) -> Dict:
+    """キャッシュ済みの表示データ、なければ build() で作成して保存"""
+    store_version, month_version = versions(store_id, month_start)
+    key = f'calendar:payload:{store_id}:{month_start:%Y-%m}:{store_version}:{month_version}'
+    cache = _cache()
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, timeout=getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 3600))
+    return payload
+
+
+def invalidate_store(store_id: int):
+    """店舗の全月の表示データを無効化"""
+    _cache().set(_store_version_key(store_id), time.time(), timeout=None)
+
+
+def invalidate_dates(store_id: int, dates: Iterable[date]):
+    """日付を含む月の表示データを無効化"""
+    now = time.time()
+    months = {day.replace(day=1) for day in dates}
+    _cache().set_many({_month_version_key(store_id, month): now for month in months}, timeout=None)
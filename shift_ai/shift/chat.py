@@ -0,0 +1,115 @@
+"""
+チャットの履歴取得・送信（管理者画面・スタッフ画面で共通）
+履歴は (created_at, id) のキーセットでページングし、カーソル以降の新着のみを取得できる。
+送信と既読は shift.live で接続中の参加者へ配信する
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from shift import live
+from shift.models import ChatMessage, ChatRoom
+
+HISTORY_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    """カーソルの形式が不正"""
+
+
+def encode_cursor(message) -> str:
+    """メッセージの位置を表すカーソル（'<送信日時のマイクロ秒>.<ID>'）"""
+    delta = message.created_at - _EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return f'{microseconds}.{message.id}'
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """カーソルを (送信日時, ID) に変換"""
+    try:
+        microseconds, message_id = cursor.split('.')
+        return _EPOCH + timedelta(microseconds=int(microseconds)), int(message_id)
+    except (AttributeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def get_participant_room(staff, room_id: int) -> Optional[ChatRoom]:
+    """スタッフが参加しているチャットルーム（なければ None）"""
+    return ChatRoom.objects.filter(
+        Q(participant1=staff) | Q(participant2=staff),
+        id=room_id,
+        store_id=staff.store_id
+    ).select_related('participant1__user', 'participant2__user').first()
+
+
+def _messages(room):
+    return ChatMessage.objects.filter(room=room).select_related('sender__user')
+
+
+def history_page(room, before: Optional[str] = None, limit: int = HISTORY_PAGE_SIZE) -> Tuple[List[ChatMessage], bool]:
+    """
+    カーソルより前（省略時は最新）のメッセージを古い順に最大 limit 件
+
+    Returns:
+        (メッセージのリスト, さらに古いメッセージがあるか)
+    """
+    messages = _messages(room)
+    if before:
+        created_at, message_id = decode_cursor(before)
+        messages = messages.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+    page = list(messages.order_by('-created_at', '-id')[:limit + 1])
+    has_more = len(page) > limit
+    return page[:limit][::-1], has_more
+
+
+def messages_after(room, after: str, limit: int = MAX_PAGE_SIZE) -> Tuple[List[ChatMessage], bool]:
+    """
+    カーソルより後のメッセージを古い順に最大 limit 件
+
+    Returns:
+        (メッセージのリスト, さらに新しいメッセージがあるか)
+    """
+    created_at, message_id = decode_cursor(after)
+    page = list(_messages(room).filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+    ).order_by('created_at', 'id')[:limit + 1])
+    return page[:limit], len(page) > limit
+
+
+def mark_read(room, staff) -> int:
+    """相手からの未読メッセージを既読にする（既読にした件数）"""
+    count = room.messages.filter(is_read=False).exclude(sender=staff).update(is_read=True)
+    if count:
+        live.publish_read(room.id, staff.id)
+    return count
+
+
+def post_message(room, staff, text: str) -> ChatMessage:
+    """メッセージを保存し、ルームの更新日時を進める（コミット後に配信）"""
+    with transaction.atomic():
+        message = ChatMessage.objects.create(room=room, sender=staff, message=text)
+        ChatRoom.objects.filter(id=room.id).update(updated_at=timezone.now())
+        live.publish_message(message_json(message), room.id)
+    return message
+
+
+def message_json(message, staff=None) -> Dict:
+    """メッセージ1件のJSON（staff を省略すると is_mine を含めない）"""
+    user = message.sender.user
+    data = {
+        'id': message.id,
+        'cursor': encode_cursor(message),
+        'sender_id': message.sender_id,
+        'sender_name': user.get_full_name() or user.username,
+        'message': message.message,
+        'created_at': message.created_at.isoformat(),
+        'created_at_display': timezone.localtime(message.created_at).strftime('%m/%d %H:%M'),
+        'is_read': message.is_read,
+    }
+    if staff is not None:
+        data['is_mine'] = message.sender_id == staff.id
+    return data
@@ -0,0 +1,75 @@
+"""
+期間指定のシフトデータ（列指向のコンパクトなJSON）
+スタッフ情報は1回だけ辞書として持ち、シフトは列ごとの配列（スタッフ番号・開始日オフセット・開始/終了分）で返す。
+日をまたぐシフトも1件として扱い、終了分は勤務日0時からの分数（1440 を超える）で表す
+"""
+from datetime import date, timedelta
+from typing import Dict, Optional
+from django.db.models import Q
+from shift.intervals import MINUTES_PER_DAY, shift_bounds
+from shift.models import Shift
+from shift.utils import get_staff_name_japanese
+
+DEFAULT_FEED_DAYS = 7
+MAX_FEED_DAYS = 92
+
+
+def build_shift_feed(store_id: int, start_date: date, end_date: date, staff_id: Optional[int] = None) -> Dict:
+    """
+    期間に勤務があるシフトを列指向で返す（前日以前に始まり期間内に続くシフトを含む）
+
+    Returns:
+        {
+            'from', 'to', 'days', 'prev_from', 'next_from',
+            'staff': {'id': [...], 'name': [...], 'is_manager': [...], 'hourly_wage': [...]},
+            'shifts': {'id': [...], 'staff': [スタッフ番号], 'day': [from からの日数（前日開始は負）],
+                       'start': [勤務日0時からの開始分], 'end': [勤務日0時からの終了分], 'confirmed': [0/1]},
+        }
+    """
+    shifts = Shift.objects.filter(
+        Q(date__range=[start_date, end_date])
+        | Q(date=start_date - timedelta(days=1))
+        | Q(date__lt=start_date, end_date__gte=start_date),
+        store_id=store_id
+    )
+    if staff_id is not None:
+        shifts = shifts.filter(staff_id=staff_id)
+    shifts = shifts.select_related('staff__user').only(
+        'date', 'start_time', 'end_time', 'end_date', 'is_confirmed', 'staff_id',
+        'staff__is_manager', 'staff__hourly_wage', 'staff__user__first_name',
+        'staff__user__last_name', 'staff__user__username',
+    ).order_by('date', 'start_time', 'id')
+
+    staff_index = {}
+    staff_columns = {'id': [], 'name': [], 'is_manager': [], 'hourly_wage': []}
+    columns = {'id': [], 'staff': [], 'day': [], 'start': [], 'end': [], 'confirmed': []}
+    for shift in shifts:
+        start, end = shift_bounds(shift)
+        day = (shift.date - start_date).days
+        if day < 0 and end <= -day * MINUTES_PER_DAY:
+            # 期間の前日に始まり、期間に入る前に終わるシフト
+            continue
+        index = staff_index.get(shift.staff_id)
+        if index is None:
+            index = staff_index[shift.staff_id] = len(staff_columns['id'])
+            staff_columns['id'].append(shift.staff_id)
+            staff_columns['name'].append(get_staff_name_japanese(shift.staff.user))
+            staff_columns['is_manager'].append(shift.staff.is_manager)
+            staff_columns['hourly_wage'].append(shift.staff.hourly_wage)
+        columns['id'].append(shift.id)
+        columns['staff'].append(index)
+        columns['day'].append(day)
+        columns['start'].append(start)
+        columns['end'].append(end)
+        columns['confirmed'].append(int(shift.is_confirmed))
+
+    days = (end_date - start_date).days + 1
+    return {
+        'from': start_date.strftime('%Y-%m-%d'),
+        'to': end_date.strftime('%Y-%m-%d'),
+        'days': days,
+        'prev_from': (start_date - timedelta(days=days)).strftime('%Y-%m-%d'),
+        'next_from': (end_date + timedelta(days=1)).strftime('%Y-%m-%d'),
+        'staff': staff_columns,
+        'shifts': columns,
+    }
@@ -0,0 +1,154 @@
+"""
+AIシフト生成の実行処理
+生成・制約チェック・保存までを1か所にまとめ、同期APIとバックグラウンドジョブの両方から使用する
+"""
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from django.db import transaction
+from accounts.models import Store
+from shift.ai_shift_generator import AIShiftGenerator
+from shift.models import Shift
+from shift.rollups import schedule_refresh_for_shifts
+from shift.solvers import BaseSolver
+from shift.tombstones import record_deleted_shifts
+
+
+class ShiftConstraintError(Exception):
+    """生成結果が制約（週間最大労働時間など）を満たさない"""
+
+    def __init__(self, details: List[str]):
+        super().__init__('シフト制約エラー')
+        self.details = details
+
+
+class GenerationCancelled(Exception):
+    """生成がキャンセルされた"""
+
+
+def bulk_save_shifts(generated_shifts: List[Dict], batch_size: int = 500) -> Tuple[int, int]:
+    """
+    生成結果をまとめて保存する
+
+    (スタッフ, 日付, 開始時刻) が既存シフトと重複するもの、および生成結果内で重複するものは
+    登録せずスキップする（従来の get_or_create と同じ扱い）
+
+    Returns:
+        (作成件数, スキップ件数)
+    """
+    if not generated_shifts:
+        return 0, 0
+
+    staff_ids = {shift_data['staff'].id for shift_data in generated_shifts}
+    dates = [shift_data['date'] for shift_data in generated_shifts]
+
+    with transaction.atomic():
+        taken = set(
+            Shift.objects.filter(
+                staff_id__in=staff_ids,
+                date__range=[min(dates), max(dates)]
+            ).values_list('staff_id', 'date', 'start_time')
+        )
+        new_shifts = []
+        for shift_data in generated_shifts:
+            key = (shift_data['staff'].id, shift_data['date'], shift_data['start_time'])
+            if key in taken:
+                continue
+            taken.add(key)
+            new_shifts.append(Shift(
+                store=shift_data['store'],
+                staff=shift_data['staff'],
+                date=shift_data['date'],
+                start_time=shift_data['start_time'],
+                end_time=shift_data['end_time'],
+                end_date=shift_data.get('end_date'),
+                is_confirmed=shift_data['is_confirmed'],
+            ))
+        Shift.objects.bulk_create(new_shifts, batch_size=batch_size)
+        # bulk_create はシグナルを送らないため日別集計の再計算を登録
+        schedule_refresh_for_shifts(new_shifts)
+
+    return len(new_shifts), len(generated_shifts) - len(new_shifts)
+
+
+def generate_and_save_shifts(
+    store: Store,
+    start_date: date,
+    end_date: date,
+    solver: Optional[BaseSolver] = None,
+    progress_callback: Optional[Callable[[int, str], None]] = None,
+    since: Optional[datetime] = None,
+    coverage_since: Optional[datetime] = None,
+) -> Dict:
+    """
+    シフトを生成して保存する
+
+    Args:
+        store: 店舗
+        start_date: 開始日
+        end_date: 終了日
+        solver: 使用するソルバー（省略時は設定のデフォルト）
+        progress_callback: 進捗通知 (進捗%, メッセージ)。GenerationCancelled を送出すると中断する。
+            呼び出すのは保存前の区切り（読み込み前・検証前・保存前）のみで、ソルバーの実行中
+            （最長でソルバーの制限時間）はキャンセルできない。保存後は呼び出さないため、
+            保存済みの結果がキャンセル扱いになることはない
+        since: 指定した場合は差分再生成（この日時以降に変更のあった日の未確定シフトのみ作り直す）
+        coverage_since: 差分再生成でシフトの変更を判定する基準日時（前回生成の終了日時、省略時は since）
+
+    Returns:
+        作成件数・人件費・ソルバー情報などの辞書
+
+    Raises:
+        ShiftConstraintError: 制約チェックでエラーがある場合
+    """
+    def report(progress, message):
+        if progress_callback:
+            progress_callback(progress, message)
+
+    report(5, '問題データを読み込んでいます')
+    generator = AIShiftGenerator(store, solver=solver)
+    if since is None:
+        generated_shifts = generator.generate_shifts(start_date, end_date)
+    else:
+        generated_shifts = generator.generate_incremental(start_date, end_date, since, coverage_since)
+    report(60, 'シフトを検証しています')
+
+    # 制約チェック
+    errors = generator.validate_shift_constraints(generated_shifts)
+    if errors:
+        raise ShiftConstraintError(errors)
+    # キャンセルを受け付ける最後の区切り（以降は保存完了まで中断しない）
+    report(70, 'シフトを保存しています')
+
+    # シフトを保存（既存シフトとの重複は1クエリで判定し、一括登録）
+    # 差分再生成の場合は作り直す未確定シフトの削除も同じトランザクションで行う
+    with transaction.atomic():
+        deleted_count = 0
+        if generator.released_shifts:
+            deleted_count, _ = Shift.objects.filter(
+                id__in=[shift.id for shift in generator.released_shifts],
+                is_confirmed=False
+            ).delete()
+            record_deleted_shifts(store.id, generator.released_shifts)
+        created_count, skipped_count = bulk_save_shifts(generated_shifts)
+
+    # 人件費計算
+    total_cost = generator.calculate_shift_cost(generated_shifts)
+
+    # 時間グリッド上の充足状況（不足している時間帯を警告として返す）
+    coverage_warnings = generator.coverage_report(generated_shifts).messages()
+
+    if since is None:
+        message = f'{created_count}件のシフトを生成しました。'
+    else:
+        message = f'{len(generator.snapshot.dates())}日分を再生成し、{created_count}件のシフトを作成しました。'
+
+    return {
+        'created_count': created_count,
+        'skipped_count': skipped_count,
+        'deleted_count': deleted_count,
+        'regenerated_dates': [d.strftime('%Y-%m-%d') for d in generator.snapshot.dates()] if since else None,
+        'total_cost': total_cost,
+        'solver': generator.last_result.as_dict(),
+        'coverage_warnings': coverage_warnings[:20],
+        'message': message
+    }
@@ -0,0 +1,91 @@
+"""
+シフトの時間区間計算
+日をまたぐシフトを暦日ごとの区間（開始・終了分、時間数、人件費の按分）に1回の走査で分割する。
+カレンダー・ガントチャート・ダッシュボード・人件費集計はこのモジュールを共通で使用する
+"""
+from datetime import date, timedelta
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def shift_bounds(shift) -> Tuple[int, int]:
+    """
+    シフトの開始・終了を勤務日0時からの分数で返す
+    終了日が勤務日より後ならその日の終了時刻、終了日がなく終了時刻が開始時刻以前なら翌日とみなす
+    """
+    start = shift.start_time.hour * 60 + shift.start_time.minute
+    end = shift.end_time.hour * 60 + shift.end_time.minute
+    end_date = getattr(shift, 'end_date', None)
+    if end_date and end_date > shift.date:
+        end += (end_date - shift.date).days * MINUTES_PER_DAY
+    elif end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def shift_minutes(shift) -> int:
+    """勤務時間（分）"""
+    start, end = shift_bounds(shift)
+    return end - start
+
+
+class DaySegment(NamedTuple):
+    """シフトの暦日ごとの区間"""
+    shift: object
+    date: date
+    start_minutes: int          # その日の0時からの開始分
+    end_minutes: int            # その日の0時からの終了分（最大1440）
+    hours: float                # この区間の時間数
+    cost: float                 # この区間の人件費（時給 × 時間数）
+    shift_hours: float          # シフト全体の時間数
+    shift_cost: float           # シフト全体の人件費
+    spans_midnight: bool        # シフト全体が日をまたぐか
+    is_continuation: bool       # 勤務日より後の日の区間か（前日から続く部分）
+
+
+def split_shift(shift, hourly_wage: Optional[float] = None,
+                start_date: Optional[date] = None, end_date: Optional[date] = None) -> Iterator[DaySegment]:
+    """
+    1件のシフトを暦日ごとの区間に分割（start_date〜end_date の範囲外の区間は返さない）
+
+    Args:
+        hourly_wage: 時給（省略時は shift.staff.hourly_wage）
+    """
+    start, end = shift_bounds(shift)
+    if hourly_wage is None:
+        hourly_wage = shift.staff.hourly_wage
+    shift_hours = (end - start) / 60
+    shift_cost = shift_hours * hourly_wage
+    spans_midnight = end > MINUTES_PER_DAY
+
+    day_offset = start // MINUTES_PER_DAY
+    while day_offset * MINUTES_PER_DAY < end:
+        day_start = day_offset * MINUTES_PER_DAY
+        segment_start = max(start, day_start) - day_start
+        segment_end = min(end, day_start + MINUTES_PER_DAY) - day_start
+        segment_date = shift.date + timedelta(days=day_offset)
+        if segment_end > segment_start and (start_date is None or segment_date >= start_date) \
+                and (end_date is None or segment_date <= end_date):
+            hours = (segment_end - segment_start) / 60
+            yield DaySegment(
+                shift=shift,
+                date=segment_date,
+                start_minutes=segment_start,
+                end_minutes=segment_end,
+                hours=hours,
+                cost=hours * hourly_wage,
+                shift_hours=shift_hours,
+                shift_cost=shift_cost,
+                spans_midnight=spans_midnight,
+                is_continuation=day_offset > 0,
+            )
+        day_offset += 1
+
+
+def split_shifts(shifts: Iterable, start_date: Optional[date] = None,
+                 end_date: Optional[date] = None) -> Iterator[DaySegment]:
+    """シフトの並びを暦日ごとの区間に分割（1回の走査）"""
+    for shift in shifts:
+        yield from split_shift(shift, start_date=start_date, end_date=end_date)
+
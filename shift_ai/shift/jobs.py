@@ -0,0 +1,186 @@
+"""
+AIシフト生成ジョブのキュー処理
+GenerationJob テーブルをキューとして使用し、ワーカー（run_generation_worker コマンド）が順に実行する
+（外部ブローカー不要）。ワーカーは期限切れの状態遷移（shift.sweeper）も定期的に適用する
+"""
+import logging
+import time
+from typing import Optional
+from django.db import close_old_connections
+from django.utils import timezone
+from shift.generation import GenerationCancelled, ShiftConstraintError, generate_and_save_shifts
+from shift.models import GenerationJob
+from shift.parallel import build_tasks, generate_parallel
+from shift.solvers import get_solver
+from shift.sweeper import run_sweeps
+
+logger = logging.getLogger(__name__)
+
+
+def submit_job(store, start_date, end_date, requested_by=None, solver='', time_limit=None,
+               mode='full', workers=None) -> GenerationJob:
+    """生成ジョブをキューに登録（workers は並列生成のワーカー数）"""
+    return GenerationJob.objects.create(
+        store=store,
+        requested_by=requested_by,
+        start_date=start_date,
+        end_date=end_date,
+        mode=mode,
+        solver=solver or '',
+        time_limit=time_limit,
+        workers=workers,
+        message='実行待ちです',
+    )
+
+
+def cancel_job(job: GenerationJob) -> GenerationJob:
+    """
+    ジョブのキャンセル（待機中なら即時、実行中なら次の区切りで中断）
+    ソルバーの実行中は終了を待ってから中断し、保存を始めたジョブはそのまま完了する
+    """
+    cancelled = GenerationJob.objects.filter(id=job.id, status='queued').update(
+        status='cancelled',
+        cancel_requested=True,
+        message='キャンセルしました',
+        finished_at=timezone.now(),
+    )
+    if not cancelled:
+        GenerationJob.objects.filter(id=job.id, status='running').update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def claim_next_job() -> Optional[GenerationJob]:
+    """待機中のジョブを1件取得して実行中にする（複数ワーカーでも二重実行しない）"""
+    for job_id in GenerationJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)[:10]:
+        claimed = GenerationJob.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            started_at=timezone.now(),
+            message='実行中です',
+        )
+        if claimed:
+            return GenerationJob.objects.select_related('store').get(id=job_id)
+    return None
+
+
+def previous_generation(job: GenerationJob) -> Optional[GenerationJob]:
+    """
+    差分再生成の基準にするジョブ（同じ店舗で期間が重なる直近の成功ジョブ）
+    希望の変更は実行中に更新されたものも次回の対象に含めるため開始日時から、
+    シフトの変更は前回生成が保存したシフトを含めないよう終了日時から判定する
+    """
+    return GenerationJob.objects.filter(
+        store_id=job.store_id,
+        status='succeeded',
+        start_date__lte=job.end_date,
+        end_date__gte=job.start_date,
+    ).exclude(id=job.id).order_by('-started_at').first()
+
+
+def run_parallel_job(job: GenerationJob) -> dict:
+    """
+    並列生成ジョブの実行（期間を週ごとに分割し、プロセスプールで生成・保存する）
+    各週の保存はワーカープロセスで行うため、開始後のキャンセルは受け付けない
+    """
+    if GenerationJob.objects.filter(id=job.id, cancel_requested=True).exists():
+        raise GenerationCancelled()
+    tasks = build_tasks([job.store_id], job.start_date, job.end_date, by_week=True)
+    GenerationJob.objects.filter(id=job.id).update(message=f'{len(tasks)}週分を並列に生成中です')
+    return generate_parallel(tasks, max_workers=job.workers, solver_name=job.solver or None,
+                             time_limit=job.time_limit)
+
+
+def run_job(job: GenerationJob) -> GenerationJob:
+    """ジョブを実行し、結果を保存"""
+    def progress_callback(progress, message):
+        if GenerationJob.objects.filter(id=job.id, cancel_requested=True).exists():
+            raise GenerationCancelled()
+        GenerationJob.objects.filter(id=job.id).update(progress=progress, message=message)
+
+    status = 'failed'
+    result = None
+    message = ''
+    try:
+        if job.mode == 'parallel':
+            result = run_parallel_job(job)
+            # 一部の週の失敗も週ごとの結果（result['results']）で確認できるよう失敗として残す
+            status = 'failed' if result['failed_count'] else 'succeeded'
+            message = (f"{result['task_count']}週分を生成しました"
+                       f"（{result['created_count']}件作成、失敗 {result['failed_count']}週）")
+        else:
+            solver = get_solver(job.solver or None, time_limit=job.time_limit)
+            # 差分再生成で前回の生成がない場合は全体を生成
+            previous = previous_generation(job) if job.mode == 'incremental' else None
+            result = generate_and_save_shifts(
+                job.store, job.start_date, job.end_date,
+                solver=solver, progress_callback=progress_callback,
+                since=previous.started_at if previous else None,
+                coverage_since=previous.finished_at if previous else None,
+            )
+            status = 'succeeded'
+            message = result['message']
+    except GenerationCancelled:
+        status = 'cancelled'
+        message = 'キャンセルしました'
+    except ShiftConstraintError as e:
+        result = {'error': 'シフト制約エラー', 'details': e.details}
+        message = 'シフト制約エラー'
+    except Exception as e:
+        logger.exception("Generation job %s failed", job.id)
+        result = {'error': str(e)}
+        message = 'エラーが発生しました'
+
+    updates = {
+        'status': status,
+        'message': message,
+        'result': result,
+        'finished_at': timezone.now(),
+    }
+    if status == 'succeeded':
+        updates['progress'] = 100
+    GenerationJob.objects.filter(id=job.id).update(**updates)
+    job.refresh_from_db()
+    return job
+
+
+def sweep(stdout=None):
+    """期限切れの状態遷移を適用（ワーカーを止めないよう例外はログのみ）"""
+    try:
+        results = run_sweeps()
+    except Exception:
+        logger.exception("Sweep failed")
+        return
+    if stdout and any(results.values()):
+        stdout.write('期限切れの更新: ' + ', '.join(f'{name} {count}件' for name, count in results.items() if count))
+
+
+def run_worker(poll_interval: float = 2.0, once: bool = False, stdout=None,
+               sweep_interval: Optional[float] = 60.0) -> int:
+    """
+    キューのジョブを順に実行するワーカーループ
+
+    Args:
+        poll_interval: キューが空のときの待機秒数
+        once: True の場合はキューが空になった時点で終了
+        sweep_interval: 期限切れの状態遷移を適用する間隔（秒、None で適用しない）
+
+    Returns:
+        実行したジョブ数
+    """
+    processed = 0
+    last_sweep = None
+    while True:
+        close_old_connections()
+        if sweep_interval is not None and (last_sweep is None or time.monotonic() - last_sweep >= sweep_interval):
+            sweep(stdout)
+            last_sweep = time.monotonic()
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        job = run_job(job)
+        processed += 1
+        if stdout:
+            stdout.write(f"ジョブ {job.id}: {job.get_status_display()} - {job.message}")
@@ -0,0 +1,226 @@
+"""
+チャットのリアルタイム配信（Server-Sent Events）
+新しいメッセージと既読をチャンネルレイヤー経由で接続中の参加者へ配信する。
+
+チャンネルレイヤー:
+    InMemoryChannelLayer: プロセス内（デフォルト、ASGIサーバーを1プロセスで起動する場合）
+    RedisChannelLayer: Redis の Pub/Sub（複数プロセス・生成ワーカーからの配信、redis パッケージが必要）
+
+設定:
+    CHAT_CHANNEL_LAYER: {'BACKEND': 'shift.live.RedisChannelLayer', 'OPTIONS': {'url': 'redis://localhost:6379/0'}}
+    CHAT_STREAM_HEARTBEAT: 接続維持のコメントを送る間隔（秒、デフォルト 15）
+    CHAT_STREAM_MAX_SECONDS: 1回の接続の最長時間（秒、デフォルト 300、以降はブラウザが自動で再接続する）
+
+配信は ASGI サーバー（uvicorn / daphne 等）で起動した場合のみ有効。
+WSGI（runserver 等）では 204 を返し、画面は新着取得APIのポーリングを続ける
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+SUBSCRIBER_QUEUE_SIZE = 100
+RETRY_MILLISECONDS = 3000
+
+
+def room_group(room_id: int) -> str:
+    """チャットルームの配信グループ名"""
+    return f'chat-room-{room_id}'
+
+
+class InMemoryChannelLayer:
+    """プロセス内のチャンネルレイヤー（同期コードから publish、イベントループ側で subscribe）"""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._groups: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, group: str, event: Dict):
+        with self._lock:
+            subscribers = list(self._groups.get(group, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # イベントループが終了済み（接続の後始末前）
+                continue
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: Dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 受信が追いつかない接続は溜まったイベントを捨て、画面側で新着を取り直させる
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({'type': 'resync'})
+
+    @asynccontextmanager
+    async def subscribe(self, group: str):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._groups.setdefault(group, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                members = self._groups.get(group)
+                if members is not None:
+                    members.discard(subscriber)
+                    if not members:
+                        del self._groups[group]
+
+
+class RedisChannelLayer:
+    """Redis の Pub/Sub を使うチャンネルレイヤー（Redis 互換サーバーであれば可）"""
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', prefix: str = 'shift_ai:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisChannelLayer を使うには redis パッケージが必要です。')
+        self.url = url
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, group: str, event: Dict):
+        self._client.publish(self.prefix + group, json.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self, group: str):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.prefix + group)
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+        async def reader():
+            async for item in pubsub.listen():
+                if item['type'] == 'message':
+                    InMemoryChannelLayer._put(queue, json.loads(item['data']))
+
+        task = asyncio.create_task(reader())
+        try:
+            yield queue
+        finally:
+            task.cancel()
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_channel_layer():
+    """設定に従ったチャンネルレイヤー（プロセス内で1つ）"""
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                config = getattr(settings, 'CHAT_CHANNEL_LAYER', {})
+                backend = import_string(config.get('BACKEND', 'shift.live.InMemoryChannelLayer'))
+                _layer = backend(**config.get('OPTIONS', {}))
+    return _layer
+
+
+def _publish_on_commit(room_id: int, event: Dict):
+    transaction.on_commit(lambda: get_channel_layer().publish(room_group(room_id), event))
+
+
+def publish_message(message_data: Dict, room_id: int):
+    """新しいメッセージを配信（コミット後）"""
+    _publish_on_commit(room_id, {'type': 'message', 'message': message_data})
+
+
+def publish_read(room_id: int, reader_id: int):
+    """既読を配信（コミット後）"""
+    _publish_on_commit(room_id, {'type': 'read', 'reader_id': reader_id})
+
+
+def _sse(event: str, data: Dict, event_id: Optional[str] = None) -> str:
+    lines = [f'id: {event_id}'] if event_id else []
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
+
+
+def _message_event(message_data: Dict, staff) -> str:
+    data = dict(message_data, is_mine=message_data['sender_id'] == staff.id)
+    return _sse('message', data, data['cursor'])
+
+
+async def _event_stream(room, staff, after: Optional[str]):
+    from shift import chat
+
+    heartbeat = getattr(settings, 'CHAT_STREAM_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'CHAT_STREAM_MAX_SECONDS', 300)
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+    async with get_channel_layer().subscribe(room_group(room.id)) as queue:
+        # 購読開始までの取りこぼしを補う（重複は画面側でメッセージIDにより除外）
+        if after:
+            missed, _ = await sync_to_async(chat.messages_after)(room, after)
+            for message in missed:
+                yield _message_event(chat.message_json(message), staff)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(queue.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['type'] == 'message':
+                yield _message_event(event['message'], staff)
+            else:
+                yield _sse(event['type'], event)
+
+
+async def chat_stream_response(request, room_id: int, managers_only: bool = False):
+    """
+    チャットルームのイベントストリーム（text/event-stream）
+    再接続時は Last-Event-ID（初回は ?after=カーソル）以降のメッセージを先に送る
+    """
+    from accounts.models import Staff
+    from shift import chat
+
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'ログインが必要です。'}, status=401)
+    staff = await Staff.objects.filter(user=user).afirst()
+    if staff is None:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    if managers_only and not staff.is_manager:
+        return JsonResponse({'error': '管理者権限が必要です。'}, status=403)
+
+    room = await sync_to_async(chat.get_participant_room)(staff, room_id)
+    if room is None:
+        return JsonResponse({'error': 'このチャットルームにアクセスする権限がありません。'}, status=403)
+
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    if after:
+        try:
+            chat.decode_cursor(after)
+        except chat.InvalidCursor:
+            return JsonResponse({'error': '無効なカーソルです。'}, status=400)
+
+    response = StreamingHttpResponse(_event_stream(room, staff, after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
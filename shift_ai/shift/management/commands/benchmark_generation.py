@@ -0,0 +1,173 @@
+"""
+シフト生成と主要な管理画面の処理時間を計測するコマンド
+
+使用方法:
+    python manage.py benchmark_generation
+    python manage.py benchmark_generation --scales 10 30 100 150 --solvers greedy cpsat --output benchmark.json
+
+スタッフ数ごとにベンチマーク用の店舗を作成し（seed_large_dataset と同じデータ）、
+生成・制約チェック・人件費計算・管理画面の所要時間とクエリ数を計測してJSONで出力します。
+管理画面はカレンダーキャッシュなし（cold）とキャッシュ済み（warm）の両方を計測します。
+計測後、作成した店舗は削除されます（--keep で残す）。
+"""
+
+import json
+import os
+import platform
+import time as time_module
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Staff
+from shift.ai_shift_generator import AIShiftGenerator
+from shift.benchmark_data import clear_dataset, generation_month, month_end, parse_month, seed_dataset
+from shift.models import ShiftRequest
+from shift.solvers import cpsat_available, get_solver
+
+BENCHMARK_PREFIX = 'ベンチマーク計測'
+
+
+def measure(func, repeat=1, before_each=None):
+    """
+    関数を repeat 回実行し、最短時間（秒）・クエリ数・最後の戻り値を返す
+    before_each は各回の実行前に計測の外で呼ぶ（キャッシュの削除など）
+    """
+    best = None
+    result = None
+    queries = 0
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        with CaptureQueriesContext(connection) as captured:
+            started = time_module.perf_counter()
+            result = func()
+            elapsed = time_module.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        queries = len(captured.captured_queries)
+    return {'seconds': round(best, 4), 'queries': queries}, result
+
+
+class Command(BaseCommand):
+    help = 'シフト生成と管理画面の処理時間をスタッフ数ごとに計測します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[10, 30, 100], help='計測するスタッフ数')
+        parser.add_argument('--months', type=int, default=2, help='作成する月数（最終月を生成対象にする）')
+        parser.add_argument('--start', default=None, help='開始月（YYYY-MM、省略時は来月）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+        parser.add_argument('--solvers', nargs='+', default=None, help='計測するソルバー（省略時は利用可能なもの全て）')
+        parser.add_argument('--time-limit', type=float, default=None, help='ソルバーの制限時間（秒）')
+        parser.add_argument('--repeat', type=int, default=1, help='各計測の繰り返し回数（最短時間を採用）')
+        parser.add_argument('--skip-views', action='store_true', help='管理画面の計測を行わない')
+        parser.add_argument('--output', default=None, help='結果JSONの出力先（省略時は標準出力）')
+        parser.add_argument('--keep', action='store_true', help='計測用の店舗を削除しない')
+
+    def handle(self, *args, **options):
+        start_month = parse_month(options['start'])
+        target_month = generation_month(start_month, options['months'])
+        target_end = month_end(target_month)
+        solvers = options['solvers'] or (['greedy', 'cpsat'] if cpsat_available() else ['greedy'])
+
+        clear_dataset(BENCHMARK_PREFIX)
+        results = []
+        try:
+            for scale in options['scales']:
+                self.stderr.write(f"スタッフ{scale}人を計測中...")
+                seed_seconds = time_module.perf_counter()
+                store = seed_dataset(
+                    stores=1,
+                    staff_per_store=scale,
+                    months=options['months'],
+                    start_month=start_month,
+                    seed=options['seed'],
+                    prefix=BENCHMARK_PREFIX,
+                )[0]
+                seed_seconds = time_module.perf_counter() - seed_seconds
+
+                entry = {
+                    'staff': scale,
+                    'store_id': store.id,
+                    'requests': ShiftRequest.objects.filter(staff__store=store, date__range=[target_month, target_end]).count(),
+                    'seed_seconds': round(seed_seconds, 3),
+                    'solvers': {},
+                    'views': {},
+                }
+
+                for solver_name in solvers:
+                    generator = AIShiftGenerator(store, solver=get_solver(solver_name, time_limit=options['time_limit']))
+                    generate, shifts = measure(lambda: generator.generate_shifts(target_month, target_end), options['repeat'])
+                    validate, errors = measure(lambda: generator.validate_shift_constraints(shifts), options['repeat'])
+                    cost, total_cost = measure(lambda: generator.calculate_shift_cost(shifts), options['repeat'])
+                    entry['solvers'][solver_name] = {
+                        'generate_shifts': generate,
+                        'validate_shift_constraints': validate,
+                        'calculate_shift_cost': cost,
+                        'shift_count': len(shifts),
+                        'constraint_errors': len(errors),
+                        'total_cost': total_cost,
+                        'result': generator.last_result.as_dict(),
+                    }
+
+                if not options['skip_views']:
+                    entry['views'] = self.measure_views(store, target_month, options['repeat'])
+
+                results.append(entry)
+        finally:
+            if not options['keep']:
+                clear_dataset(BENCHMARK_PREFIX)
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cpu_count': os.cpu_count(),
+            },
+            'parameters': {
+                'scales': options['scales'],
+                'months': options['months'],
+                'target_month': target_month.strftime('%Y-%m'),
+                'seed': options['seed'],
+                'solvers': solvers,
+                'time_limit': options['time_limit'],
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stderr.write(self.style.SUCCESS(f"✓ 結果を {options['output']} に出力しました"))
+        else:
+            self.stdout.write(output)
+
+    def measure_views(self, store, target_month, repeat):
+        """管理画面（責任者でログイン）の所要時間とクエリ数"""
+        manager = Staff.objects.filter(store=store, is_manager=True).select_related('user').first()
+        client = Client()
+        client.force_login(manager.user)
+        year, month = target_month.year, target_month.month
+        urls = {
+            'shift_creation': f"{reverse('admin_shift:shift_creation')}?year={year}&month={month}",
+            'shift_calendar': f"{reverse('admin_shift:shift_calendar')}?year={year}&month={month}",
+            'submission_status': f"{reverse('admin_shift:submission_status')}?month={target_month.strftime('%Y-%m')}",
+            'shift_detail_by_date': reverse(
+                'admin_shift:shift_detail_by_date', args=[target_month.strftime('%Y-%m-%d')]
+            ),
+        }
+        # カレンダーキャッシュを毎回削除した計測（cold）と、直前の表示でキャッシュ済みの計測（warm）を分けて出力する
+        calendar_cache = caches[settings.CALENDAR_CACHE_ALIAS]
+        timings = {}
+        for name, url in urls.items():
+            cold, response = measure(lambda: client.get(url), repeat, before_each=calendar_cache.clear)
+            warm, response = measure(lambda: client.get(url), repeat)
+            timings[name] = {'cold': cold, 'warm': warm, 'status': response.status_code}
+        return timings
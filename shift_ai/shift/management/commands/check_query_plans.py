@@ -0,0 +1,39 @@
+"""
+主要な画面のクエリが索引を使っているかを確認するコマンド
+
+使用方法:
+    python manage.py check_query_plans
+    python manage.py check_query_plans --verbose   # 実行計画も表示
+
+索引を使わずにテーブルを全件走査するクエリがあれば失敗します（SQLite / PostgreSQL）。
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from shift_ai.query_plans import check_query_plans
+
+
+class Command(BaseCommand):
+    help = '主要なクエリの実行計画が索引を使っているか確認します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose', action='store_true', help='実行計画を表示する')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'データベース: {connection.vendor}')
+        results = check_query_plans()
+        for result in results:
+            if result.ok:
+                self.stdout.write(self.style.SUCCESS(f'  OK   {result.name}'))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f"  NG   {result.name}: 全件走査 {', '.join(result.full_scans)}"
+                ))
+            if options['verbose'] or not result.ok:
+                for line in result.plan.splitlines():
+                    self.stdout.write(f'         {line}')
+
+        failed = [result.name for result in results if not result.ok]
+        if failed:
+            raise CommandError(f"{len(failed)}件のクエリが索引を使用していません: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS(f'{len(results)}件のクエリがすべて索引を使用しています。'))
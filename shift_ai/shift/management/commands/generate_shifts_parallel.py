@@ -0,0 +1,72 @@
+"""
+複数店舗のシフトを並列生成するコマンド
+
+使用方法:
+    python manage.py generate_shifts_parallel --start 2026-11-01 --end 2026-11-30
+    python manage.py generate_shifts_parallel --start 2026-11-01 --end 2026-11-30 --stores 1 2 --by-week --workers 4
+    python manage.py generate_shifts_parallel --start 2026-11-01 --end 2026-11-30 --json   # 結果をJSONで出力
+
+店舗（--by-week 指定時は店舗×週）ごとにプロセスを分けて生成・保存し、所要時間を表示します。
+"""
+
+import json
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Store
+from shift.parallel import build_tasks, generate_parallel
+
+
+class Command(BaseCommand):
+    help = '複数店舗のAIシフトを並列に生成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='開始日（YYYY-MM-DD）')
+        parser.add_argument('--end', required=True, help='終了日（YYYY-MM-DD）')
+        parser.add_argument('--stores', type=int, nargs='*', help='対象店舗ID（省略時は全店舗）')
+        parser.add_argument('--by-week', action='store_true', help='週ごとに分割して並列化する')
+        parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数（省略時はCPU数）')
+        parser.add_argument('--solver', default=None, help='ソルバー名（greedy / cpsat / auto）')
+        parser.add_argument('--time-limit', type=float, default=None, help='ソルバーの制限時間（秒）')
+        parser.add_argument('--json', action='store_true', help='結果をJSONで出力する')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('日付は YYYY-MM-DD 形式で指定してください。')
+        if start_date > end_date:
+            raise CommandError('開始日は終了日以前にしてください。')
+
+        stores = Store.objects.order_by('id')
+        if options['stores']:
+            stores = stores.filter(id__in=options['stores'])
+        store_names = dict(stores.values_list('id', 'name'))
+        if not store_names:
+            raise CommandError('対象の店舗がありません。')
+
+        tasks = build_tasks(list(store_names), start_date, end_date, by_week=options['by_week'])
+        summary = generate_parallel(
+            tasks,
+            max_workers=options['workers'],
+            solver_name=options['solver'],
+            time_limit=options['time_limit'],
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, ensure_ascii=False, indent=2))
+            return
+
+        for result in summary['results']:
+            label = f"{store_names.get(result['store_id'], result['store_id'])} {result['start_date']}〜{result['end_date']}"
+            if result['success']:
+                self.stdout.write(
+                    f"{label}: {result['created_count']}件作成 / {result['elapsed']:.2f}秒"
+                )
+            else:
+                self.stdout.write(self.style.ERROR(f"{label}: {result['error']} / {result['elapsed']:.2f}秒"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {summary['task_count']}タスク（ワーカー{summary['workers']}） "
+            f"{summary['created_count']}件作成 / 合計 {summary['elapsed']:.2f}秒"
+        ))
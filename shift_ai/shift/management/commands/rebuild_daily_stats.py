@@ -0,0 +1,36 @@
+"""
+日別シフト集計（DailyStoreStats）を作り直すコマンド
+
+使用方法:
+    python manage.py rebuild_daily_stats
+    python manage.py rebuild_daily_stats --stores 1 2 --start 2026-11-01 --end 2026-11-30
+
+通常はシフトの保存・削除時とスタッフの時給の変更時に自動で更新されます。マイグレーション直後や、
+QuerySet.update などシグナルを送らない方法で時給を変更した場合に実行してください。
+"""
+
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from shift.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = '日別シフト集計をシフトから作り直します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, nargs='*', help='対象店舗ID（省略時は全店舗）')
+        parser.add_argument('--start', default=None, help='開始日（YYYY-MM-DD、省略時は最初のシフト）')
+        parser.add_argument('--end', default=None, help='終了日（YYYY-MM-DD、省略時は最後のシフト）')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('日付は YYYY-MM-DD 形式で指定してください。')
+        if start_date and end_date and start_date > end_date:
+            raise CommandError('開始日は終了日以前にしてください。')
+
+        self.stdout.write('日別シフト集計を作り直しています...')
+        count = rebuild_daily_stats(options['stores'], start_date, end_date, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'{count}日分の集計を作成しました。'))
@@ -0,0 +1,33 @@
+"""
+AIシフト生成ジョブのワーカーを起動するコマンド
+
+使用方法:
+    python manage.py run_generation_worker
+    python manage.py run_generation_worker --once   # キューが空になったら終了（cron用）
+
+管理画面から登録された生成ジョブを順に実行します。
+期限切れのシフト交代募集の締切など（sweep_expired と同じ処理）も --sweep-interval 秒ごとに適用します。
+"""
+
+from django.core.management.base import BaseCommand
+from shift.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'AIシフト生成ジョブのワーカーを起動します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='キューが空になったら終了する')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='キューが空のときの待機秒数')
+        parser.add_argument('--sweep-interval', type=float, default=60.0,
+                            help='期限切れの状態を更新する間隔（秒、0 で更新しない）')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("シフト生成ワーカーを起動しました"))
+        processed = run_worker(
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+            stdout=self.stdout,
+            sweep_interval=options['sweep_interval'] or None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"✓ {processed}件のジョブを実行しました"))
@@ -0,0 +1,57 @@
+"""
+ベンチマーク用の大規模データを作成するコマンド
+
+使用方法:
+    python manage.py seed_large_dataset --stores 3 --staff 100 --months 3
+    python manage.py seed_large_dataset --stores 1 --staff 150 --months 2 --start 2026-11 --seed 42
+    python manage.py seed_large_dataset --clear   # 作成済みのベンチマーク店舗を削除
+
+最終月は希望シフトのみ、それより前の月は確定シフト・勤怠記録・評価を作成します。
+スタッフのログインIDは社員ID（b<シード>s<店舗ID>n<番号>）、パスワードは benchmark です。
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from shift.benchmark_data import DEFAULT_STORE_PREFIX, clear_dataset, parse_month, seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'ベンチマーク用の大規模データ（店舗×スタッフ×月）を作成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, default=1, help='店舗数')
+        parser.add_argument('--staff', type=int, default=30, help='1店舗あたりのスタッフ数')
+        parser.add_argument('--months', type=int, default=2, help='月数（最終月は希望シフトのみ）')
+        parser.add_argument('--start', default=None, help='開始月（YYYY-MM、省略時は来月）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+        parser.add_argument('--prefix', default=DEFAULT_STORE_PREFIX, help='店舗名の接頭辞')
+        parser.add_argument('--clear', action='store_true', help='同じ接頭辞の店舗を削除してから作成する（件数0なら削除のみ）')
+
+    def handle(self, *args, **options):
+        try:
+            start_month = parse_month(options['start'])
+        except ValueError:
+            raise CommandError('開始月は YYYY-MM 形式で指定してください。')
+
+        if options['clear']:
+            removed = clear_dataset(options['prefix'])
+            self.stdout.write(f"✓ {removed}店舗を削除しました")
+            if options['stores'] <= 0:
+                return
+
+        if options['stores'] <= 0 or options['staff'] <= 0 or options['months'] <= 0:
+            raise CommandError('店舗数・スタッフ数・月数は1以上を指定してください。')
+
+        self.stdout.write(
+            f"{options['stores']}店舗 × {options['staff']}人 × {options['months']}か月 "
+            f"（{start_month.strftime('%Y-%m')}〜、シード{options['seed']}）を作成します"
+        )
+        stores = seed_dataset(
+            stores=options['stores'],
+            staff_per_store=options['staff'],
+            months=options['months'],
+            start_month=start_month,
+            seed=options['seed'],
+            prefix=options['prefix'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f"✓ {len(stores)}店舗のデータを作成しました"))
@@ -0,0 +1,37 @@
+"""
+期限切れの状態遷移（シフト交代募集の締切など）を適用するコマンド
+
+使用方法:
+    python manage.py sweep_expired
+    python manage.py sweep_expired --only close_expired_swaps --batch-size 200
+    python manage.py sweep_expired --dry-run   # 対象件数のみ表示
+
+cron で定期的に実行するか、生成ワーカー（run_generation_worker）に任せてください。
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from shift.sweeper import DEFAULT_BATCH_SIZE, SWEEPS, run_sweeps
+
+
+class Command(BaseCommand):
+    help = '期限切れのシフト交代募集などの状態をまとめて更新します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='*', help='実行する遷移（' + ', '.join(s.name for s in SWEEPS) + '）')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='1回に更新する件数')
+        parser.add_argument('--dry-run', action='store_true', help='更新せず対象件数のみ表示する')
+
+    def handle(self, *args, **options):
+        names = options['only']
+        unknown = set(names or ()) - {sweep.name for sweep in SWEEPS}
+        if unknown:
+            raise CommandError(f"不明な遷移です: {', '.join(sorted(unknown))}")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size は1以上にしてください。')
+
+        results = run_sweeps(names, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        label = '対象' if options['dry_run'] else '更新'
+        for sweep in SWEEPS:
+            if sweep.name in results:
+                self.stdout.write(f"  {sweep.description}: {label} {results[sweep.name]}件")
+        self.stdout.write(self.style.SUCCESS(f"{label}件数の合計: {sum(results.values())}件"))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_announcement'),
+        ('shift', '0005_chatroom_chatmessage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shiftrequest',
+            name='request_type',
+            field=models.CharField(choices=[('work', '勤務希望')], max_length=20, verbose_name='種別'),
+        ),
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(verbose_name='生成開始日')),
+                ('end_date', models.DateField(verbose_name='生成終了日')),
+                ('solver', models.CharField(blank=True, max_length=20, verbose_name='ソルバー')),
+                ('time_limit', models.FloatField(blank=True, null=True, verbose_name='制限時間（秒）')),
+                ('status', models.CharField(choices=[('queued', '待機中'), ('running', '実行中'), ('succeeded', '完了'), ('failed', '失敗'), ('cancelled', 'キャンセル')], default='queued', max_length=20, verbose_name='状態')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='進捗（%）')),
+                ('message', models.CharField(blank=True, max_length=200, verbose_name='メッセージ')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='結果')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='キャンセル要求')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='終了日時')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_jobs', to='accounts.staff', verbose_name='依頼者')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.store', verbose_name='店舗')),
+            ],
+            options={
+                'verbose_name': 'シフト生成ジョブ',
+                'verbose_name_plural': 'シフト生成ジョブ',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
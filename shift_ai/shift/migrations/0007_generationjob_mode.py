@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift', '0006_alter_shiftrequest_request_type_generationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='mode',
+            field=models.CharField(choices=[('full', '全体生成'), ('incremental', '差分再生成')], default='full', max_length=20, verbose_name='生成方法'),
+        ),
+    ]
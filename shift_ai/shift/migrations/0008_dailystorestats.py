@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_announcement'),
+        ('shift', '0007_generationjob_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStoreStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('staff_count', models.PositiveIntegerField(default=0, verbose_name='勤務人数')),
+                ('shift_count', models.PositiveIntegerField(default=0, verbose_name='シフト数')),
+                ('confirmed_count', models.PositiveIntegerField(default=0, verbose_name='確定シフト数')),
+                ('pending_count', models.PositiveIntegerField(default=0, verbose_name='未確定シフト数')),
+                ('hours', models.FloatField(default=0, verbose_name='勤務時間')),
+                ('confirmed_hours', models.FloatField(default=0, verbose_name='確定勤務時間')),
+                ('cost', models.FloatField(default=0, verbose_name='人件費')),
+                ('confirmed_cost', models.FloatField(default=0, verbose_name='確定人件費')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='accounts.store', verbose_name='店舗')),
+            ],
+            options={
+                'verbose_name': '日別シフト集計',
+                'verbose_name_plural': '日別シフト集計',
+                'ordering': ['date'],
+                'unique_together': {('store', 'date')},
+            },
+        ),
+    ]
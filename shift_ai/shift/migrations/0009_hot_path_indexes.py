@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_announcement'),
+        ('shift', '0008_dailystorestats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'is_read', 'sender'], name='chatmessage_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['store', 'date', 'end_date'], name='shift_store_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['store', 'end_date'], name='shift_store_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftrequest',
+            index=models.Index(fields=['date', 'staff'], name='shiftrequest_date_staff_idx'),
+        ),
+    ]
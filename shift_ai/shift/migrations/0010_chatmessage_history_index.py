@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_announcement'),
+        ('shift', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'created_at', 'id'], name='chatmessage_history_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_announcement'),
+        ('shift', '0010_chatmessage_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('shift_request', '希望シフト'), ('shift', 'シフト')], max_length=20, verbose_name='種別')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('end_date', models.DateField(verbose_name='終了日')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='削除日時')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_tombstones', to='accounts.store', verbose_name='店舗')),
+            ],
+            options={
+                'verbose_name': '削除記録',
+                'verbose_name_plural': '削除記録',
+                'indexes': [models.Index(fields=['store', 'kind', 'deleted_at'], name='tombstone_store_kind_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shift', '0011_schedule_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='workers',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='並列数'),
+        ),
+        migrations.AlterField(
+            model_name='generationjob',
+            name='mode',
+            field=models.CharField(choices=[('full', '全体生成'), ('incremental', '差分再生成'), ('parallel', '週ごとの並列生成')], default='full', max_length=20, verbose_name='生成方法'),
+        ),
+    ]
@@ -1,7 +1,80 @@
+from datetime import timedelta
 from django.db import models
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, ExtractHour, ExtractMinute, TruncMonth
 from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import Store, Staff
 
+# 終了日で扱う日またぎの最大日数（これより長いシフトは終了時刻のみで判定）
+MAX_SHIFT_SPAN_DAYS = 7
+
+
+class ShiftQuerySet(models.QuerySet):
+    """
+    勤務時間・人件費をデータベース側で計算するクエリセット
+    intervals.shift_bounds と同じ規則（終了日があればその日の終了時刻、なければ終了時刻が開始時刻以前で翌日）で
+    SQLite・PostgreSQL の両方で動く式を組み立てる
+    """
+    # totals_by で指定できる集計単位
+    GROUP_FIELDS = {
+        'store': 'store_id',
+        'staff': 'staff_id',
+        'day': 'date',
+        'month': 'month',
+    }
+
+    @staticmethod
+    def minutes_expression():
+        """勤務時間（分）の式"""
+        start = ExtractHour('start_time') * 60 + ExtractMinute('start_time')
+        end = ExtractHour('end_time') * 60 + ExtractMinute('end_time')
+        day_offset = Case(
+            *[
+                When(end_date=F('date') + timedelta(days=days), then=Value(days * 24 * 60))
+                for days in range(1, MAX_SHIFT_SPAN_DAYS + 1)
+            ],
+            When(end_time__lte=F('start_time'), then=Value(24 * 60)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        return ExpressionWrapper(end - start + day_offset, output_field=IntegerField())
+
+    def with_cost(self):
+        """勤務時間（labor_minutes, labor_hours）と人件費（labor_cost）を注釈"""
+        return self.annotate(labor_minutes=self.minutes_expression()).annotate(
+            labor_hours=ExpressionWrapper(F('labor_minutes') / Value(60.0), output_field=FloatField()),
+            labor_cost=ExpressionWrapper(
+                F('labor_minutes') * F('staff__hourly_wage') / Value(60.0), output_field=FloatField()
+            ),
+        )
+
+    def _total_expressions(self):
+        return {
+            'shift_count': Count('id'),
+            'hours': Coalesce(Sum('labor_hours'), Value(0.0), output_field=FloatField()),
+            'cost': Coalesce(Sum('labor_cost'), Value(0.0), output_field=FloatField()),
+        }
+
+    def totals(self):
+        """シフト件数・合計時間・合計人件費（1クエリ）"""
+        return self.with_cost().aggregate(**self._total_expressions())
+
+    def totals_by(self, group):
+        """
+        集計単位（store / staff / day / month）ごとのシフト件数・合計時間・合計人件費（1クエリ）
+
+        Returns:
+            {集計単位の値: {'shift_count', 'hours', 'cost'}} の辞書（month は月初日）
+        """
+        field = self.GROUP_FIELDS[group]
+        queryset = self.with_cost()
+        if group == 'month':
+            queryset = queryset.annotate(month=TruncMonth('date'))
+        rows = queryset.order_by().values(field).annotate(**self._total_expressions())
+        return {row.pop(field): row for row in rows}
+
 
 class Shift(models.Model):
     """シフトモデル"""
@@ -15,10 +88,17 @@ class Shift(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShiftQuerySet.as_manager()
+
     class Meta:
         verbose_name = "シフト"
         verbose_name_plural = "シフト"
         unique_together = ['staff', 'date', 'start_time']
+        # (staff, date) は unique_together の先頭列で検索できる
+        indexes = [
+            models.Index(fields=['store', 'date', 'end_date'], name='shift_store_date_idx'),
+            models.Index(fields=['store', 'end_date'], name='shift_store_end_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.staff.user.get_full_name()} - {self.date} {self.start_time}-{self.end_time}"
@@ -26,13 +106,8 @@ class Shift(models.Model):
     @property
     def duration_hours(self):
         """勤務時間を計算"""
-        from datetime import datetime, timedelta
-        start_datetime = datetime.combine(self.date, self.start_time)
-        end_date = self.end_date if self.end_date else self.date
-        end_datetime = datetime.combine(end_date, self.end_time)
-        if end_datetime <= start_datetime:
-            end_datetime += timedelta(days=1)
-        return (end_datetime - start_datetime).total_seconds() / 3600
+        from shift.intervals import shift_minutes
+        return shift_minutes(self) / 60
 
     @property
     def wage_cost(self):
@@ -40,6 +115,34 @@ class Shift(models.Model):
         return self.duration_hours * self.staff.hourly_wage
 
 
+class DailyStoreStats(models.Model):
+    """
+    店舗×日のシフト集計（カレンダー・ダッシュボード表示用のロールアップ）
+    人数・時間・人件費は日をまたぐシフトを暦日ごとに按分した値、シフト件数は勤務日（開始日）で計上する。
+    シフトの保存・削除時に shift.rollups で更新される
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='daily_stats', verbose_name="店舗")
+    date = models.DateField(verbose_name="日付")
+    staff_count = models.PositiveIntegerField(default=0, verbose_name="勤務人数")
+    shift_count = models.PositiveIntegerField(default=0, verbose_name="シフト数")
+    confirmed_count = models.PositiveIntegerField(default=0, verbose_name="確定シフト数")
+    pending_count = models.PositiveIntegerField(default=0, verbose_name="未確定シフト数")
+    hours = models.FloatField(default=0, verbose_name="勤務時間")
+    confirmed_hours = models.FloatField(default=0, verbose_name="確定勤務時間")
+    cost = models.FloatField(default=0, verbose_name="人件費")
+    confirmed_cost = models.FloatField(default=0, verbose_name="確定人件費")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "日別シフト集計"
+        verbose_name_plural = "日別シフト集計"
+        unique_together = ['store', 'date']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.store.name} - {self.date} ({self.staff_count}人)"
+
+
 class ShiftRequest(models.Model):
     """希望シフトモデル"""
     REQUEST_TYPE_CHOICES = [
@@ -64,11 +167,42 @@ class ShiftRequest(models.Model):
         verbose_name = "希望シフト"
         verbose_name_plural = "希望シフト"
         unique_together = ['staff', 'date', 'request_type']
+        # (staff, date) は unique_together、店舗単位の期間検索は日付から絞り込む
+        indexes = [
+            models.Index(fields=['date', 'staff'], name='shiftrequest_date_staff_idx'),
+        ]
 
     def __str__(self):
         return f"{self.staff.user.get_full_name()} - {self.date} ({self.get_request_type_display()})"
 
 
+class ScheduleTombstone(models.Model):
+    """
+    削除された希望シフト・シフトの記録（差分再生成で削除のあった日を判定するため）
+    削除を行う箇所から shift.tombstones でまとめて作成し、古いものは shift.sweeper で削除する
+    """
+    KIND_CHOICES = [
+        ('shift_request', '希望シフト'),
+        ('shift', 'シフト'),
+    ]
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='schedule_tombstones', verbose_name="店舗")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="種別")
+    date = models.DateField(verbose_name="日付")
+    end_date = models.DateField(verbose_name="終了日")  # 日をまたぐ場合は翌日
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="削除日時")
+
+    class Meta:
+        verbose_name = "削除記録"
+        verbose_name_plural = "削除記録"
+        indexes = [
+            models.Index(fields=['store', 'kind', 'deleted_at'], name='tombstone_store_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.store.name} - {self.get_kind_display()} {self.date} ({self.deleted_at})"
+
+
 class ShiftSettings(models.Model):
     """シフト設定モデル"""
     store = models.ForeignKey(Store, on_delete=models.CASCADE, verbose_name="店舗")
@@ -107,6 +241,39 @@ class ShiftSettings(models.Model):
         return f"{self.store.name} - シフト設定"
 
 
+class ShiftSwapRequestQuerySet(models.QuerySet):
+    """シフト交代募集のクエリセット"""
+
+    def for_board(self, staff):
+        """
+        募集一覧用に立候補数（application_count）と staff 自身の立候補（my_applications）を付与
+        募集の件数によらず2クエリで一覧を作れる
+        """
+        return self.select_related('shift', 'requested_by__user').annotate(
+            application_count=Count('applications', filter=Q(applications__status='pending'))
+        ).prefetch_related(Prefetch(
+            'applications',
+            queryset=ShiftSwapApplication.objects.filter(applicant=staff),
+            to_attr='my_applications'
+        ))
+
+    def expired(self, today):
+        """締切（出勤日の前日）を過ぎても募集中のままの募集（is_available と同じ基準）"""
+        return self.filter(status='open', date__lte=today)
+
+    def accepting(self, today):
+        """締切前の募集中の募集（expired の残り。is_available と同じ基準）"""
+        return self.filter(status='open', date__gt=today)
+
+    def with_pending_applications(self):
+        """立候補待ちの応募（applications_list）を立候補者のユーザーとともに付与"""
+        return self.prefetch_related(Prefetch(
+            'applications',
+            queryset=ShiftSwapApplication.objects.filter(status='pending').select_related('applicant__user'),
+            to_attr='applications_list'
+        ))
+
+
 class ShiftSwapRequest(models.Model):
     """シフト交代募集モデル"""
     STATUS_CHOICES = [
@@ -130,6 +297,8 @@ class ShiftSwapRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
     
+    objects = ShiftSwapRequestQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "シフト交代募集"
         verbose_name_plural = "シフト交代募集"
@@ -185,6 +354,27 @@ class ShiftSwapApplication(models.Model):
         return f"{self.applicant.user.get_full_name()} - {self.swap_request.date} {self.start_time}-{self.end_time}"
 
 
+class ChatRoomQuerySet(models.QuerySet):
+    """チャットルームのクエリセット"""
+
+    def with_summary(self, staff):
+        """
+        一覧表示用に未読数（unread_count）と最新メッセージ（last_message_text, last_message_at）を注釈
+        参加者のユーザーも同時に取得するため、ルーム数・メッセージ数によらず1クエリで一覧を作れる
+        """
+        latest = ChatMessage.objects.filter(room=OuterRef('pk')).order_by('-created_at', '-id')
+        return self.select_related(
+            'participant1__user', 'participant2__user', 'swap_request'
+        ).annotate(
+            unread_count=Count(
+                'messages',
+                filter=Q(messages__is_read=False) & ~Q(messages__sender=staff)
+            ),
+            last_message_text=Subquery(latest.values('message')[:1]),
+            last_message_at=Subquery(latest.values('created_at')[:1]),
+        )
+
+
 class ChatRoom(models.Model):
     """チャットルームモデル"""
     ROOM_TYPE_CHOICES = [
@@ -231,6 +421,8 @@ class ChatRoom(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
     
+    objects = ChatRoomQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "チャットルーム"
         verbose_name_plural = "チャットルーム"
@@ -294,6 +486,10 @@ class ChatMessage(models.Model):
         verbose_name = "チャットメッセージ"
         verbose_name_plural = "チャットメッセージ"
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['room', 'is_read', 'sender'], name='chatmessage_unread_idx'),
+            models.Index(fields=['room', 'created_at', 'id'], name='chatmessage_history_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.user.get_full_name()} - {self.message[:50]}"
@@ -302,4 +498,79 @@ class ChatMessage(models.Model):
         """メッセージを既読にする"""
         if self.sender != reader:
             self.is_read = True
-            self.save()
\ No newline at end of file
+            self.save()
+
+class GenerationJob(models.Model):
+    """AIシフト生成ジョブモデル（バックグラウンド実行用のキュー）"""
+    STATUS_CHOICES = [
+        ('queued', '待機中'),
+        ('running', '実行中'),
+        ('succeeded', '完了'),
+        ('failed', '失敗'),
+        ('cancelled', 'キャンセル'),
+    ]
+    
+    MODE_CHOICES = [
+        ('full', '全体生成'),
+        ('incremental', '差分再生成'),
+        ('parallel', '週ごとの並列生成'),
+    ]
+    
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, verbose_name="店舗")
+    requested_by = models.ForeignKey(
+        Staff,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='generation_jobs',
+        verbose_name="依頼者"
+    )
+    start_date = models.DateField(verbose_name="生成開始日")
+    end_date = models.DateField(verbose_name="生成終了日")
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='full', verbose_name="生成方法")
+    solver = models.CharField(max_length=20, blank=True, verbose_name="ソルバー")
+    time_limit = models.FloatField(null=True, blank=True, verbose_name="制限時間（秒）")
+    workers = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="並列数")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name="状態"
+    )
+    progress = models.PositiveIntegerField(default=0, verbose_name="進捗（%）")
+    message = models.CharField(max_length=200, blank=True, verbose_name="メッセージ")
+    result = models.JSONField(null=True, blank=True, verbose_name="結果")
+    cancel_requested = models.BooleanField(default=False, verbose_name="キャンセル要求")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="開始日時")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="終了日時")
+    
+    class Meta:
+        verbose_name = "シフト生成ジョブ"
+        verbose_name_plural = "シフト生成ジョブ"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.store.name} - {self.start_date}〜{self.end_date} ({self.get_status_display()})"
+    
+    @property
+    def is_finished(self):
+        """終了状態かどうか"""
+        return self.status in ('succeeded', 'failed', 'cancelled')
+    
+    def to_dict(self):
+        """ポーリング用のJSONデータ"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'mode': self.mode,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'start_date': self.start_date.strftime('%Y-%m-%d'),
+            'end_date': self.end_date.strftime('%Y-%m-%d'),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
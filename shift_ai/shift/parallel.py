@@ -0,0 +1,133 @@
+"""
+複数店舗・複数週のシフト並列生成
+店舗ごと（または週ごと）の生成は互いに独立しているため、プロセスプールで並列に実行する。
+各ワーカーは自分でスナップショットを読み込み、一括保存まで行う
+（spawn 方式でも読み込めるよう、モデルはワーカー内で import する）
+"""
+import os
+import time as time_module
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional
+import django
+from django.apps import apps
+from django.db import close_old_connections, connections
+
+
+class GenerationTask(NamedTuple):
+    """並列生成の1単位（店舗 × 期間）"""
+    store_id: int
+    start_date: date
+    end_date: date
+
+
+def split_weeks(start_date: date, end_date: date) -> List[tuple]:
+    """
+    期間を週（月曜〜日曜）ごとに分割
+    週間最大労働時間は週単位の制約なので、週ごとの生成は互いに独立に解ける
+    """
+    ranges = []
+    current = start_date
+    while current <= end_date:
+        last = min(current + timedelta(days=6 - current.weekday()), end_date)
+        ranges.append((current, last))
+        current = last + timedelta(days=1)
+    return ranges
+
+
+def build_tasks(store_ids: List[int], start_date: date, end_date: date,
+                by_week: bool = False) -> List[GenerationTask]:
+    """店舗（と週）ごとの生成タスクを作成"""
+    ranges = split_weeks(start_date, end_date) if by_week else [(start_date, end_date)]
+    return [
+        GenerationTask(store_id, range_start, range_end)
+        for store_id in store_ids
+        for range_start, range_end in ranges
+    ]
+
+
+def _init_worker():
+    """ワーカープロセスの初期化（spawn 方式の場合は Django を読み込む）"""
+    if not apps.ready:
+        django.setup()
+    close_old_connections()
+
+
+def run_task(task: GenerationTask, solver_name: Optional[str] = None,
+             time_limit: Optional[float] = None) -> Dict:
+    """
+    1タスク分の生成・保存を実行（ワーカープロセス内で呼ばれる）
+
+    Returns:
+        店舗ID・期間・所要時間・生成結果（またはエラー）の辞書
+    """
+    from accounts.models import Store
+    from shift.generation import ShiftConstraintError, generate_and_save_shifts
+    from shift.solvers import get_solver
+
+    started = time_module.monotonic()
+    report = {
+        'store_id': task.store_id,
+        'start_date': task.start_date.strftime('%Y-%m-%d'),
+        'end_date': task.end_date.strftime('%Y-%m-%d'),
+        'pid': os.getpid(),
+    }
+    try:
+        store = Store.objects.get(id=task.store_id)
+        solver = get_solver(solver_name, time_limit=time_limit)
+        result = generate_and_save_shifts(store, task.start_date, task.end_date, solver=solver)
+        report.update({
+            'success': True,
+            'created_count': result['created_count'],
+            'skipped_count': result['skipped_count'],
+            'total_cost': result['total_cost'],
+            'solver': result['solver'],
+        })
+    except ShiftConstraintError as e:
+        report.update({'success': False, 'error': 'シフト制約エラー', 'details': e.details})
+    except Exception as e:
+        report.update({'success': False, 'error': str(e)})
+    finally:
+        close_old_connections()
+    report['elapsed'] = round(time_module.monotonic() - started, 3)
+    return report
+
+
+def generate_parallel(tasks: List[GenerationTask], max_workers: Optional[int] = None,
+                      solver_name: Optional[str] = None, time_limit: Optional[float] = None) -> Dict:
+    """
+    タスクをプロセスプールで並列実行
+
+    Args:
+        tasks: 生成タスク
+        max_workers: ワーカー数（省略時はCPU数、1の場合は同一プロセスで順に実行）
+        solver_name: ソルバー名
+        time_limit: ソルバーの制限時間（秒）
+
+    Returns:
+        全体の所要時間とタスクごとの結果
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    started = time_module.monotonic()
+    results = []
+
+    if max_workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            results.append(run_task(task, solver_name, time_limit))
+    else:
+        # 親プロセスのDB接続を子プロセスに引き継がないよう、fork 前に閉じておく
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), initializer=_init_worker) as executor:
+            futures = [executor.submit(run_task, task, solver_name, time_limit) for task in tasks]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    results.sort(key=lambda r: (r['store_id'], r['start_date']))
+    return {
+        'workers': max_workers,
+        'task_count': len(tasks),
+        'elapsed': round(time_module.monotonic() - started, 3),
+        'created_count': sum(r.get('created_count', 0) for r in results),
+        'failed_count': sum(1 for r in results if not r['success']),
+        'results': results,
+    }
@@ -0,0 +1,202 @@
+"""
+シフト生成用の問題スナップショット
+生成期間に必要なスタッフ・必要人数・希望・既存シフトを固定回数のクエリで読み込み、
+メモリ上のコンパクトな構造として保持する
+"""
+from collections import defaultdict
+from datetime import date, time, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from accounts.models import Store, Staff, StaffRequirement
+from shift.models import Shift, ShiftRequest
+
+
+def week_start(target_date: date) -> date:
+    """週の開始日（月曜日）"""
+    return target_date - timedelta(days=target_date.weekday())
+
+
+def time_to_minutes(value: time) -> int:
+    """時刻を0時からの分数に変換"""
+    return value.hour * 60 + value.minute
+
+
+def span_minutes(start_time: time, end_time: time) -> int:
+    """勤務時間（分）。終了時刻が開始時刻以前なら日をまたぐものとして扱う"""
+    minutes = time_to_minutes(end_time) - time_to_minutes(start_time)
+    if minutes <= 0:
+        minutes += 24 * 60
+    return minutes
+
+
+class RequestSlot(NamedTuple):
+    """希望シフト1件分（ShiftRequestの必要な列のみ）"""
+    id: int
+    staff_id: int
+    date: date
+    request_type: str
+    start_time: Optional[time]
+    end_time: Optional[time]
+    end_date: Optional[date]
+
+
+class ShiftSlot(NamedTuple):
+    """既存シフト1件分（Shiftの必要な列のみ）"""
+    id: int
+    staff_id: int
+    date: date
+    start_time: time
+    end_time: time
+    end_date: Optional[date]
+    is_confirmed: bool
+
+    @property
+    def minutes(self) -> int:
+        """勤務時間（分）"""
+        if self.end_date and self.end_date > self.date:
+            days = (self.end_date - self.date).days
+            return days * 24 * 60 + time_to_minutes(self.end_time) - time_to_minutes(self.start_time)
+        return span_minutes(self.start_time, self.end_time)
+
+
+class ProblemSnapshot:
+    """シフト生成期間の問題データ（DBアクセスなしで参照可能）"""
+
+    def __init__(
+        self,
+        store: Store,
+        start_date: date,
+        end_date: date,
+        staff: Dict[int, Staff],
+        requirements_by_weekday: Dict[int, List[StaffRequirement]],
+        requests_by_date: Dict[date, List[RequestSlot]],
+        shifts_by_date: Dict[date, List[ShiftSlot]],
+    ):
+        self.store = store
+        self.start_date = start_date
+        self.end_date = end_date
+        self.staff = staff
+        self.requirements_by_weekday = requirements_by_weekday
+        self.requests_by_date = requests_by_date
+        self.shifts_by_date = shifts_by_date
+        self.target_dates: Optional[List[date]] = None
+        self._availability = None
+
+    @classmethod
+    def load(cls, store: Store, start_date: date, end_date: date) -> 'ProblemSnapshot':
+        """
+        指定期間のスナップショットを読み込む（クエリ数は期間の長さに依存しない）
+
+        Args:
+            store: 店舗
+            start_date: 開始日
+            end_date: 終了日
+
+        Returns:
+            ProblemSnapshot
+        """
+        # 1. スタッフ（ID順で保持し、従来のクエリセットと同じ並びにする）
+        staff = {
+            member.id: member
+            for member in Staff.objects.filter(store=store).select_related('user').order_by('id')
+        }
+
+        # 2. 必要人数設定（曜日ごと）
+        requirements_by_weekday = defaultdict(list)
+        for requirement in StaffRequirement.objects.filter(store=store).order_by('id'):
+            requirements_by_weekday[requirement.day_of_week].append(requirement)
+
+        # 3. 希望シフト（日付ごと、開始日にかかる日をまたぐ希望のため前日から読み込む）
+        requests_by_date = defaultdict(list)
+        request_rows = ShiftRequest.objects.filter(
+            staff__store=store,
+            date__range=[start_date - timedelta(days=1), end_date]
+        ).order_by('id').values_list(
+            'id', 'staff_id', 'date', 'request_type', 'start_time', 'end_time', 'end_date'
+        )
+        for row in request_rows:
+            slot = RequestSlot(*row)
+            requests_by_date[slot.date].append(slot)
+
+        # 4. 既存シフト（日付ごと、週間労働時間の計算のため期間を含む週全体を読み込む。
+        #    開始日にかかる日をまたぐシフトのため、開始日が月曜日でも前日から読み込む）
+        shifts_by_date = defaultdict(list)
+        shift_rows = Shift.objects.filter(
+            store=store,
+            date__range=[
+                min(week_start(start_date), start_date - timedelta(days=1)),
+                week_start(end_date) + timedelta(days=6),
+            ]
+        ).order_by('id').values_list(
+            'id', 'staff_id', 'date', 'start_time', 'end_time', 'end_date', 'is_confirmed'
+        )
+        for row in shift_rows:
+            slot = ShiftSlot(*row)
+            shifts_by_date[slot.date].append(slot)
+
+        return cls(
+            store=store,
+            start_date=start_date,
+            end_date=end_date,
+            staff=staff,
+            requirements_by_weekday=dict(requirements_by_weekday),
+            requests_by_date=dict(requests_by_date),
+            shifts_by_date=dict(shifts_by_date),
+        )
+
+    @property
+    def availability(self):
+        """希望・割当のビットマスクインデックス（初回参照時に構築）"""
+        if self._availability is None:
+            from shift.availability import AvailabilityIndex
+            self._availability = AvailabilityIndex.from_snapshot(self)
+        return self._availability
+
+    def release_dates(self, target_dates) -> List[ShiftSlot]:
+        """
+        生成対象を指定日に限定し、その日の未確定シフトを割当から外す（差分再生成用）
+
+        Returns:
+            外した既存シフト（保存時に削除する）
+        """
+        self.target_dates = sorted(d for d in set(target_dates) if self.start_date <= d <= self.end_date)
+        released = []
+        for target_date in self.target_dates:
+            kept = []
+            for shift in self.shifts_by_date.get(target_date, []):
+                if shift.is_confirmed:
+                    kept.append(shift)
+                else:
+                    released.append(shift)
+            if kept:
+                self.shifts_by_date[target_date] = kept
+            else:
+                self.shifts_by_date.pop(target_date, None)
+        self._availability = None
+        return released
+
+    def dates(self) -> List[date]:
+        """期間内の日付リスト（生成対象を限定している場合はその日のみ）"""
+        if self.target_dates is not None:
+            return list(self.target_dates)
+        days = (self.end_date - self.start_date).days + 1
+        return [self.start_date + timedelta(days=i) for i in range(max(days, 0))]
+
+    def requirements_for(self, target_date: date) -> List[StaffRequirement]:
+        """指定日の必要人数設定"""
+        return self.requirements_by_weekday.get(target_date.weekday(), [])
+
+    def requests_on(self, target_date: date) -> List[RequestSlot]:
+        """指定日の希望シフト"""
+        return self.requests_by_date.get(target_date, [])
+
+    def shifts_on(self, target_date: date) -> List[ShiftSlot]:
+        """指定日に開始する既存シフト"""
+        return self.shifts_by_date.get(target_date, [])
+
+    def existing_weekly_minutes(self) -> Dict[Tuple[int, date], int]:
+        """既存シフトの(スタッフID, 週開始日)ごとの勤務時間（分）"""
+        totals = defaultdict(int)
+        for shifts in self.shifts_by_date.values():
+            for shift in shifts:
+                totals[(shift.staff_id, week_start(shift.date))] += shift.minutes
+        return dict(totals)
@@ -0,0 +1,161 @@
+"""
+日別シフト集計（DailyStoreStats）の更新
+シフトの保存・削除で影響を受けた (店舗, 日付) を記録し、トランザクション確定時にまとめて再計算する
+"""
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Set
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from shift import calendar_cache
+from shift.intervals import shift_bounds, split_shifts
+from shift.models import DailyStoreStats, Shift
+
+_pending = threading.local()
+
+
+def shift_dates(shift) -> Set[date]:
+    """シフトがかかる暦日"""
+    start, end = shift_bounds(shift)
+    return {shift.date + timedelta(days=offset) for offset in range(start // 1440, (end - 1) // 1440 + 1)}
+
+
+def schedule_refresh(store_id: int, dates: Iterable[date]):
+    """再計算する日を登録（トランザクション確定時、自動コミット時は即時に実行）"""
+    pending = getattr(_pending, 'dates', None)
+    if pending is None:
+        pending = _pending.dates = defaultdict(set)
+    pending[store_id].update(dates)
+    transaction.on_commit(flush_pending)
+
+
+def schedule_refresh_for_shifts(shifts: Iterable):
+    """シフトがかかる日をまとめて登録"""
+    by_store = defaultdict(set)
+    for shift in shifts:
+        by_store[shift.store_id].update(shift_dates(shift))
+    for store_id, dates in by_store.items():
+        schedule_refresh(store_id, dates)
+
+
+def update_shifts(queryset, **fields) -> int:
+    """QuerySet.update でシフトを一括更新し、影響する日の再計算を登録（update はシグナルを送らないため）"""
+    with transaction.atomic():
+        affected = list(queryset.only('store_id', 'date', 'start_time', 'end_time', 'end_date'))
+        updated_count = queryset.update(**fields)
+        schedule_refresh_for_shifts(affected)
+    return updated_count
+
+
+def flush_pending():
+    """登録済みの日を再計算し、その月のカレンダー表示データを無効化"""
+    pending = getattr(_pending, 'dates', None)
+    if not pending:
+        return
+    _pending.dates = None
+    for store_id, dates in pending.items():
+        # 時給の変更などで日付が長期間に散らばる場合に備え、月ごとに再計算する
+        by_month = defaultdict(set)
+        for day in dates:
+            by_month[(day.year, day.month)].add(day)
+        for month_dates in by_month.values():
+            refresh_daily_stats(store_id, month_dates)
+        calendar_cache.invalidate_dates(store_id, dates)
+
+
+def refresh_daily_stats(store_id: int, dates: Iterable[date]):
+    """指定日の集計をシフトから再計算して保存"""
+    dates = set(dates)
+    if not dates:
+        return
+    first, last = min(dates), max(dates)
+    shifts = Shift.objects.filter(
+        Q(date__range=[first - timedelta(days=1), last]) | Q(date__lt=first, end_date__gte=first),
+        store_id=store_id
+    ).select_related('staff').only(
+        'date', 'start_time', 'end_time', 'end_date', 'is_confirmed', 'staff_id', 'staff__hourly_wage'
+    )
+
+    rows: Dict[date, DailyStoreStats] = {}
+    staff_ids = defaultdict(set)
+    for segment in split_shifts(shifts, first, last):
+        if segment.date not in dates:
+            continue
+        shift = segment.shift
+        row = rows.get(segment.date)
+        if row is None:
+            row = rows[segment.date] = DailyStoreStats(store_id=store_id, date=segment.date)
+        staff_ids[segment.date].add(shift.staff_id)
+        row.hours += segment.hours
+        row.cost += segment.cost
+        if shift.is_confirmed:
+            row.confirmed_hours += segment.hours
+            row.confirmed_cost += segment.cost
+        if not segment.is_continuation:
+            row.shift_count += 1
+            if shift.is_confirmed:
+                row.confirmed_count += 1
+            else:
+                row.pending_count += 1
+    for row_date, row in rows.items():
+        row.staff_count = len(staff_ids[row_date])
+
+    with transaction.atomic():
+        DailyStoreStats.objects.filter(store_id=store_id, date__in=dates).delete()
+        DailyStoreStats.objects.bulk_create(rows.values())
+
+
+def rebuild_daily_stats(store_ids: Optional[Iterable[int]] = None, start_date: Optional[date] = None,
+                        end_date: Optional[date] = None, stdout=None) -> int:
+    """
+    集計を作り直す（店舗・期間の指定がなければ全店舗の全期間）
+
+    Returns:
+        作成した集計行の数
+    """
+    shifts = Shift.objects.all()
+    if store_ids is not None:
+        shifts = shifts.filter(store_id__in=list(store_ids))
+    created = 0
+    for store_id in shifts.values_list('store_id', flat=True).distinct().order_by('store_id'):
+        bounds = Shift.objects.filter(store_id=store_id).aggregate(
+            first=Min('date'), last=Max('date'), last_end=Max('end_date')
+        )
+        first = start_date or bounds['first']
+        last = end_date or max(filter(None, [bounds['last'] + timedelta(days=1), bounds['last_end']]))
+        stale = DailyStoreStats.objects.filter(store_id=store_id)
+        if start_date:
+            stale = stale.filter(date__gte=start_date)
+        if end_date:
+            stale = stale.filter(date__lte=end_date)
+        stale.delete()
+
+        # 月ごとに再計算
+        chunk_start = first
+        while chunk_start <= last:
+            chunk_end = min(chunk_start + timedelta(days=30), last)
+            refresh_daily_stats(
+                store_id,
+                [chunk_start + timedelta(days=i) for i in range((chunk_end - chunk_start).days + 1)]
+            )
+            chunk_start = chunk_end + timedelta(days=1)
+        calendar_cache.invalidate_store(store_id)
+        count = DailyStoreStats.objects.filter(store_id=store_id, date__range=[first, last]).count()
+        created += count
+        if stdout:
+            stdout.write(f"  店舗ID {store_id}: {first}〜{last} {count}日分")
+    if store_ids is not None:
+        # シフトが1件もない店舗の古い集計を削除
+        DailyStoreStats.objects.filter(store_id__in=list(store_ids)).exclude(
+            store_id__in=shifts.values('store_id')
+        ).delete()
+    return created
+
+
+def stats_by_date(store, start_date: date, end_date: date) -> Dict[date, DailyStoreStats]:
+    """期間の集計（日付 → DailyStoreStats、シフトのない日は含まない）"""
+    return {
+        row.date: row
+        for row in DailyStoreStats.objects.filter(store=store, date__range=[start_date, end_date])
+    }
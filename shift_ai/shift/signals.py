@@ -0,0 +1,90 @@
+"""
+シフトの保存・削除と、スタッフの時給の変更に合わせて日別集計（DailyStoreStats）の再計算を登録する
+スタッフ名・時給・必要人数の変更ではカレンダー表示データのキャッシュを無効化する
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from accounts.models import Staff, StaffRequirement, Store
+from shift import calendar_cache
+from shift.models import Shift, ShiftSettings
+from shift.rollups import schedule_refresh, schedule_refresh_for_shifts, shift_dates
+
+
+@receiver(pre_save, sender=Shift)
+def remember_previous_dates(sender, instance, **kwargs):
+    """変更前の店舗・日付を保持（日付や時刻の変更で集計対象の日が移る場合）"""
+    instance._rollup_previous = None
+    if instance.pk:
+        previous = Shift.objects.filter(pk=instance.pk).only(
+            'store_id', 'date', 'start_time', 'end_time', 'end_date'
+        ).first()
+        if previous:
+            instance._rollup_previous = (previous.store_id, shift_dates(previous))
+
+
+@receiver(post_save, sender=Shift)
+def refresh_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        schedule_refresh(*previous)
+    schedule_refresh(instance.store_id, shift_dates(instance))
+
+
+@receiver(post_delete, sender=Shift)
+def refresh_on_delete(sender, instance, **kwargs):
+    schedule_refresh(instance.store_id, shift_dates(instance))
+
+
+@receiver(pre_save, sender=Staff)
+def remember_previous_wage(sender, instance, **kwargs):
+    """変更前の時給を保持（集計の人件費は時給から計算するため）"""
+    instance._rollup_previous_wage = None
+    if instance.pk:
+        instance._rollup_previous_wage = Staff.objects.filter(pk=instance.pk).values_list(
+            'hourly_wage', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Staff)
+def refresh_on_wage_change(sender, instance, created=False, raw=False, **kwargs):
+    """時給が変わったスタッフのシフトがある日の集計を再計算"""
+    previous_wage = getattr(instance, '_rollup_previous_wage', None)
+    if raw or created or previous_wage is None or previous_wage == instance.hourly_wage:
+        return
+    schedule_refresh_for_shifts(
+        Shift.objects.filter(staff=instance).only('store_id', 'date', 'start_time', 'end_time', 'end_date')
+    )
+
+
+def _invalidate_calendar_on_commit(store_id):
+    transaction.on_commit(lambda: calendar_cache.invalidate_store(store_id))
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+@receiver(post_save, sender=StaffRequirement)
+@receiver(post_delete, sender=StaffRequirement)
+@receiver(post_save, sender=ShiftSettings)
+def invalidate_calendar_for_store(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_calendar_on_commit(instance.store_id)
+
+
+@receiver(post_save, sender=Store)
+def invalidate_calendar_for_store_settings(sender, instance, raw=False, **kwargs):
+    """営業時間・準備時間などの変更"""
+    if not raw:
+        _invalidate_calendar_on_commit(instance.id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_calendar_for_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    """氏名の変更（ログイン時の last_login のみの更新は対象外）"""
+    if raw or (update_fields and set(update_fields) <= {'last_login', 'password'}):
+        return
+    for store_id in Staff.objects.filter(user=instance).values_list('store_id', flat=True):
+        _invalidate_calendar_on_commit(store_id)
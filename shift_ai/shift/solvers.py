@@ -0,0 +1,380 @@
+"""
+シフト生成ソルバー
+必要人数・責任者・スキル要件の充足、週間最大労働時間、勤務希望を
+制約付き最適化問題としてモデル化し、差し替え可能なソルバーで解く
+
+- greedy: 依存ライブラリなしの貪欲法（週間上限と重複を考慮）
+- cpsat: OR-Tools CP-SATによる最適化（時間制限付き、目的関数値とギャップを報告）
+"""
+import time as time_module
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from accounts.models import StaffRequirement
+from shift.problem_snapshot import ProblemSnapshot, span_minutes, time_to_minutes, week_start
+from shift.time_grid import MINUTES_PER_DAY
+
+
+# 目的関数の重み（不足人数 > 責任者・スキル不足 > 希望外の割当 > 人件費（円））
+SHORTAGE_PENALTY = 1000000
+SKILL_SHORTAGE_PENALTY = 500000
+UNREQUESTED_PENALTY = 10000
+
+SKILLED_LEVEL = 3
+
+
+class Slot:
+    """生成対象の時間帯（日付 × 必要人数設定）"""
+
+    def __init__(self, index: int, date: date, requirement: StaffRequirement,
+                 candidates: List[int], requested: set, fixed_members: List = ()):
+        self.index = index
+        self.date = date
+        self.requirement = requirement
+        self.start_minutes = time_to_minutes(requirement.start_time)
+        self.minutes = span_minutes(requirement.start_time, requirement.end_time)
+        self.end_minutes = self.start_minutes + self.minutes
+        # 日をまたぐ時間帯も比較できるよう、日付を含めた通算の分（半開区間）で保持する
+        self.absolute_start = date.toordinal() * MINUTES_PER_DAY + self.start_minutes
+        self.absolute_end = self.absolute_start + self.minutes
+        self.week = week_start(date)
+        self.candidates = candidates
+        self.requested = requested
+        # 既存シフト（確定済みなど）で埋まっている分を差し引いた残りの必要人数
+        self.required_staff = max(0, requirement.required_staff - len(fixed_members))
+        self.required_managers = max(
+            0, requirement.required_managers - sum(1 for s in fixed_members if s.is_manager)
+        )
+        self.required_hall_skill = max(
+            0, requirement.required_hall_skill - sum(1 for s in fixed_members if s.hall_skill_level >= SKILLED_LEVEL)
+        )
+        self.required_kitchen_skill = max(
+            0, requirement.required_kitchen_skill - sum(1 for s in fixed_members if s.kitchen_skill_level >= SKILLED_LEVEL)
+        )
+
+    def overlaps(self, other: 'Slot') -> bool:
+        """時間帯が重なるかどうか（前日から日をまたぐ時間帯を含む）"""
+        return self.absolute_start < other.absolute_end and other.absolute_start < self.absolute_end
+
+
+class SolverResult:
+    """ソルバーの結果"""
+
+    def __init__(self, solver: str, status: str, slots: List[Slot], assignments: Dict[int, List[int]],
+                 objective_value: Optional[float], best_bound: Optional[float],
+                 wall_time: float, shortage: int):
+        self.solver = solver
+        self.status = status
+        self.slots = slots
+        self.assignments = assignments
+        self.objective_value = objective_value
+        self.best_bound = best_bound
+        self.wall_time = wall_time
+        self.shortage = shortage
+
+    @property
+    def gap(self) -> Optional[float]:
+        """目的関数値と下界との相対ギャップ（下界が不明な場合はNone）"""
+        if self.objective_value is None or self.best_bound is None:
+            return None
+        return abs(self.objective_value - self.best_bound) / max(1.0, abs(self.objective_value))
+
+    def iter_assignments(self):
+        """(時間帯, スタッフID) の組を順に返す"""
+        for slot in self.slots:
+            for staff_id in self.assignments.get(slot.index, []):
+                yield slot, staff_id
+
+    def as_dict(self) -> Dict:
+        """JSONレスポンス用の辞書"""
+        return {
+            'solver': self.solver,
+            'status': self.status,
+            'objective_value': self.objective_value,
+            'best_bound': self.best_bound,
+            'gap': self.gap,
+            'wall_time': round(self.wall_time, 3),
+            'shortage': self.shortage,
+        }
+
+
+def build_slots(snapshot: ProblemSnapshot) -> List[Slot]:
+    """
+    スナップショットから生成対象の時間帯を作成（候補者は空き状況インデックスで判定）
+    時間帯全体を既存シフトでカバーしているスタッフは、その時間帯の必要人数から差し引く
+    """
+    availability = snapshot.availability
+    slots = []
+    for target_date in snapshot.dates():
+        # 当日開始のシフトと、前日から日をまたぐシフト（当日0時からの分に換算）
+        existing = [
+            (time_to_minutes(shift.start_time) - offset,
+             time_to_minutes(shift.start_time) + shift.minutes - offset, shift.staff_id)
+            for offset, day in ((0, target_date), (MINUTES_PER_DAY, target_date - timedelta(days=1)))
+            for shift in snapshot.shifts_on(day)
+        ]
+        for requirement in snapshot.requirements_for(target_date):
+            candidates = availability.free_staff(
+                target_date, requirement.start_time, requirement.end_time
+            )
+            requested = set(availability.requested_staff(
+                target_date, requirement.start_time, requirement.end_time
+            ))
+            start = time_to_minutes(requirement.start_time)
+            end = start + span_minutes(requirement.start_time, requirement.end_time)
+            fixed_members = [
+                snapshot.staff[staff_id] for shift_start, shift_end, staff_id in existing
+                if shift_start <= start and end <= shift_end and staff_id in snapshot.staff
+            ]
+            slots.append(Slot(
+                len(slots), target_date, requirement, candidates, requested & set(candidates), fixed_members
+            ))
+    return slots
+
+
+def slot_cost(snapshot: ProblemSnapshot, slot: Slot, staff_id: int) -> int:
+    """1人を時間帯に割り当てたときの目的関数への寄与"""
+    staff = snapshot.staff[staff_id]
+    cost = staff.hourly_wage * slot.minutes // 60
+    if staff_id not in slot.requested:
+        cost += UNREQUESTED_PENALTY
+    return cost
+
+
+def evaluate(snapshot: ProblemSnapshot, slots: List[Slot], assignments: Dict[int, List[int]]) -> Tuple[int, int]:
+    """割当の目的関数値と不足人数の合計を計算"""
+    objective = 0
+    shortage = 0
+    for slot in slots:
+        selected = assignments.get(slot.index, [])
+        members = [snapshot.staff[staff_id] for staff_id in selected]
+        missing = max(0, slot.required_staff - len(selected))
+        skill_missing = (
+            max(0, slot.required_managers - sum(1 for s in members if s.is_manager))
+            + max(0, slot.required_hall_skill - sum(1 for s in members if s.hall_skill_level >= SKILLED_LEVEL))
+            + max(0, slot.required_kitchen_skill - sum(1 for s in members if s.kitchen_skill_level >= SKILLED_LEVEL))
+        )
+        shortage += missing
+        objective += missing * SHORTAGE_PENALTY + skill_missing * SKILL_SHORTAGE_PENALTY
+        objective += sum(slot_cost(snapshot, slot, staff_id) for staff_id in selected)
+    return objective, shortage
+
+
+class BaseSolver:
+    """ソルバーの基底クラス"""
+    name = 'base'
+
+    def __init__(self, time_limit: Optional[float] = None):
+        self.time_limit = time_limit if time_limit is not None else getattr(settings, 'SHIFT_SOLVER_TIME_LIMIT', 10)
+
+    def solve(self, snapshot: ProblemSnapshot) -> SolverResult:
+        raise NotImplementedError
+
+
+class GreedySolver(BaseSolver):
+    """
+    貪欲法ソルバー
+    勤務希望者 → 責任者 → スキル保持者 → その他の順に、週間上限と時間帯の重複を守って割り当てる
+    """
+    name = 'greedy'
+
+    def solve(self, snapshot: ProblemSnapshot) -> SolverResult:
+        started = time_module.monotonic()
+        slots = build_slots(snapshot)
+        weekly_minutes = defaultdict(int, snapshot.existing_weekly_minutes())
+        assigned_slots = defaultdict(list)
+        assignments = {}
+
+        for slot in slots:
+            def can_assign(staff_id):
+                staff = snapshot.staff[staff_id]
+                if weekly_minutes[(staff_id, slot.week)] + slot.minutes > staff.max_weekly_hours * 60:
+                    return False
+                return not any(slot.overlaps(other) for other in assigned_slots[staff_id])
+
+            available = [staff_id for staff_id in slot.candidates if can_assign(staff_id)]
+            staff = snapshot.staff
+            groups = [
+                [staff_id for staff_id in available if staff_id in slot.requested],
+                [staff_id for staff_id in available if staff[staff_id].is_manager][:slot.required_managers],
+                [staff_id for staff_id in available if staff[staff_id].hall_skill_level >= SKILLED_LEVEL]
+                if slot.required_hall_skill > 0 else [],
+                [staff_id for staff_id in available if staff[staff_id].kitchen_skill_level >= SKILLED_LEVEL]
+                if slot.required_kitchen_skill > 0 else [],
+                available,
+            ]
+
+            selected = []
+            for group in groups:
+                for staff_id in group:
+                    if len(selected) >= slot.required_staff:
+                        break
+                    if staff_id not in selected:
+                        selected.append(staff_id)
+
+            for staff_id in selected:
+                weekly_minutes[(staff_id, slot.week)] += slot.minutes
+                assigned_slots[staff_id].append(slot)
+            assignments[slot.index] = selected
+
+        objective, shortage = evaluate(snapshot, slots, assignments)
+        return SolverResult(
+            solver=self.name,
+            status='heuristic',
+            slots=slots,
+            assignments=assignments,
+            objective_value=objective,
+            best_bound=None,
+            wall_time=time_module.monotonic() - started,
+            shortage=shortage,
+        )
+
+
+class CpSatSolver(BaseSolver):
+    """
+    OR-Tools CP-SATソルバー
+    不足人数をペナルティとするソフト制約、週間上限と時間帯の重複をハード制約として最適化する
+    """
+    name = 'cpsat'
+
+    def __init__(self, time_limit: Optional[float] = None, num_workers: int = 8):
+        super().__init__(time_limit)
+        self.num_workers = num_workers
+
+    def solve(self, snapshot: ProblemSnapshot) -> SolverResult:
+        from ortools.sat.python import cp_model
+
+        started = time_module.monotonic()
+        slots = build_slots(snapshot)
+        staff = snapshot.staff
+        model = cp_model.CpModel()
+
+        x = {}
+        for slot in slots:
+            for staff_id in slot.candidates:
+                x[(slot.index, staff_id)] = model.NewBoolVar(f'x_{slot.index}_{staff_id}')
+
+        objective_terms = []
+        for slot in slots:
+            chosen = [x[(slot.index, staff_id)] for staff_id in slot.candidates]
+
+            # 必要人数（不足はペナルティ、超過は不可）
+            model.Add(sum(chosen) <= slot.required_staff)
+            shortage = model.NewIntVar(0, max(slot.required_staff, 0), f'short_{slot.index}')
+            model.Add(sum(chosen) + shortage >= slot.required_staff)
+            objective_terms.append(shortage * SHORTAGE_PENALTY)
+
+            # 責任者・ホール・キッチンのスキル要件
+            skill_rules = [
+                (slot.required_managers, lambda s: s.is_manager),
+                (slot.required_hall_skill, lambda s: s.hall_skill_level >= SKILLED_LEVEL),
+                (slot.required_kitchen_skill, lambda s: s.kitchen_skill_level >= SKILLED_LEVEL),
+            ]
+            for rule_index, (needed, qualifies) in enumerate(skill_rules):
+                if needed <= 0:
+                    continue
+                qualified = [
+                    x[(slot.index, staff_id)] for staff_id in slot.candidates if qualifies(staff[staff_id])
+                ]
+                skill_short = model.NewIntVar(0, needed, f'skill_{slot.index}_{rule_index}')
+                model.Add(sum(qualified) + skill_short >= needed)
+                objective_terms.append(skill_short * SKILL_SHORTAGE_PENALTY)
+
+            for staff_id in slot.candidates:
+                objective_terms.append(x[(slot.index, staff_id)] * slot_cost(snapshot, slot, staff_id))
+
+        # 週間最大労働時間（既存シフト分を差し引いた残り時間）
+        existing_minutes = snapshot.existing_weekly_minutes()
+        weekly_terms = defaultdict(list)
+        for slot in slots:
+            for staff_id in slot.candidates:
+                weekly_terms[(staff_id, slot.week)].append(x[(slot.index, staff_id)] * slot.minutes)
+        for (staff_id, week), terms in weekly_terms.items():
+            remaining = staff[staff_id].max_weekly_hours * 60 - existing_minutes.get((staff_id, week), 0)
+            model.Add(sum(terms) <= max(remaining, 0))
+
+        # 時間帯が重なる割当の禁止（開始順に並べ、終了より後に始まる時間帯以降は比較しない）
+        ordered = sorted(slots, key=lambda slot: slot.absolute_start)
+        for i, first in enumerate(ordered):
+            for second in ordered[i + 1:]:
+                if second.absolute_start >= first.absolute_end:
+                    break
+                for staff_id in set(first.candidates) & set(second.candidates):
+                    model.AddBoolOr([
+                        x[(first.index, staff_id)].Not(),
+                        x[(second.index, staff_id)].Not(),
+                    ])
+
+        model.Minimize(sum(objective_terms))
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = float(self.time_limit)
+        solver.parameters.num_workers = self.num_workers
+        status = solver.Solve(model)
+
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return SolverResult(
+                solver=self.name,
+                status='infeasible' if status == cp_model.INFEASIBLE else 'unknown',
+                slots=slots,
+                assignments={},
+                objective_value=None,
+                best_bound=None,
+                wall_time=time_module.monotonic() - started,
+                shortage=sum(slot.required_staff for slot in slots),
+            )
+
+        assignments = {
+            slot.index: [
+                staff_id for staff_id in slot.candidates if solver.Value(x[(slot.index, staff_id)])
+            ]
+            for slot in slots
+        }
+        _, shortage = evaluate(snapshot, slots, assignments)
+        return SolverResult(
+            solver=self.name,
+            status='optimal' if status == cp_model.OPTIMAL else 'feasible',
+            slots=slots,
+            assignments=assignments,
+            objective_value=solver.ObjectiveValue(),
+            best_bound=solver.BestObjectiveBound(),
+            wall_time=time_module.monotonic() - started,
+            shortage=shortage,
+        )
+
+
+SOLVERS = {
+    GreedySolver.name: GreedySolver,
+    CpSatSolver.name: CpSatSolver,
+}
+
+
+def cpsat_available() -> bool:
+    """OR-Toolsがインストールされているかどうか"""
+    try:
+        import ortools.sat.python.cp_model  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_solver(name: Optional[str] = None, time_limit: Optional[float] = None) -> BaseSolver:
+    """
+    ソルバーを取得
+
+    Args:
+        name: 'greedy' / 'cpsat' / 'auto'（省略時は settings.SHIFT_SOLVER_BACKEND）
+        time_limit: 制限時間（秒）
+
+    Returns:
+        ソルバーインスタンス
+    """
+    name = name or getattr(settings, 'SHIFT_SOLVER_BACKEND', 'auto')
+    if name == 'auto':
+        name = CpSatSolver.name if cpsat_available() else GreedySolver.name
+    if name not in SOLVERS:
+        raise ValueError(f"不明なソルバーです: {name}")
+    if name == CpSatSolver.name and not cpsat_available():
+        raise ValueError("CP-SATソルバーを使用するには ortools をインストールしてください。")
+    return SOLVERS[name](time_limit=time_limit)
@@ -12,6 +12,8 @@ urlpatterns = [
     
     # シフト交代
     path('shift-swap/', staff_views.shift_swap_list, name='shift_swap_list'),
+    path('shift-swap/api/', staff_views.shift_swap_list_api, name='shift_swap_list_api'),
+    path('shift-swap/substitutes/', staff_views.shift_swap_substitutes_api, name='shift_swap_substitutes_api'),
     path('shift-swap/create/', staff_views.shift_swap_create, name='shift_swap_create'),
     path('shift-swap/<int:swap_request_id>/apply/', staff_views.shift_swap_apply, name='shift_swap_apply'),
     path('shift-swap/my-requests/', staff_views.shift_swap_my_requests, name='shift_swap_my_requests'),
@@ -20,5 +22,8 @@ urlpatterns = [
     # チャット機能
     path('chat/', staff_views.chat_list, name='chat_list'),
     path('chat/<int:room_id>/', staff_views.chat_detail, name='chat_detail'),
+    path('chat/<int:room_id>/messages/', staff_views.chat_messages_api, name='chat_messages_api'),
+    path('chat/<int:room_id>/send/', staff_views.chat_send_api, name='chat_send_api'),
+    path('chat/<int:room_id>/stream/', staff_views.chat_stream, name='chat_stream'),
     path('chat/create/<int:staff_id>/', staff_views.chat_create, name='chat_create'),
 ]
@@ -8,7 +8,11 @@ from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 from .models import Shift, ShiftRequest, ShiftSwapRequest, ShiftSwapApplication, ChatRoom, ChatMessage
+from . import chat, live
 from .forms import ChatMessageForm
+from .availability import AvailabilityIndex
+from .submissions import apply_submission, parse_bulk_payload, parse_edit_payload
+from .substitutes import DEFAULT_SUBSTITUTES, MAX_SUBSTITUTES, recommend_substitutes
 from accounts.models import Staff
 
 
@@ -74,156 +78,54 @@ def staff_shift_requests(request):
     can_edit = submission_start <= today <= submission_deadline
     
     if request.method == 'POST':
-        action = request.POST.get('action')
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"POST request received. Action: {action}, All POST keys: {list(request.POST.keys())}")
+        is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
         
-        if action == 'update_existing':
-            # 編集モード：既存シフトの削除と更新
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"Update existing request received. Staff: {staff.user.username}")
-            
-            delete_dates = request.POST.getlist('delete_dates')
-            update_dates = request.POST.getlist('update_dates')
-            request_types = request.POST.getlist('request_types')
-            start_times = request.POST.getlist('start_times')
-            end_times = request.POST.getlist('end_times')
-            
-            logger.info(f"Delete dates: {delete_dates}")
-            logger.info(f"Update dates: {update_dates}")
-            logger.info(f"Request types: {request_types}")
-            logger.info(f"Start times: {start_times}")
-            logger.info(f"End times: {end_times}")
-            
-            deleted_count = 0
-            updated_count = 0
-            
-            # 削除処理
-            for date_str in delete_dates:
-                try:
-                    date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                    ShiftRequest.objects.filter(
-                        staff=staff,
-                        date=date_obj
-                    ).delete()
-                    deleted_count += 1
-                except ValueError:
-                    continue
-            
-            # 更新処理
-            end_date_offsets = request.POST.getlist('end_date_offsets')
-            logger.info(f"End date offsets: {end_date_offsets}")
-            
-            if not update_dates:
-                logger.warning("No update dates provided")
-            
-            for i, date_str in enumerate(update_dates):
-                try:
-                    date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                    request_type = request_types[i] if i < len(request_types) else 'work'
-                    start_time_str = start_times[i] if i < len(start_times) and start_times[i] else None
-                    end_time_str = end_times[i] if i < len(end_times) and end_times[i] else None
-                    end_date_offset = int(end_date_offsets[i]) if i < len(end_date_offsets) else 0
-                    
-                    # 時間の変換（空文字列やNoneの場合はNone）
-                    start_time = None
-                    end_time = None
-                    if start_time_str and start_time_str.strip():
-                        try:
-                            start_time = datetime.strptime(start_time_str, '%H:%M').time()
-                        except ValueError:
-                            messages.error(request, f"{date_str}の開始時間が不正です。")
-                            continue
-                    
-                    if end_time_str and end_time_str.strip():
-                        try:
-                            end_time = datetime.strptime(end_time_str, '%H:%M').time()
-                        except ValueError:
-                            messages.error(request, f"{date_str}の終了時間が不正です。")
-                            continue
-                    
-                    # 終了日の計算
-                    end_date = date_obj + timedelta(days=end_date_offset) if end_date_offset > 0 else None
-                    
-                    # 既存のレコードを削除（重複防止）
-                    ShiftRequest.objects.filter(
-                        staff=staff,
-                        date=date_obj
-                    ).delete()
-                    
-                    # 新しい希望を作成
-                    shift_request = ShiftRequest.objects.create(
-                        staff=staff,
-                        date=date_obj,
-                        request_type=request_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        end_date=end_date,
-                    )
-                    updated_count += 1
-                    logger.info(f"Created shift request: {date_obj}, type: {request_type}, time: {start_time}-{end_time}")
-                    
-                except ValueError as e:
-                    messages.error(request, f"{date_str}の処理でエラーが発生しました: {str(e)}")
-                    continue
-                except Exception as e:
-                    messages.error(request, f"{date_str}の処理で予期しないエラーが発生しました: {str(e)}")
-                    continue
-            
-            logger.info(f"Processing completed. Deleted: {deleted_count}, Updated: {updated_count}")
-            
-            # Ajaxリクエストの場合はJSONレスポンスを返す
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                logger.info("Returning JSON response for Ajax request")
+        if request.POST.get('action') == 'update_existing':
+            # 編集モード：既存シフトの削除と更新（1日1件に置き換え）
+            submission = parse_edit_payload(request.POST)
+            replace_day = True
+        else:
+            # 通常モード：新規提出（同じ種別の希望を置き換え）
+            submission = parse_bulk_payload(request.POST)
+            replace_day = False
+            if not submission.items and submission.is_valid:
+                messages.error(request, "日付が選択されていません。")
+                return redirect('staff_shift:shift_requests')
+        
+        # 全体を検証してから1トランザクションで適用（不正な日があれば何も保存しない）
+        if not submission.is_valid:
+            if is_ajax:
                 return JsonResponse({
-                    'success': True,
-                    'message': f"{deleted_count}件を削除、{updated_count}件を更新しました。",
-                    'deleted_count': deleted_count,
-                    'updated_count': updated_count
-                })
-            
-            messages.success(request, f"{deleted_count}件を削除、{updated_count}件を更新しました。")
+                    'success': False,
+                    'message': '入力内容に誤りがあるため保存しませんでした。\n'
+                               + '\n'.join(result.message for result in submission.errors),
+                    'results': [result.as_json() for result in submission.errors],
+                }, status=400)
+            for result in submission.errors:
+                messages.error(request, result.message)
             return redirect('staff_shift:shift_requests')
         
+        results = apply_submission(staff, submission, replace_day=replace_day)
+        deleted_count = len(submission.delete_dates)
+        updated_count = len(submission.items)
+        
+        if request.POST.get('action') == 'update_existing':
+            message = f"{deleted_count}件を削除、{updated_count}件を更新しました。"
         else:
-            # 通常モード：新規提出
-            request_type = request.POST.get('request_type')
-            selected_dates = request.POST.getlist('dates')
-            start_time = request.POST.get('start_time')
-            end_time = request.POST.get('end_time')
-            
-            if not selected_dates:
-                messages.error(request, "日付が選択されていません。")
-            else:
-                created_count = 0
-                for date_str in selected_dates:
-                    try:
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        
-                        # 既存の希望を削除
-                        ShiftRequest.objects.filter(
-                            staff=staff,
-                            date=date_obj,
-                            request_type=request_type
-                        ).delete()
-                        
-                        # 新しい希望を作成
-                        shift_request = ShiftRequest.objects.create(
-                            staff=staff,
-                            date=date_obj,
-                            request_type=request_type,
-                            start_time=datetime.strptime(start_time, '%H:%M').time() if start_time else None,
-                            end_time=datetime.strptime(end_time, '%H:%M').time() if end_time else None,
-                        )
-                        created_count += 1
-                        
-                    except ValueError:
-                        continue
-                
-                messages.success(request, f"{created_count}件の希望シフトを提出しました。")
-                return redirect('staff_shift:shift_requests')
+            message = f"{updated_count}件の希望シフトを提出しました。"
+        
+        # Ajaxリクエストの場合はJSONレスポンスを返す
+        if is_ajax:
+            return JsonResponse({
+                'success': True,
+                'message': message,
+                'deleted_count': deleted_count,
+                'updated_count': updated_count,
+                'results': [result.as_json() for result in results],
+            })
+        
+        messages.success(request, message)
+        return redirect('staff_shift:shift_requests')
     
     # カレンダー用の週データを生成
     calendar_weeks = generate_calendar_weeks(next_month_start, next_month_end)
@@ -468,6 +370,32 @@ def paid_leave_requests(request):
     return render(request, 'staff/paid_leave_requests.html', context)
 
 
+def _swap_board(staff, store):
+    """
+    募集一覧（募集者以外・公開中・締切前）と自分の立候補 {募集ID: 立候補}
+    立候補数・自分の立候補・空き状況は募集の件数によらず固定のクエリ数で付与する
+    """
+    swap_requests = list(ShiftSwapRequest.objects.accepting(date.today()).filter(
+        shift__store=store
+    ).exclude(requested_by=staff).for_board(staff).order_by('date', 'start_time'))
+    
+    my_applications = {
+        swap_req.id: swap_req.my_applications[0]
+        for swap_req in swap_requests if swap_req.my_applications
+    }
+    
+    # 各募集の時間帯に自分が空いているか（空き状況インデックスで判定）
+    if swap_requests:
+        availability = AvailabilityIndex.load(
+            store, swap_requests[0].date, max(swap_req.date for swap_req in swap_requests)
+        )
+        for swap_req in swap_requests:
+            swap_req.is_free_for_me = availability.is_free(
+                staff.id, swap_req.date, swap_req.start_time, swap_req.end_time
+            )
+    return swap_requests, my_applications
+
+
 @login_required
 @staff_required
 def shift_swap_list(request):
@@ -479,34 +407,8 @@ def shift_swap_list(request):
         messages.error(request, "スタッフ情報が見つかりません。")
         return redirect('login')
     
-    # 期限切れの募集を自動的に締切にする
-    today = date.today()
-    expired_requests = ShiftSwapRequest.objects.filter(
-        shift__store=store,
-        status='open',
-        date__lte=today + timedelta(days=1)
-    )
-    expired_requests.update(status='closed')
-    
-    # 自分の店舗の募集を取得（募集者以外、かつ公開中）
-    swap_requests = ShiftSwapRequest.objects.filter(
-        shift__store=store,
-        status='open'
-    ).exclude(requested_by=staff).select_related('shift', 'requested_by', 'shift__staff').order_by('date', 'start_time')
-    
-    # 自分の立候補状況と各募集の立候補数を取得
-    my_applications = {}
-    for swap_req in swap_requests:
-        try:
-            application = ShiftSwapApplication.objects.get(
-                swap_request=swap_req,
-                applicant=staff
-            )
-            my_applications[swap_req.id] = application
-        except ShiftSwapApplication.DoesNotExist:
-            pass
-        # 立候補数を計算
-        swap_req.application_count = swap_req.applications.filter(status='pending').count()
+    # 期限切れの募集の締切は sweep_expired（生成ワーカー）で更新し、ここでは締切前のみ表示する
+    swap_requests, my_applications = _swap_board(staff, store)
     
     context = {
         'staff': staff,
@@ -517,6 +419,43 @@ def shift_swap_list(request):
     return render(request, 'staff/shift_swap_list.html', context)
 
 
+@login_required
+@staff_required
+def shift_swap_list_api(request):
+    """シフト交代募集一覧をJSONで返す（画面の定期更新用）"""
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    swap_requests, my_applications = _swap_board(staff, store)
+    
+    swap_data = []
+    for swap_req in swap_requests:
+        requester = swap_req.requested_by.user
+        application = my_applications.get(swap_req.id)
+        swap_data.append({
+            'id': swap_req.id,
+            'date': swap_req.date.strftime('%Y-%m-%d'),
+            'start_time': swap_req.start_time.strftime('%H:%M'),
+            'end_time': swap_req.end_time.strftime('%H:%M'),
+            'deadline': swap_req.deadline.strftime('%Y-%m-%d'),
+            'requested_by': requester.get_full_name() or requester.username,
+            'is_available': swap_req.is_available,
+            'application_count': swap_req.application_count,
+            'is_free_for_me': swap_req.is_free_for_me,
+            'my_application': {
+                'id': application.id,
+                'status': application.status,
+                'start_time': application.start_time.strftime('%H:%M'),
+                'end_time': application.end_time.strftime('%H:%M'),
+            } if application else None,
+        })
+    
+    return JsonResponse({'swap_requests': swap_data})
+
+
 @login_required
 @staff_required
 def shift_swap_create(request):
@@ -593,6 +532,54 @@ def shift_swap_create(request):
     return render(request, 'staff/shift_swap_create.html', context)
 
 
+@login_required
+@staff_required
+def shift_swap_substitutes_api(request):
+    """
+    交代できるスタッフの推薦をJSONで返す
+    swap_request_id=自分の募集、または shift_id=自分のシフト（start_time / end_time で時間帯を変更可）
+    """
+    try:
+        staff = request.user.staff
+        store = staff.store
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    try:
+        if request.GET.get('swap_request_id'):
+            target = ShiftSwapRequest.objects.filter(
+                id=int(request.GET['swap_request_id']), requested_by=staff, shift__store=store
+            ).first()
+        elif request.GET.get('shift_id'):
+            target = Shift.objects.filter(id=int(request.GET['shift_id']), staff=staff, store=store).first()
+        else:
+            return JsonResponse({'error': 'シフトが指定されていません。'}, status=400)
+    except ValueError:
+        return JsonResponse({'error': '無効なIDです。'}, status=400)
+    if target is None:
+        return JsonResponse({'error': 'シフトが見つかりません。'}, status=404)
+    
+    try:
+        start_time = datetime.strptime(request.GET['start_time'], '%H:%M').time() \
+            if request.GET.get('start_time') else target.start_time
+        end_time = datetime.strptime(request.GET['end_time'], '%H:%M').time() \
+            if request.GET.get('end_time') else target.end_time
+    except ValueError:
+        return JsonResponse({'error': '無効な時間形式です。'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_SUBSTITUTES)), 1), MAX_SUBSTITUTES)
+    except ValueError:
+        return JsonResponse({'error': '無効な件数です。'}, status=400)
+    
+    substitutes = recommend_substitutes(store, target.date, start_time, end_time, requester_id=staff.id, limit=limit)
+    return JsonResponse({
+        'date': target.date.strftime('%Y-%m-%d'),
+        'start_time': start_time.strftime('%H:%M'),
+        'end_time': end_time.strftime('%H:%M'),
+        'substitutes': [substitute.as_json() for substitute in substitutes],
+    })
+
+
 @login_required
 @staff_required
 def shift_swap_apply(request, swap_request_id):
@@ -681,23 +668,11 @@ def shift_swap_my_requests(request):
         messages.error(request, "スタッフ情報が見つかりません。")
         return redirect('login')
     
-    # 期限切れの募集を自動的に締切にする
-    today = date.today()
-    expired_requests = ShiftSwapRequest.objects.filter(
-        requested_by=staff,
-        status='open',
-        date__lte=today + timedelta(days=1)
-    )
-    expired_requests.update(status='closed')
-    
-    # 自分の募集を取得
+    # 期限切れの募集は状態が募集中のままでも締切として表示する（更新は sweep_expired）
+    # 自分の募集を取得（立候補待ちの応募は立候補者とともに1クエリで取得）
     my_swap_requests = ShiftSwapRequest.objects.filter(
         requested_by=staff
-    ).select_related('shift').prefetch_related('applications__applicant').order_by('-created_at')
-    
-    # 各募集の立候補者を取得
-    for swap_req in my_swap_requests:
-        swap_req.applications_list = [app for app in swap_req.applications.all() if app.status == 'pending']
+    ).select_related('shift').with_pending_applications().order_by('-created_at')
     
     context = {
         'staff': staff,
@@ -747,20 +722,17 @@ def chat_list(request):
         messages.error(request, "スタッフ情報が見つかりません。")
         return redirect('login')
     
-    # 自分が参加しているチャットルームを取得
-    chat_rooms = ChatRoom.objects.filter(
+    # 自分が参加しているチャットルームを取得（未読数・最新メッセージは同じクエリで集計）
+    chat_rooms = list(ChatRoom.objects.filter(
         Q(participant1=staff) | Q(participant2=staff),
         store=store
-    ).select_related('participant1', 'participant2', 'swap_request').prefetch_related('messages').order_by('-updated_at')
+    ).with_summary(staff).order_by('-updated_at'))
     
-    # 各ルームの最新メッセージと未読数を取得
     for room in chat_rooms:
         room.other_participant = room.get_other_participant(staff)
-        room.unread_count = room.get_unread_count(staff)
-        room.last_message = room.messages.last()
     
     # 同じ店舗のスタッフ一覧（新規チャット作成用）
-    other_staff = Staff.objects.filter(store=store).exclude(id=staff.id).order_by('user__last_name', 'user__first_name')
+    other_staff = Staff.objects.filter(store=store).exclude(id=staff.id).select_related('user').order_by('user__last_name', 'user__first_name')
     
     context = {
         'staff': staff,
@@ -796,25 +768,17 @@ def chat_detail(request, room_id):
     
     other_participant = room.get_other_participant(staff)
     
-    # メッセージを取得
-    messages_list = room.messages.all().select_related('sender').order_by('created_at')
+    # メッセージを取得（最新の1ページ分、古いものは画面から履歴APIで読み込む）
+    messages_list, has_more_history = chat.history_page(room)
     
     # 未読メッセージを既読にする
-    unread_messages = room.messages.filter(is_read=False).exclude(sender=staff)
-    unread_messages.update(is_read=True)
+    chat.mark_read(room, staff)
     
-    # メッセージ送信処理
+    # メッセージ送信処理（JavaScriptが無効な場合のフォーム送信）
     if request.method == 'POST':
         form = ChatMessageForm(request.POST)
         if form.is_valid():
-            message = form.save(commit=False)
-            message.room = room
-            message.sender = staff
-            message.save()
-            
-            # ルームの更新日時を更新
-            room.save()
-            
+            chat.post_message(room, staff, form.cleaned_data['message'])
             messages.success(request, "メッセージを送信しました。")
             return redirect('staff_shift:chat_detail', room_id=room.id)
     else:
@@ -826,12 +790,79 @@ def chat_detail(request, room_id):
         'room': room,
         'other_participant': other_participant,
         'messages_list': messages_list,
+        'has_more_history': has_more_history,
+        'history_cursor': chat.encode_cursor(messages_list[0]) if messages_list else '',
+        'latest_cursor': chat.encode_cursor(messages_list[-1]) if messages_list else '',
         'form': form,
     }
     
     return render(request, 'staff/chat_detail.html', context)
 
 
+@login_required
+@staff_required
+def chat_messages_api(request, room_id):
+    """
+    チャットメッセージをJSONで返す
+    before=カーソル で古い履歴、after=カーソル で新着のみ（新着取得時は既読にする）
+    """
+    try:
+        staff = request.user.staff
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    room = chat.get_participant_room(staff, room_id)
+    if room is None:
+        return JsonResponse({'error': 'このチャットルームにアクセスする権限がありません。'}, status=403)
+    
+    try:
+        limit = max(1, min(int(request.GET.get('limit', chat.HISTORY_PAGE_SIZE)), chat.MAX_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': '無効な件数です。'}, status=400)
+    
+    try:
+        if request.GET.get('after'):
+            message_list, has_more = chat.messages_after(room, request.GET['after'], limit)
+            chat.mark_read(room, staff)
+        else:
+            message_list, has_more = chat.history_page(room, request.GET.get('before'), limit)
+    except ValueError:
+        return JsonResponse({'error': '無効なカーソルです。'}, status=400)
+    
+    return JsonResponse({
+        'messages': [chat.message_json(message, staff) for message in message_list],
+        'has_more': has_more,
+    })
+
+
+@login_required
+@staff_required
+@require_http_methods(["POST"])
+def chat_send_api(request, room_id):
+    """チャットメッセージを送信し、作成したメッセージをJSONで返す"""
+    try:
+        staff = request.user.staff
+    except Staff.DoesNotExist:
+        return JsonResponse({'error': 'スタッフ情報が見つかりません。'}, status=400)
+    
+    room = chat.get_participant_room(staff, room_id)
+    if room is None:
+        return JsonResponse({'error': 'このチャットルームにアクセスする権限がありません。'}, status=403)
+    
+    form = ChatMessageForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors['message'][0]}, status=400)
+    
+    message = chat.post_message(room, staff, form.cleaned_data['message'])
+    return JsonResponse({'success': True, 'message': chat.message_json(message, staff)})
+
+
+@login_required
+async def chat_stream(request, room_id):
+    """チャットの新着メッセージ・既読のイベントストリーム（Server-Sent Events）"""
+    return await live.chat_stream_response(request, room_id)
+
+
 @login_required
 @staff_required
 def chat_create(request, staff_id):
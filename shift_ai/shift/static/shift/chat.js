@@ -0,0 +1,222 @@
+/*
+ * チャット詳細画面：履歴の追加読み込み・新着の受信・メッセージ送信（ページ遷移なし）
+ * #messagesContainer の data 属性で API のURLとカーソルを受け取る。
+ * 新着と既読はイベントストリーム（SSE）で受け取り、接続できない間は新着取得APIをポーリングする
+ */
+(function () {
+    const POLL_INTERVAL = 5000;
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function linebreaks(text) {
+        return escapeHtml(text).split(/\n{2,}/).map(p => `<p>${p.replace(/\n/g, '<br>')}</p>`).join('');
+    }
+
+    function renderMessage(message) {
+        const wrapper = document.createElement('div');
+        wrapper.className = 'mb-3' + (message.is_mine ? ' text-end' : '');
+        wrapper.dataset.messageId = message.id;
+        wrapper.innerHTML = `
+            <div class="d-inline-block ${message.is_mine ? 'text-end' : ''}" style="max-width: 70%;">
+                <div class="d-flex align-items-center mb-1 ${message.is_mine ? 'flex-row-reverse' : ''}">
+                    <strong class="me-2">${escapeHtml(message.sender_name)}</strong>
+                    <small class="text-muted">${message.created_at_display}</small>
+                    ${message.is_mine ? `<small class="chat-read-state text-muted me-2">${message.is_read ? '既読' : ''}</small>` : ''}
+                </div>
+                <div class="p-3 rounded ${message.is_mine ? 'bg-primary text-white' : 'bg-white border'}">
+                    ${linebreaks(message.message)}
+                </div>
+            </div>`;
+        return wrapper;
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const container = document.getElementById('messagesContainer');
+        const form = document.getElementById('messageForm');
+        if (!container || !container.dataset.messagesUrl) {
+            return;
+        }
+        const state = {
+            historyCursor: container.dataset.historyCursor,
+            latestCursor: container.dataset.latestCursor,
+            polling: false,
+        };
+        const emptyNotice = container.querySelector('.chat-empty');
+        const olderButton = document.getElementById('loadOlderMessages');
+        const csrfToken = form ? form.querySelector('[name=csrfmiddlewaretoken]').value : '';
+
+        function isRendered(message) {
+            return container.querySelector(`[data-message-id="${message.id}"]`) !== null;
+        }
+
+        function appendMessages(messages) {
+            const atBottom = container.scrollHeight - container.scrollTop - container.clientHeight < 40;
+            messages.forEach(message => {
+                if (!isRendered(message)) {
+                    container.appendChild(renderMessage(message));
+                }
+                state.latestCursor = message.cursor;
+                if (!state.historyCursor) {
+                    state.historyCursor = message.cursor;
+                }
+            });
+            if (messages.length && emptyNotice) {
+                emptyNotice.remove();
+            }
+            if (messages.length && atBottom) {
+                container.scrollTop = container.scrollHeight;
+            }
+        }
+
+        // 新着メッセージの取得
+        function fetchNewMessages() {
+            if (state.polling) {
+                return Promise.resolve();
+            }
+            state.polling = true;
+            const url = new URL(container.dataset.messagesUrl, window.location.origin);
+            if (state.latestCursor) {
+                url.searchParams.set('after', state.latestCursor);
+            }
+            return fetch(url, {credentials: 'same-origin'})
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.error) {
+                        appendMessages(data.messages);
+                        if (data.has_more) {
+                            state.polling = false;
+                            return fetchNewMessages();
+                        }
+                    }
+                })
+                .catch(error => console.error('Error:', error))
+                .finally(() => { state.polling = false; });
+        }
+
+        // 古い履歴の読み込み
+        if (olderButton) {
+            olderButton.addEventListener('click', function () {
+                const url = new URL(container.dataset.messagesUrl, window.location.origin);
+                url.searchParams.set('before', state.historyCursor);
+                olderButton.disabled = true;
+                fetch(url, {credentials: 'same-origin'})
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.error) {
+                            alert('エラー: ' + data.error);
+                            return;
+                        }
+                        const previousHeight = container.scrollHeight;
+                        const anchor = olderButton.parentElement.nextSibling;
+                        data.messages.forEach(message => {
+                            container.insertBefore(renderMessage(message), anchor);
+                        });
+                        if (data.messages.length) {
+                            state.historyCursor = data.messages[0].cursor;
+                        }
+                        container.scrollTop += container.scrollHeight - previousHeight;
+                        if (!data.has_more) {
+                            olderButton.parentElement.remove();
+                        }
+                    })
+                    .catch(error => console.error('Error:', error))
+                    .finally(() => { olderButton.disabled = false; });
+            });
+        }
+
+        // 送信
+        if (form && container.dataset.sendUrl) {
+            form.addEventListener('submit', function (event) {
+                event.preventDefault();
+                const input = form.querySelector('textarea[name=message]');
+                const button = form.querySelector('button[type=submit]');
+                if (!input.value.trim()) {
+                    return;
+                }
+                button.disabled = true;
+                fetch(container.dataset.sendUrl, {
+                    method: 'POST',
+                    headers: {'X-CSRFToken': csrfToken},
+                    body: new FormData(form),
+                    credentials: 'same-origin',
+                })
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.error) {
+                            alert('エラー: ' + data.error);
+                            return;
+                        }
+                        input.value = '';
+                        appendMessages([data.message]);
+                        container.scrollTop = container.scrollHeight;
+                    })
+                    .catch(error => {
+                        alert('エラーが発生しました。');
+                        console.error('Error:', error);
+                    })
+                    .finally(() => { button.disabled = false; });
+            });
+        }
+
+        container.scrollTop = container.scrollHeight;
+        function startPolling() {
+            if (!state.pollTimer) {
+                state.pollTimer = setInterval(fetchNewMessages, POLL_INTERVAL);
+            }
+        }
+
+        function stopPolling() {
+            clearInterval(state.pollTimer);
+            state.pollTimer = null;
+        }
+
+        // 相手のメッセージを受信したら既読にする（新着取得APIが既読を付ける）
+        let markReadTimer = null;
+        function scheduleMarkRead() {
+            clearTimeout(markReadTimer);
+            markReadTimer = setTimeout(fetchNewMessages, 500);
+        }
+
+        function connectStream() {
+            if (!window.EventSource || !container.dataset.streamUrl) {
+                return;
+            }
+            const url = new URL(container.dataset.streamUrl, window.location.origin);
+            if (state.latestCursor) {
+                url.searchParams.set('after', state.latestCursor);
+            }
+            const source = new EventSource(url);
+            source.addEventListener('open', function () {
+                stopPolling();
+                fetchNewMessages();
+            });
+            source.addEventListener('message', function (event) {
+                const message = JSON.parse(event.data);
+                appendMessages([message]);
+                if (!message.is_mine) {
+                    scheduleMarkRead();
+                }
+            });
+            source.addEventListener('read', function (event) {
+                const data = JSON.parse(event.data);
+                if (String(data.reader_id) !== container.dataset.staffId) {
+                    container.querySelectorAll('.chat-read-state').forEach(label => { label.textContent = '既読'; });
+                }
+            });
+            source.addEventListener('resync', fetchNewMessages);
+            source.addEventListener('error', function () {
+                // 再接続中・配信が無効（WSGI）の間はポーリングで補う
+                startPolling();
+            });
+            state.source = source;
+        }
+
+        window.shiftChat = {container, state, appendMessages, fetchNewMessages};
+        startPolling();
+        connectStream();
+    });
+})();
@@ -0,0 +1,193 @@
+"""
+希望シフトの一括提出
+提出内容全体を先に検証し、問題がなければ削除・更新・作成を1トランザクションの一括処理（数クエリ）で適用する。
+1日でも不正な内容があれば何も保存せず、日付ごとの結果（エラー内容）を返す
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Optional
+from django.db import transaction
+from django.utils import timezone
+from shift.models import ShiftRequest
+from shift.tombstones import record_deleted_requests
+
+REQUEST_TYPES = {value for value, _ in ShiftRequest.REQUEST_TYPE_CHOICES}
+
+
+class SubmissionItem(NamedTuple):
+    """提出する希望1日分"""
+    date: date
+    request_type: str
+    start_time: Optional[time]
+    end_time: Optional[time]
+    end_date: Optional[date]
+
+
+class SubmissionResult(NamedTuple):
+    """日付ごとの結果"""
+    date: str
+    status: str            # 'created' / 'updated' / 'deleted' / 'error'
+    message: str = ''
+
+    def as_json(self) -> Dict:
+        return self._asdict()
+
+
+class Submission:
+    """提出内容（検証済みの削除日・希望と、検証エラー）"""
+
+    def __init__(self):
+        self.delete_dates: List[date] = []
+        self.items: List[SubmissionItem] = []
+        self.errors: List[SubmissionResult] = []
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.errors
+
+    def error(self, date_str: str, message: str):
+        self.errors.append(SubmissionResult(date_str, 'error', message))
+
+    def add_delete(self, date_str: str):
+        try:
+            self.delete_dates.append(_parse_date(date_str))
+        except ValueError:
+            self.error(date_str, f'{date_str}の日付が不正です。')
+
+    def add_item(self, date_str: str, request_type: str, start_time: Optional[str], end_time: Optional[str],
+                 end_date_offset: Optional[str] = None):
+        try:
+            target_date = _parse_date(date_str)
+        except ValueError:
+            self.error(date_str, f'{date_str}の日付が不正です。')
+            return
+        if request_type not in REQUEST_TYPES:
+            self.error(date_str, f'{date_str}の希望の種別が不正です。')
+            return
+        try:
+            start = _parse_time(start_time)
+        except ValueError:
+            self.error(date_str, f'{date_str}の開始時間が不正です。')
+            return
+        try:
+            end = _parse_time(end_time)
+        except ValueError:
+            self.error(date_str, f'{date_str}の終了時間が不正です。')
+            return
+        try:
+            offset = int(end_date_offset) if end_date_offset else 0
+        except ValueError:
+            self.error(date_str, f'{date_str}の終了日が不正です。')
+            return
+        item = SubmissionItem(
+            target_date, request_type, start, end,
+            target_date + timedelta(days=offset) if offset > 0 else None,
+        )
+        # 同じ日・種別が複数回送られた場合は後のものを採用する（従来の画面と同じ）
+        for i, existing in enumerate(self.items):
+            if existing.date == target_date and existing.request_type == request_type:
+                self.items[i] = item
+                return
+        self.items.append(item)
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _parse_time(value: Optional[str]) -> Optional[time]:
+    if not value or not value.strip():
+        return None
+    return datetime.strptime(value.strip(), '%H:%M').time()
+
+
+def parse_edit_payload(data) -> Submission:
+    """編集モード（削除日と、日付ごとの種別・時間の並列リスト）の提出内容"""
+    submission = Submission()
+    for date_str in data.getlist('delete_dates'):
+        submission.add_delete(date_str)
+    request_types = data.getlist('request_types')
+    start_times = data.getlist('start_times')
+    end_times = data.getlist('end_times')
+    end_date_offsets = data.getlist('end_date_offsets')
+    for i, date_str in enumerate(data.getlist('update_dates')):
+        submission.add_item(
+            date_str,
+            request_types[i] if i < len(request_types) else 'work',
+            start_times[i] if i < len(start_times) else None,
+            end_times[i] if i < len(end_times) else None,
+            end_date_offsets[i] if i < len(end_date_offsets) else None,
+        )
+    return submission
+
+
+def parse_bulk_payload(data) -> Submission:
+    """通常モード（選択した日付に同じ種別・時間）の提出内容"""
+    submission = Submission()
+    request_type = data.get('request_type')
+    for date_str in data.getlist('dates'):
+        submission.add_item(date_str, request_type, data.get('start_time'), data.get('end_time'))
+    return submission
+
+
+def apply_submission(staff, submission: Submission, replace_day: bool = True) -> List[SubmissionResult]:
+    """
+    検証済みの提出内容を1トランザクションで適用
+
+    Args:
+        replace_day: True の場合、希望を出した日の他の種別の希望も削除する（1日1件にする）
+
+    Returns:
+        日付ごとの結果（削除 → 希望の順）
+    """
+    if not submission.is_valid:
+        raise ValueError('検証エラーのある提出内容は適用できません。')
+
+    now = timezone.now()
+    delete_dates = set(submission.delete_dates)
+    item_keys = {(item.date, item.request_type) for item in submission.items}
+    item_dates = {item.date for item in submission.items}
+    with transaction.atomic():
+        existing = {}
+        stale = []
+        for shift_request in ShiftRequest.objects.select_for_update().filter(
+            staff=staff,
+            date__in=delete_dates | item_dates
+        ):
+            key = (shift_request.date, shift_request.request_type)
+            if shift_request.date in delete_dates or (replace_day and key not in item_keys):
+                stale.append(shift_request)
+            elif key in item_keys:
+                existing[key] = shift_request
+
+        if stale:
+            ShiftRequest.objects.filter(id__in=[shift_request.id for shift_request in stale]).delete()
+            record_deleted_requests(staff.store_id, stale)
+
+        results = [SubmissionResult(d.strftime('%Y-%m-%d'), 'deleted') for d in submission.delete_dates]
+        to_update, to_create = [], []
+        for item in submission.items:
+            shift_request = existing.get((item.date, item.request_type))
+            if shift_request is None:
+                to_create.append(ShiftRequest(
+                    staff=staff, date=item.date, request_type=item.request_type,
+                    start_time=item.start_time, end_time=item.end_time, end_date=item.end_date,
+                ))
+                status = 'created'
+            else:
+                shift_request.start_time = item.start_time
+                shift_request.end_time = item.end_time
+                shift_request.end_date = item.end_date
+                # 再提出も提出日時を更新する（管理画面の最終提出日時）
+                shift_request.submitted_at = now
+                shift_request.updated_at = now
+                to_update.append(shift_request)
+                status = 'updated'
+            results.append(SubmissionResult(item.date.strftime('%Y-%m-%d'), status))
+
+        if to_update:
+            ShiftRequest.objects.bulk_update(
+                to_update, ['start_time', 'end_time', 'end_date', 'submitted_at', 'updated_at']
+            )
+        if to_create:
+            ShiftRequest.objects.bulk_create(to_create)
+    return results
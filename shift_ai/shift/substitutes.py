@@ -0,0 +1,211 @@
+"""
+シフト交代の代わりに入れるスタッフの推薦
+(店舗, 週) ごとに、スタッフ情報・週の勤務時間・希望/割当のビットマスク・必要人数設定を1回だけ読み込んだ
+インデックスを作り、プロセス内に保持する。シフトの変更（カレンダーのバージョン）と希望の変更で作り直すため、
+2回目以降の推薦はデータベースをほぼ参照せずに計算できる
+
+判定:
+    除外: 時間帯に別のシフトがある / 週最大労働時間を超える
+    順位: 責任者・スキルの不足を補えるか > 勤務希望を出しているか > 週の勤務時間が少ないか
+"""
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, time, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from django.db.models import Count, Max
+from accounts.models import Staff, StaffRequirement
+from shift import calendar_cache
+from shift.availability import AvailabilityIndex
+from shift.models import Shift, ShiftRequest
+from shift.problem_snapshot import ShiftSlot, span_minutes, week_start
+from shift.time_grid import SKILLED_LEVEL
+from shift.utils import get_staff_name_japanese
+
+MAX_CACHED_WEEKS = 64
+DEFAULT_SUBSTITUTES = 10
+MAX_SUBSTITUTES = 50
+
+
+class StaffInfo(NamedTuple):
+    """推薦に使うスタッフ情報"""
+    id: int
+    name: str
+    is_manager: bool
+    hall_skilled: bool
+    kitchen_skilled: bool
+    max_weekly_minutes: int
+
+
+class Substitute(NamedTuple):
+    """推薦結果1件"""
+    staff: StaffInfo
+    has_requested: bool
+    weekly_minutes: int
+    remaining_minutes: int           # 交代後の週最大労働時間までの残り
+    covers: List[str]                # 補える不足（'manager' / 'hall' / 'kitchen'）
+    uncovered: List[str]             # 交代後も残る不足
+
+    def as_json(self) -> Dict:
+        return {
+            'staff_id': self.staff.id,
+            'name': self.staff.name,
+            'is_manager': self.staff.is_manager,
+            'has_requested': self.has_requested,
+            'weekly_hours': round(self.weekly_minutes / 60, 1),
+            'remaining_hours': round(self.remaining_minutes / 60, 1),
+            'covers': self.covers,
+            'uncovered': self.uncovered,
+        }
+
+
+class WeekIndex:
+    """店舗の1週間分の推薦用インデックス（DBアクセスなしで参照）"""
+
+    def __init__(self, week: date, staff: Dict[int, StaffInfo], weekly_minutes: Dict[int, int],
+                 availability: AvailabilityIndex, requirements_by_weekday: Dict[int, List[StaffRequirement]]):
+        self.week = week
+        self.staff = staff
+        self.weekly_minutes = weekly_minutes
+        self.availability = availability
+        self.requirements_by_weekday = requirements_by_weekday
+
+    @classmethod
+    def load(cls, store, week: date) -> 'WeekIndex':
+        """週の前日（日をまたぐシフト・希望）から週末までを読み込む（4クエリ）"""
+        week_end = week + timedelta(days=6)
+        staff = {
+            member.id: StaffInfo(
+                member.id,
+                get_staff_name_japanese(member.user),
+                member.is_manager,
+                member.hall_skill_level >= SKILLED_LEVEL,
+                member.kitchen_skill_level >= SKILLED_LEVEL,
+                member.max_weekly_hours * 60,
+            )
+            for member in Staff.objects.filter(store=store).select_related('user').order_by('id')
+        }
+        availability = AvailabilityIndex(staff.keys())
+
+        for row in ShiftRequest.objects.filter(
+            staff__store=store,
+            request_type='work',
+            date__range=[week - timedelta(days=1), week_end]
+        ).values_list('staff_id', 'date', 'start_time', 'end_time', 'end_date'):
+            availability.add_request(*row)
+
+        weekly_minutes = defaultdict(int)
+        for row in Shift.objects.filter(
+            store=store,
+            date__range=[week - timedelta(days=1), week_end]
+        ).values_list('id', 'staff_id', 'date', 'start_time', 'end_time', 'end_date', 'is_confirmed'):
+            shift = ShiftSlot(*row)
+            availability.add_assignment(shift.staff_id, shift.date, shift.start_time, shift.end_time, shift.end_date)
+            if shift.date >= week:
+                weekly_minutes[shift.staff_id] += shift.minutes
+
+        requirements_by_weekday = defaultdict(list)
+        for requirement in StaffRequirement.objects.filter(store=store).order_by('start_time'):
+            requirements_by_weekday[requirement.day_of_week].append(requirement)
+
+        return cls(week, staff, dict(weekly_minutes), availability, dict(requirements_by_weekday))
+
+    def shortages(self, target_date: date, start_time: time, end_time: time,
+                  exclude_staff_id: Optional[int]) -> List[str]:
+        """時間帯に重なる必要人数設定のうち、exclude_staff_id が抜けると不足する責任者・スキル"""
+        window = dict(self.availability.window_masks(target_date, start_time, end_time))
+        day_bits = self.availability.assigned.get(target_date, {})
+        shortages = []
+        for requirement in self.requirements_by_weekday.get(target_date.weekday(), []):
+            masks = self.availability.window_masks(target_date, requirement.start_time, requirement.end_time)
+            requirement_mask = dict(masks).get(target_date, 0)
+            if not requirement_mask & window.get(target_date, 0):
+                continue
+            on_duty = [
+                self.staff[staff_id] for staff_id, bits in day_bits.items()
+                if bits & requirement_mask and staff_id != exclude_staff_id and staff_id in self.staff
+            ]
+            needs = (
+                ('manager', requirement.required_managers, sum(1 for s in on_duty if s.is_manager)),
+                ('hall', requirement.required_hall_skill, sum(1 for s in on_duty if s.hall_skilled)),
+                ('kitchen', requirement.required_kitchen_skill, sum(1 for s in on_duty if s.kitchen_skilled)),
+            )
+            for need, required, present in needs:
+                if present < required and need not in shortages:
+                    shortages.append(need)
+        return shortages
+
+    def recommend(self, target_date: date, start_time: time, end_time: time,
+                  requester_id: Optional[int] = None, limit: Optional[int] = None) -> List[Substitute]:
+        """交代できるスタッフを推薦順に返す"""
+        minutes = span_minutes(start_time, end_time)
+        shortages = self.shortages(target_date, start_time, end_time, requester_id)
+        free = set(self.availability.free_staff(target_date, start_time, end_time))
+
+        candidates = []
+        for staff_id, info in self.staff.items():
+            if staff_id == requester_id or staff_id not in free:
+                continue
+            weekly = self.weekly_minutes.get(staff_id, 0)
+            remaining = info.max_weekly_minutes - weekly - minutes
+            if remaining < 0:
+                continue
+            skills = {'manager': info.is_manager, 'hall': info.hall_skilled, 'kitchen': info.kitchen_skilled}
+            covers = [need for need in shortages if skills[need]]
+            candidates.append(Substitute(
+                staff=info,
+                has_requested=self.availability.has_requested(staff_id, target_date, start_time, end_time),
+                weekly_minutes=weekly,
+                remaining_minutes=remaining,
+                covers=covers,
+                uncovered=[need for need in shortages if not skills[need]],
+            ))
+
+        candidates.sort(key=lambda c: (len(c.uncovered), not c.has_requested, c.weekly_minutes, c.staff.id))
+        return candidates[:limit] if limit else candidates
+
+
+_cache: 'OrderedDict[Tuple, WeekIndex]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _index_key(store, week: date) -> Tuple:
+    """シフト（カレンダーのバージョン）と希望（件数・最終更新日時）が変わると変わるキー"""
+    week_end = week + timedelta(days=6)
+    requests = ShiftRequest.objects.filter(
+        staff__store=store,
+        date__range=[week - timedelta(days=1), week_end]
+    ).aggregate(count=Count('id'), updated=Max('updated_at'))
+    return (
+        store.id, week,
+        calendar_cache.range_etag(store.id, week - timedelta(days=1), week_end),
+        requests['count'], requests['updated'],
+    )
+
+
+def week_index(store, target_date: date) -> WeekIndex:
+    """target_date を含む週のインデックス（変更がなければ前回のものを再利用）"""
+    week = week_start(target_date)
+    key = _index_key(store, week)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+    index = WeekIndex.load(store, week)
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > MAX_CACHED_WEEKS:
+            _cache.popitem(last=False)
+    return index
+
+
+def recommend_substitutes(store, target_date: date, start_time: time, end_time: time,
+                          requester_id: Optional[int] = None, limit: Optional[int] = None) -> List[Substitute]:
+    """
+    交代できるスタッフの推薦
+
+    Args:
+        requester_id: 交代を募集するスタッフ（候補から除外し、不足の判定では勤務から外す）
+        limit: 返す件数の上限
+    """
+    return week_index(store, target_date).recommend(target_date, start_time, end_time, requester_id, limit)
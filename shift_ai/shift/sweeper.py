@@ -0,0 +1,98 @@
+"""
+時間経過による状態遷移（期限切れの締切など）をまとめて適用する
+画面の表示ごとに更新するのではなく、sweep_expired コマンド（cron）や生成ワーカーから定期的に実行する。
+対象は件数を区切って更新し、更新直前に状態を再確認するため画面からの操作と競合しても二重に遷移しない
+"""
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+from django.conf import settings
+from django.utils import timezone
+from shift.models import GenerationJob, ScheduleTombstone, ShiftSwapRequest
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_GENERATION_JOB_TIMEOUT = 6 * 60 * 60  # 秒
+DEFAULT_TOMBSTONE_RETENTION_DAYS = 90
+
+
+class Sweep(NamedTuple):
+    """状態遷移の定義"""
+    name: str
+    description: str
+    candidates: Callable        # (today, now) -> 遷移させるクエリセット
+    updates: Optional[Callable]  # (now) -> 更新するフィールド（None の場合は対象を削除する）
+
+
+def _expired_swap_requests(today: date, now: datetime):
+    # 出勤日の前日が締切のため、今日以前の募集は締め切る（締切日当日の翌日分はまだ立候補できる）
+    return ShiftSwapRequest.objects.expired(today)
+
+
+def _stalled_generation_jobs(today: date, now: datetime):
+    timeout = getattr(settings, 'GENERATION_JOB_TIMEOUT', DEFAULT_GENERATION_JOB_TIMEOUT)
+    return GenerationJob.objects.filter(status='running', started_at__lt=now - timedelta(seconds=timeout))
+
+
+def _old_tombstones(today: date, now: datetime):
+    # 差分再生成の基準（前回生成）がこれより古い場合、削除は検出されない
+    days = getattr(settings, 'SCHEDULE_TOMBSTONE_RETENTION_DAYS', DEFAULT_TOMBSTONE_RETENTION_DAYS)
+    return ScheduleTombstone.objects.filter(deleted_at__lt=now - timedelta(days=days))
+
+
+SWEEPS = [
+    Sweep(
+        'close_expired_swaps', '締切を過ぎたシフト交代募集を締め切る',
+        _expired_swap_requests,
+        lambda now: {'status': 'closed', 'updated_at': now},
+    ),
+    Sweep(
+        'fail_stalled_generation_jobs', '長時間実行中のまま止まった生成ジョブを失敗にする',
+        _stalled_generation_jobs,
+        lambda now: {'status': 'failed', 'message': 'タイムアウトしました', 'finished_at': now},
+    ),
+    Sweep(
+        'purge_tombstones', '保存期間を過ぎた希望シフト・シフトの削除記録を削除する',
+        _old_tombstones,
+        None,
+    ),
+]
+
+
+def apply_sweep(sweep: Sweep, today: date, now: datetime, batch_size: int = DEFAULT_BATCH_SIZE,
+                dry_run: bool = False) -> int:
+    """状態遷移（または削除）を batch_size 件ずつ適用（適用した件数、dry_run の場合は対象件数）"""
+    candidates = sweep.candidates(today, now)
+    if dry_run:
+        return candidates.count()
+    updates = sweep.updates(now) if sweep.updates else None
+    total = 0
+    while True:
+        ids = list(candidates.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        # 取得後に状態が変わったものは除外するため、条件を付けたまま更新する
+        if updates is None:
+            total += candidates.filter(id__in=ids).delete()[0]
+        else:
+            total += candidates.filter(id__in=ids).update(**updates)
+        if len(ids) < batch_size:
+            return total
+
+
+def run_sweeps(names: Optional[List[str]] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+               dry_run: bool = False, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    状態遷移を順に適用
+
+    Args:
+        names: 実行する遷移の名前（省略時はすべて）
+        today: 基準日（省略時は今日）
+
+    Returns:
+        {遷移の名前: 件数}
+    """
+    now = timezone.now()
+    today = today or date.today()
+    return {
+        sweep.name: apply_sweep(sweep, today, now, batch_size, dry_run)
+        for sweep in SWEEPS if names is None or sweep.name in names
+    }
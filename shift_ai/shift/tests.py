@@ -1,3 +1,753 @@
-from django.test import TestCase
+import json
+import os
+from datetime import date, time, timedelta
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from accounts.models import Staff, StaffRequirement, Store
+from shift import chat, jobs
+from shift.admin_views import build_gantt_days
+from shift.generation import GenerationCancelled, generate_and_save_shifts
+from shift.models import (
+    ChatMessage, ChatRoom, DailyStoreStats, GenerationJob, ScheduleTombstone, Shift, ShiftRequest,
+    ShiftSwapApplication, ShiftSwapRequest,
+)
+from shift.problem_snapshot import ProblemSnapshot
+from shift.solvers import cpsat_available, get_solver
+from shift.submissions import Submission, apply_submission
+from shift.sweeper import run_sweeps
+from shift_ai.instrumentation import registry
+from shift_ai.testing import QueryBudgetMixin
 
-# Create your tests here.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shift-tests'},
+    'calendar': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shift-tests-calendar'},
+}
+
+
+def create_store(name='テスト店舗'):
+    return Store.objects.create(name=name, opening_time=time(10), closing_time=time(23))
+
+
+def create_staff(store, username, hourly_wage=1000, is_manager=False, **fields):
+    user = User.objects.create_user(
+        username=username, password='password', first_name='太郎', last_name=username
+    )
+    return Staff.objects.create(
+        user=user, store=store, hourly_wage=hourly_wage, is_manager=is_manager, **fields
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class WageChangeRollupTests(TestCase):
+    """時給の変更が日別集計と集計を表示する画面に反映されること"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.manager = create_staff(self.store, 'manager', hourly_wage=2000, is_manager=True)
+        self.staff = create_staff(self.store, 'staff', hourly_wage=1000)
+        self.day = date.today().replace(day=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            # 8時間 × 1000円 と、日をまたぐ 4時間 × 1000円（当日2時間・翌日2時間）
+            Shift.objects.create(store=self.store, staff=self.staff, date=self.day,
+                                 start_time=time(10), end_time=time(18), is_confirmed=True)
+            Shift.objects.create(store=self.store, staff=self.staff, date=self.day + timedelta(days=1),
+                                 start_time=time(22), end_time=time(2), is_confirmed=True)
+        self.client.force_login(self.manager.user)
+
+    def _change_wage(self, hourly_wage):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff.hourly_wage = hourly_wage
+            self.staff.save()
+
+    def _page_totals(self):
+        params = {'year': self.day.year, 'month': self.day.month}
+        calendar_page = self.client.get(reverse('admin_shift:shift_calendar'), params)
+        creation_page = self.client.get(reverse('admin_shift:shift_creation'), params)
+        dashboard = self.client.get(reverse('admin_accounts:dashboard'))
+        return (
+            calendar_page.context['total_cost'],
+            creation_page.context['total_cost'],
+            dashboard.context['total_cost'],
+        )
+
+    def test_rollup_cost_follows_wage_change(self):
+        self.assertEqual(DailyStoreStats.objects.get(store=self.store, date=self.day).confirmed_cost, 8000)
+        self._change_wage(1500)
+        costs = dict(DailyStoreStats.objects.filter(store=self.store).values_list('date', 'confirmed_cost'))
+        self.assertEqual(costs, {
+            self.day: 12000,
+            self.day + timedelta(days=1): 3000,
+            self.day + timedelta(days=2): 3000,
+        })
+
+    def test_pages_show_cost_at_new_wage(self):
+        # 表示データをキャッシュさせてから時給を変更する
+        self.assertEqual(self._page_totals(), (12000, 12000, 12000))
+        self._change_wage(1500)
+        live_total = Shift.objects.filter(store=self.store, is_confirmed=True).totals()['cost']
+        self.assertEqual(live_total, 18000)
+        self.assertEqual(self._page_totals(), (18000, 18000, 18000))
+
+    def test_other_staff_changes_do_not_refresh(self):
+        DailyStoreStats.objects.filter(store=self.store).update(confirmed_cost=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff.max_weekly_hours = 30
+            self.staff.save()
+        self.assertFalse(DailyStoreStats.objects.filter(store=self.store).exclude(confirmed_cost=0).exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CalendarCacheWageChangeTests(TestCase):
+    """キャッシュ済みのカレンダー表示データが時給の変更後に作り直されること"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.manager = create_staff(self.store, 'manager', hourly_wage=2000, is_manager=True)
+        self.staff = create_staff(self.store, 'staff', hourly_wage=1000)
+        self.day = date.today().replace(day=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(store=self.store, staff=self.staff, date=self.day,
+                                 start_time=time(10), end_time=time(18), is_confirmed=True)
+        self.client.force_login(self.manager.user)
+        self.url = reverse('admin_shift:shift_calendar')
+        self.params = {'year': self.day.year, 'month': self.day.month}
+
+    def _day_cost(self, response):
+        return json.loads(response.context['date_stats_json'])[self.day.strftime('%Y-%m-%d')]['total_cost']
+
+    def test_calendar_content_reflects_wage_change(self):
+        first = self.client.get(self.url, self.params)
+        self.assertEqual(self._day_cost(first), 8000)
+        self.assertEqual(self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff.hourly_wage = 1200
+            self.staff.save()
+
+        second = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self._day_cost(second), 9600)
+        self.assertEqual(second.context['total_cost'], 9600)
+        shift_costs = [shift['wage_cost'] for shift in json.loads(second.context['shifts_json'])]
+        self.assertEqual(shift_costs, [9600])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class IncrementalGenerationTests(TestCase):
+    """差分再生成が変更のあった日だけを作り直すこと"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.start = date(2030, 4, 1)
+        self.end = date(2030, 4, 14)
+        # 必要人数（3人）に対してスタッフが足りず、毎日不足が残る
+        for day_of_week in range(7):
+            StaffRequirement.objects.create(
+                store=self.store, day_of_week=day_of_week,
+                start_time=time(10), end_time=time(15), required_staff=3
+            )
+        self.staff = [
+            create_staff(self.store, f'staff{i}', max_weekly_hours=40, employment_type='flexible')
+            for i in range(2)
+        ]
+        for member in self.staff:
+            for offset in range(14):
+                ShiftRequest.objects.create(
+                    staff=member, date=self.start + timedelta(days=offset), request_type='work',
+                    start_time=time(10), end_time=time(15)
+                )
+        full = self._run('full')
+        self.assertEqual(full.status, 'succeeded', full.result)
+        self.assertGreater(full.result['created_count'], 0)
+
+    def _run(self, mode):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.submit_job(self.store, self.start, self.end, solver='greedy', mode=mode)
+            job = jobs.claim_next_job()
+            return jobs.run_job(job)
+
+    def test_changed_request_regenerates_only_its_date(self):
+        target = self.start + timedelta(days=3)
+        request = ShiftRequest.objects.get(staff=self.staff[0], date=target)
+        request.end_time = time(14)
+        request.save()
+        shift_ids = set(Shift.objects.exclude(date=target).values_list('id', flat=True))
+
+        job = self._run('incremental')
+        self.assertEqual(job.status, 'succeeded', job.result)
+        self.assertEqual(job.result['regenerated_dates'], [target.strftime('%Y-%m-%d')])
+        # 他の日のシフトは作り直さない
+        self.assertEqual(set(Shift.objects.exclude(date=target).values_list('id', flat=True)), shift_ids)
+
+    def test_no_changes_regenerates_nothing(self):
+        job = self._run('incremental')
+        self.assertEqual(job.result['regenerated_dates'], [])
+        self.assertEqual(job.result['deleted_count'], 0)
+
+    def test_deleted_request_is_detected(self):
+        target = self.start + timedelta(days=5)
+        submission = Submission()
+        submission.add_delete(target.strftime('%Y-%m-%d'))
+        apply_submission(self.staff[1], submission)
+        job = self._run('incremental')
+        self.assertEqual(job.result['regenerated_dates'], [target.strftime('%Y-%m-%d')])
+
+    def test_deleted_shift_on_short_day_is_detected(self):
+        target = self.start + timedelta(days=7)
+        manager = create_staff(self.store, 'manager', is_manager=True, max_weekly_hours=0)
+        self.client.force_login(manager.user)
+        shift = Shift.objects.get(date=target, staff=self.staff[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin_shift:delete_shift', args=[shift.id]))
+        self.assertFalse(Shift.objects.filter(id=shift.id).exists())
+        job = self._run('incremental')
+        self.assertEqual(job.result['regenerated_dates'], [target.strftime('%Y-%m-%d')])
+        self.assertTrue(Shift.objects.filter(date=target, staff=self.staff[0]).exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GenerationCancelTests(TestCase):
+    """生成のキャンセルは保存前の区切りでのみ受け付けること"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.day = date(2030, 4, 1)
+        StaffRequirement.objects.create(
+            store=self.store, day_of_week=self.day.weekday(),
+            start_time=time(10), end_time=time(15), required_staff=1
+        )
+        self.staff = create_staff(self.store, 'staff', employment_type='flexible')
+        ShiftRequest.objects.create(staff=self.staff, date=self.day, request_type='work',
+                                    start_time=time(10), end_time=time(15))
+
+    def _generate(self, cancel_at):
+        progress = []
+
+        def progress_callback(value, message):
+            progress.append(value)
+            if value >= cancel_at:
+                raise GenerationCancelled()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = generate_and_save_shifts(
+                self.store, self.day, self.day, solver=get_solver('greedy'), progress_callback=progress_callback
+            )
+        return result, progress
+
+    def test_cancel_before_save_saves_nothing(self):
+        with self.assertRaises(GenerationCancelled):
+            self._generate(cancel_at=70)
+        self.assertFalse(Shift.objects.exists())
+
+    def test_no_cancel_check_after_save(self):
+        result, progress = self._generate(cancel_at=71)
+        self.assertEqual(max(progress), 70)
+        self.assertEqual(result['created_count'], 1)
+        self.assertEqual(Shift.objects.count(), 1)
+
+
+class OvernightSolverTests(TestCase):
+    """日をまたぐシフト・時間帯との重なりを両方のソルバーが判定すること"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.monday = date(2030, 4, 1)
+        # 安いスタッフ（cheap）を優先したくなるよう時給に差をつける
+        self.cheap = create_staff(self.store, 'cheap', hourly_wage=900, employment_type='flexible')
+        self.other = create_staff(self.store, 'other', hourly_wage=1200, employment_type='flexible')
+
+    def _require(self, target_date, start_time, end_time):
+        StaffRequirement.objects.create(
+            store=self.store, day_of_week=target_date.weekday(),
+            start_time=start_time, end_time=end_time, required_staff=1
+        )
+
+    def _solvers(self):
+        names = ['greedy'] + (['cpsat'] if cpsat_available() else [])
+        return [get_solver(name, time_limit=5) for name in names]
+
+    def test_previous_day_overnight_shift_blocks_assignment(self):
+        # 前週の日曜22時〜月曜3時の確定シフトがあるスタッフは、月曜1時〜5時に割り当てない
+        Shift.objects.create(store=self.store, staff=self.cheap, date=self.monday - timedelta(days=1),
+                             end_date=self.monday, start_time=time(22), end_time=time(3), is_confirmed=True)
+        self._require(self.monday, time(1), time(5))
+        for solver in self._solvers():
+            result = solver.solve(ProblemSnapshot.load(self.store, self.monday, self.monday))
+            self.assertEqual([staff_id for _, staff_id in result.iter_assignments()], [self.other.id], solver.name)
+
+    def test_overnight_slot_overlaps_next_day_slot(self):
+        # 月曜22時〜火曜3時と火曜1時〜5時は同じスタッフに割り当てない
+        self._require(self.monday, time(22), time(3))
+        self._require(self.monday + timedelta(days=1), time(1), time(5))
+        for solver in self._solvers():
+            result = solver.solve(ProblemSnapshot.load(self.store, self.monday, self.monday + timedelta(days=1)))
+            assigned = [result.assignments[slot.index] for slot in result.slots]
+            self.assertEqual(result.shortage, 0, solver.name)
+            self.assertEqual(sorted(sum(assigned, [])), sorted([self.cheap.id, self.other.id]), solver.name)
+
+
+@skipUnless(cpsat_available(), 'OR-Tools がインストールされていません')
+class SolverCoverageTests(TestCase):
+    """小さな問題で CP-SAT が貪欲法と同等以上の充足・目的関数値になること"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.start = date(2030, 4, 1)
+        for day_of_week in range(7):
+            StaffRequirement.objects.create(
+                store=self.store, day_of_week=day_of_week,
+                start_time=time(10), end_time=time(15), required_staff=2, required_managers=1
+            )
+            StaffRequirement.objects.create(
+                store=self.store, day_of_week=day_of_week,
+                start_time=time(17), end_time=time(22), required_staff=2, required_managers=1
+            )
+        # 責任者2人（週20時間）とスタッフ3人で、3日間の12人分の枠をちょうど埋められる
+        self.managers = [create_staff(self.store, f'manager{i}', is_manager=True, max_weekly_hours=20,
+                                      employment_type='flexible') for i in range(2)]
+        self.staff = [create_staff(self.store, f'staff{i}', hourly_wage=1000 + i * 100, max_weekly_hours=20,
+                                   employment_type='flexible') for i in range(3)]
+        for offset in range(3):
+            ShiftRequest.objects.create(staff=self.staff[0], date=self.start + timedelta(days=offset),
+                                        request_type='work', start_time=time(10), end_time=time(15))
+
+    def test_cpsat_covers_at_least_as_well_as_greedy(self):
+        snapshot = ProblemSnapshot.load(self.store, self.start, self.start + timedelta(days=2))
+        greedy = get_solver('greedy').solve(snapshot)
+        cpsat = get_solver('cpsat', time_limit=10).solve(snapshot)
+        manager_ids = {manager.id for manager in self.managers}
+        for result in (greedy, cpsat):
+            self.assertEqual(len(result.slots), 6, result.solver)
+            for slot in result.slots:
+                assigned = result.assignments[slot.index]
+                self.assertEqual(len(set(assigned)), len(assigned), result.solver)
+                self.assertTrue(manager_ids & set(assigned), result.solver)
+        self.assertEqual(cpsat.shortage, 0)
+        self.assertLessEqual(cpsat.shortage, greedy.shortage)
+        self.assertLessEqual(cpsat.objective_value, greedy.objective_value)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ParallelGenerationJobTests(TestCase):
+    """並列生成はリクエスト内で実行せずジョブとして登録し、ワーカー数を検証すること"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.day = date(2030, 4, 1)
+        StaffRequirement.objects.create(
+            store=self.store, day_of_week=self.day.weekday(),
+            start_time=time(10), end_time=time(15), required_staff=1
+        )
+        self.staff = create_staff(self.store, 'staff', employment_type='flexible')
+        ShiftRequest.objects.create(staff=self.staff, date=self.day, request_type='work',
+                                    start_time=time(10), end_time=time(15))
+        manager = create_staff(self.store, 'manager', is_manager=True, max_weekly_hours=0)
+        self.client.force_login(manager.user)
+
+    def _submit(self, **fields):
+        data = {'start_date': '2030-04-01', 'end_date': '2030-04-14', 'solver': 'greedy', **fields}
+        return self.client.post(reverse('admin_shift:generate_parallel_api'), data)
+
+    def test_invalid_workers_are_rejected(self):
+        for workers in ('-1', '0', 'abc', '1.5'):
+            response = self._submit(workers=workers)
+            self.assertEqual(response.status_code, 400, workers)
+        self.assertFalse(GenerationJob.objects.exists())
+
+    def test_request_only_queues_a_job(self):
+        response = self._submit(workers='100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Shift.objects.exists())
+        job = GenerationJob.objects.get()
+        self.assertEqual((job.status, job.mode, job.workers), ('queued', 'parallel', os.cpu_count() or 1))
+
+        job.workers = 1
+        job.save(update_fields=['workers'])
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.run_job(jobs.claim_next_job())
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.result['task_count'], 2)
+        self.assertEqual(Shift.objects.filter(date=self.day).count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ShiftFeedAndGanttTests(TestCase):
+    """期間フィードの列の形と、日をまたぐシフトのガントチャートの区間"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.manager = create_staff(self.store, 'manager', is_manager=True)
+        self.staff = create_staff(self.store, 'staff', hourly_wage=1100)
+        self.day = date(2030, 4, 10)
+        previous = self.day - timedelta(days=1)
+        # 前日22時〜当日3時（期間に続く）、前日10時〜15時（期間に入らない）、当日17時〜22時
+        self.overnight = Shift.objects.create(store=self.store, staff=self.staff, date=previous, end_date=self.day,
+                                              start_time=time(22), end_time=time(3), is_confirmed=True)
+        Shift.objects.create(store=self.store, staff=self.staff, date=previous, start_time=time(10), end_time=time(15))
+        self.evening = Shift.objects.create(store=self.store, staff=self.manager, date=self.day,
+                                            start_time=time(17), end_time=time(22))
+        self.client.force_login(self.manager.user)
+
+    def test_feed_columns(self):
+        response = self.client.get(reverse('admin_shift:shift_feed_api'),
+                                   {'from': '2030-04-10', 'to': '2030-04-11'})
+        feed = response.json()
+        self.assertEqual((feed['days'], feed['prev_from'], feed['next_from']), (2, '2030-04-08', '2030-04-12'))
+        shifts = feed['shifts']
+        self.assertEqual({len(column) for column in shifts.values()}, {2})
+        self.assertEqual({len(column) for column in feed['staff'].values()}, {2})
+        self.assertEqual(shifts['id'], [self.overnight.id, self.evening.id])
+        self.assertEqual(list(zip(shifts['day'], shifts['start'], shifts['end'], shifts['confirmed'])),
+                         [(-1, 22 * 60, 27 * 60, 1), (0, 17 * 60, 22 * 60, 0)])
+        staff_ids = [feed['staff']['id'][index] for index in shifts['staff']]
+        self.assertEqual(staff_ids, [self.staff.id, self.manager.id])
+        self.assertEqual(feed['staff']['hourly_wage'][shifts['staff'][0]], 1100)
+
+    def test_gantt_splits_overnight_shift_by_day(self):
+        days = build_gantt_days(self.store, self.day - timedelta(days=1), self.day)
+        ranges = {
+            (day, shift['shift_id']): (shift['start_minutes'], shift['end_minutes'], shift['is_from_previous'])
+            for day, data in days.items() for shift in data['shifts']
+        }
+        self.assertEqual(ranges[('2030-04-09', self.overnight.id)], (22 * 60, 24 * 60, False))
+        self.assertEqual(ranges[('2030-04-10', self.overnight.id)], (0, 3 * 60, True))
+        self.assertEqual(ranges[('2030-04-10', self.evening.id)], (17 * 60, 22 * 60, False))
+
+        # 1日分のAPIでも前日からの部分が含まれる
+        response = self.client.get(reverse('admin_shift:shift_detail_by_date', args=['2030-04-10']))
+        self.assertEqual(
+            sorted((shift['start_minutes'], shift['end_minutes']) for shift in response.json()['shifts']),
+            [(0, 3 * 60), (17 * 60, 22 * 60)]
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ShiftQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """シフト画面のクエリ数が予算（PERF_QUERY_BUDGETS）内であること（件数に比例して増えないこと）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = create_store()
+        for day_of_week in range(7):
+            StaffRequirement.objects.create(
+                store=cls.store, day_of_week=day_of_week,
+                start_time=time(10), end_time=time(15), required_staff=2, required_managers=1
+            )
+        cls.manager = create_staff(cls.store, 'manager', is_manager=True)
+        cls.staff = [create_staff(cls.store, f'staff{i}', hourly_wage=1000 + i * 50) for i in range(8)]
+        month_start = date.today().replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        shifts, requests = [], []
+        for offset in range(28):
+            for i, member in enumerate(cls.staff):
+                if (offset + i) % 3:
+                    continue
+                shifts.append(Shift(store=cls.store, staff=member, date=month_start + timedelta(days=offset),
+                                    start_time=time(10), end_time=time(15), is_confirmed=offset % 2 == 0))
+                requests.append(ShiftRequest(staff=member, date=next_month + timedelta(days=offset),
+                                             request_type='work', start_time=time(10), end_time=time(15)))
+        Shift.objects.bulk_create(shifts)
+        ShiftRequest.objects.bulk_create(requests)
+        cls.shift = Shift.objects.filter(staff=cls.staff[0]).first()
+        cls.swap_request = ShiftSwapRequest.objects.create(
+            shift=cls.shift, requested_by=cls.staff[0], date=date.today() + timedelta(days=5),
+            start_time=time(10), end_time=time(15)
+        )
+        cls.room = ChatRoom.objects.create(
+            store=cls.store, room_type='staff_manager', participant1=cls.staff[0], participant2=cls.manager
+        )
+        for i in range(30):
+            ChatMessage.objects.create(room=cls.room, sender=cls.staff[0] if i % 2 else cls.manager, message=f'メッセージ{i}')
+
+    def test_admin_pages(self):
+        self.client.force_login(self.manager.user)
+        self.assertQueryBudgets(
+            prefixes=['admin_shift'],
+            url_kwargs={
+                'admin_shift:shift_detail': {'shift_id': self.shift.id},
+                'admin_shift:submission_detail_api': {'staff_id': self.staff[0].id},
+                'admin_shift:shift_detail_by_date': {'shift_date': self.shift.date.strftime('%Y-%m-%d')},
+                'admin_shift:chat_detail': {'room_id': self.room.id},
+                'admin_shift:chat_messages_api': {'room_id': self.room.id},
+            },
+        )
+
+    def test_staff_pages(self):
+        self.client.force_login(self.staff[0].user)
+        self.assertQueryBudgets(
+            prefixes=['staff_shift'],
+            url_kwargs={
+                'staff_shift:shift_detail': {'shift_id': self.shift.id},
+                'staff_shift:chat_detail': {'room_id': self.room.id},
+                'staff_shift:chat_messages_api': {'room_id': self.room.id},
+            },
+        )
+
+
+@override_settings(CACHES=TEST_CACHES, PERF_INSTRUMENTATION=True)
+class QueryInstrumentationTests(TestCase):
+    """計測ミドルウェアが同期・非同期のビューを計測し、ストリーミングは記録しないこと"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.manager = create_staff(self.store, 'manager', is_manager=True)
+        self.staff = create_staff(self.store, 'staff')
+        self.room = ChatRoom.objects.create(
+            store=self.store, room_type='staff_manager', participant1=self.staff, participant2=self.manager
+        )
+        registry.reset()
+
+    def test_sync_request(self):
+        self.client.force_login(self.manager.user)
+        response = self.client.get(reverse('admin_shift:shift_calendar'))
+        self.assertIn('queries', response['Server-Timing'])
+        self.assertEqual(registry.summary()['admin_shift:shift_calendar']['requests'], 1)
+
+    async def test_async_request(self):
+        await self.async_client.aforce_login(self.manager.user)
+        response = await self.async_client.get(reverse('admin_shift:shift_calendar'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries', response['Server-Timing'])
+        summary = registry.summary()['admin_shift:shift_calendar']
+        self.assertGreater(summary['queries']['max'], 0)
+
+    async def test_stream_is_not_recorded(self):
+        await self.async_client.aforce_login(self.staff.user)
+        response = await self.async_client.get(reverse('staff_shift:chat_stream', args=[self.room.id]))
+        self.assertTrue(response.streaming)
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('staff_shift:chat_stream', registry.summary())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SubstitutesApiTests(TestCase):
+    """交代候補の推薦APIの入力チェック"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.staff = [create_staff(self.store, f'staff{i}') for i in range(4)]
+        self.shift = Shift.objects.create(store=self.store, staff=self.staff[0], date=date.today() + timedelta(days=7),
+                                          start_time=time(10), end_time=time(15))
+        self.client.force_login(self.staff[0].user)
+        self.url = reverse('staff_shift:shift_swap_substitutes_api')
+
+    def test_invalid_ids_are_rejected(self):
+        for params in ({'swap_request_id': 'x1'}, {'shift_id': '1.5'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_limit_is_clamped(self):
+        for limit, expected in (('0', 1), ('-5', 1), ('2', 2), ('1000', 3)):
+            response = self.client.get(self.url, {'shift_id': self.shift.id, 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['substitutes']), expected, limit)
+        self.assertEqual(self.client.get(self.url, {'shift_id': self.shift.id, 'limit': 'many'}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ChatMessagesApiTests(TestCase):
+    """チャット履歴APIの件数（limit）の検証"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.staff = create_staff(self.store, 'staff')
+        self.manager = create_staff(self.store, 'manager', is_manager=True)
+        self.room = ChatRoom.objects.create(
+            store=self.store, room_type='staff_manager', participant1=self.staff, participant2=self.manager
+        )
+        for i in range(5):
+            ChatMessage.objects.create(room=self.room, sender=self.manager, message=f'メッセージ{i}')
+
+    def _get(self, user, namespace, **params):
+        self.client.force_login(user)
+        return self.client.get(reverse(f'{namespace}:chat_messages_api', args=[self.room.id]), params)
+
+    def test_limit_is_bounded(self):
+        for user, namespace in ((self.staff.user, 'staff_shift'), (self.manager.user, 'admin_shift')):
+            for limit in ('0', '-3'):
+                data = self._get(user, namespace, limit=limit).json()
+                self.assertEqual((len(data['messages']), data['has_more']), (1, True))
+            response = self._get(user, namespace, limit='many')
+            self.assertEqual((response.status_code, response.json()['error']), (400, '無効な件数です。'))
+            response = self._get(user, namespace, before='bad')
+            self.assertEqual((response.status_code, response.json()['error']), (400, '無効なカーソルです。'))
+
+    def test_cursor_round_trip(self):
+        all_ids = list(ChatMessage.objects.filter(room=self.room).order_by('created_at', 'id')
+                       .values_list('id', flat=True))
+        # 古い方へ2件ずつたどると、全件を重複なく取得できる
+        pages, before = [], None
+        while True:
+            data = self._get(self.staff.user, 'staff_shift', limit=2, **({'before': before} if before else {})).json()
+            pages.insert(0, [message['id'] for message in data['messages']])
+            if not data['has_more']:
+                break
+            before = data['messages'][0]['cursor']
+        self.assertEqual(sum(pages, []), all_ids)
+        self.assertEqual([len(page) for page in pages], [1, 2, 2])
+
+        # 最新のカーソル以降は新着のみ
+        latest = self._get(self.staff.user, 'staff_shift', limit=1).json()['messages'][0]['cursor']
+        self.assertEqual(self._get(self.staff.user, 'staff_shift', after=latest).json()['messages'], [])
+        new_message = ChatMessage.objects.create(room=self.room, sender=self.manager, message='新着')
+        data = self._get(self.staff.user, 'staff_shift', after=latest).json()
+        self.assertEqual([message['id'] for message in data['messages']], [new_message.id])
+        self.assertEqual(chat.decode_cursor(data['messages'][0]['cursor'])[1], new_message.id)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ShiftRequestSubmissionTests(TestCase):
+    """希望シフトの一括提出（全体の検証・置き換えの範囲・重複の扱い）"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.staff = create_staff(self.store, 'staff')
+        self.day = date.today() + timedelta(days=40)
+        self.other_day = self.day + timedelta(days=1)
+        self.client.force_login(self.staff.user)
+        self.url = reverse('staff_shift:shift_requests')
+
+    def _request(self, target_date, request_type='work', start=time(10), end=time(15)):
+        return ShiftRequest.objects.create(staff=self.staff, date=target_date, request_type=request_type,
+                                           start_time=start, end_time=end)
+
+    def _edit(self, **data):
+        return self.client.post(self.url, {'action': 'update_existing', **data},
+                                HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_invalid_day_saves_nothing(self):
+        existing = self._request(self.day)
+        response = self._edit(
+            delete_dates=[self.day.strftime('%Y-%m-%d')],
+            update_dates=[self.other_day.strftime('%Y-%m-%d'), '2030-02-30'],
+            request_types=['work', 'work'], start_times=['09:00', '09:00'], end_times=['17:00', '17:00'],
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['date'] for r in response.json()['results']], ['2030-02-30'])
+        self.assertEqual(list(ShiftRequest.objects.values_list('id', flat=True)), [existing.id])
+
+    def test_edit_updates_in_place_and_deletes(self):
+        kept = self._request(self.day)
+        self._request(self.other_day)
+        response = self._edit(
+            delete_dates=[self.other_day.strftime('%Y-%m-%d')],
+            update_dates=[self.day.strftime('%Y-%m-%d')],
+            request_types=['work'], start_times=['12:00'], end_times=['20:00'],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(r['date'], r['status']) for r in response.json()['results']],
+            [(self.other_day.strftime('%Y-%m-%d'), 'deleted'), (self.day.strftime('%Y-%m-%d'), 'updated')]
+        )
+        request = ShiftRequest.objects.get()
+        self.assertEqual((request.id, request.start_time, request.end_time), (kept.id, time(12), time(20)))
+
+    def test_replace_day(self):
+        # 編集モード（replace_day=True）は同じ日の他の種別の希望も置き換える
+        self._request(self.day, request_type='other')
+        submission = Submission()
+        submission.add_item(self.day.strftime('%Y-%m-%d'), 'work', '10:00', '15:00')
+        apply_submission(self.staff, submission, replace_day=True)
+        self.assertEqual(list(ShiftRequest.objects.values_list('request_type', flat=True)), ['work'])
+
+    def test_bulk_keeps_other_types(self):
+        # 通常モード（replace_day=False）は同じ種別の希望だけを置き換える
+        self._request(self.day, request_type='other')
+        self._request(self.day, start=time(9), end=time(12))
+        self.client.post(self.url, {
+            'request_type': 'work', 'dates': [self.day.strftime('%Y-%m-%d')],
+            'start_time': '17:00', 'end_time': '22:00',
+        })
+        self.assertEqual(
+            sorted(ShiftRequest.objects.values_list('request_type', 'start_time')),
+            [('other', time(10)), ('work', time(17))]
+        )
+
+    def _delete_days(self, days):
+        dates = [self.day + timedelta(days=offset) for offset in range(days)]
+        ShiftRequest.objects.bulk_create([
+            ShiftRequest(staff=self.staff, date=target_date, request_type='work',
+                         start_time=time(10), end_time=time(15))
+            for target_date in dates
+        ])
+        submission = Submission()
+        for target_date in dates:
+            submission.add_delete(target_date.strftime('%Y-%m-%d'))
+        return submission
+
+    def test_delete_query_count_does_not_grow_with_days(self):
+        # 選択（行ロック）・削除・削除記録の作成（トランザクションの開始・終了を含む）
+        for days in (3, 30):
+            submission = self._delete_days(days)
+            with self.assertNumQueries(5):
+                apply_submission(self.staff, submission)
+            self.assertFalse(ShiftRequest.objects.exists())
+        self.assertEqual(ScheduleTombstone.objects.filter(kind='shift_request').count(), 33)
+
+    def test_duplicate_day_last_wins(self):
+        day = self.day.strftime('%Y-%m-%d')
+        response = self._edit(
+            update_dates=[day, day], request_types=['work', 'work'],
+            start_times=['09:00', '13:00'], end_times=['12:00', '18:00'],
+        )
+        self.assertEqual(response.status_code, 200)
+        request = ShiftRequest.objects.get()
+        self.assertEqual((request.start_time, request.end_time), (time(13), time(18)))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExpiredSwapRequestTests(TestCase):
+    """締切を過ぎた募集はスイープ前（募集中のまま）でも立候補できないこと"""
+
+    def setUp(self):
+        self.store = create_store()
+        self.requester = create_staff(self.store, 'requester')
+        self.applicant = create_staff(self.store, 'applicant')
+        self.client.force_login(self.applicant.user)
+
+    def _swap_request(self, target_date):
+        shift = Shift.objects.create(store=self.store, staff=self.requester, date=target_date,
+                                     start_time=time(10), end_time=time(15))
+        return ShiftSwapRequest.objects.create(shift=shift, requested_by=self.requester, date=target_date,
+                                               start_time=time(10), end_time=time(15))
+
+    def _apply(self, swap_request):
+        return self.client.post(
+            reverse('staff_shift:shift_swap_apply', args=[swap_request.id]),
+            {'start_time': '10:00', 'end_time': '15:00'}
+        )
+
+    def test_expired_open_request_cannot_be_applied_to(self):
+        swap_request = self._swap_request(date.today())
+        self.assertEqual(swap_request.status, 'open')
+        response = self._apply(swap_request)
+        self.assertRedirects(response, reverse('staff_shift:shift_swap_list'), fetch_redirect_response=False)
+        self.assertFalse(ShiftSwapApplication.objects.exists())
+
+    def test_sweep_uses_the_same_deadline(self):
+        expired = self._swap_request(date.today())
+        tomorrow = self._swap_request(date.today() + timedelta(days=1))
+        self.assertEqual(run_sweeps(['close_expired_swaps']), {'close_expired_swaps': 1})
+        expired.refresh_from_db()
+        tomorrow.refresh_from_db()
+        self.assertEqual((expired.status, tomorrow.status), ('closed', 'open'))
+        # 締切日当日（出勤日の前日）は立候補できる
+        self._apply(tomorrow)
+        self.assertTrue(ShiftSwapApplication.objects.filter(swap_request=tomorrow, applicant=self.applicant).exists())
+
+    def test_request_on_its_deadline_is_listed(self):
+        # 出勤日が明日の募集は今日が締切日なので、一覧・API・立候補のすべてで受け付ける
+        tomorrow = self._swap_request(date.today() + timedelta(days=1))
+        expired = self._swap_request(date.today())
+        response = self.client.get(reverse('staff_shift:shift_swap_list'))
+        self.assertEqual([swap.id for swap in response.context['swap_requests']], [tomorrow.id])
+        response = self.client.get(reverse('staff_shift:shift_swap_list_api'))
+        listed = response.json()['swap_requests']
+        self.assertEqual([(swap['id'], swap['is_available']) for swap in listed], [(tomorrow.id, True)])
+        self.assertNotIn(expired.id, [swap['id'] for swap in listed])
+        self._apply(tomorrow)
+        self.assertTrue(ShiftSwapApplication.objects.filter(swap_request=tomorrow).exists())
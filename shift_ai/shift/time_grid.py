@@ -0,0 +1,262 @@
+"""
+時間グリッドによる充足状況モデル
+店舗×日を一定間隔（デフォルト15分）のスロットに区切り、必要人数（需要）と
+シフト（供給）をNumPy配列として保持して、不足・過剰・スキル充足をベクトル演算で計算する
+"""
+from datetime import date, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from shift.problem_snapshot import span_minutes, time_to_minutes
+
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_SLOT_MINUTES = 15
+SKILLED_LEVEL = 3
+
+# 需要・供給の各チャネル（人数、責任者、ホールスキル、キッチンスキル）
+CHANNELS = ('staff', 'managers', 'hall', 'kitchen')
+
+
+class TimeGrid:
+    """
+    期間内の時間グリッド
+
+    配列は (日数 + 1, 1日のスロット数) の形で、最終行は期間最終日から
+    日をまたぐシフトの翌日部分を受け止めるための予備行
+    """
+
+    def __init__(self, start_date: date, end_date: date, slot_minutes: int = DEFAULT_SLOT_MINUTES):
+        if MINUTES_PER_DAY % slot_minutes != 0:
+            raise ValueError("スロット間隔は1日（1440分）を割り切れる値にしてください。")
+        self.start_date = start_date
+        self.end_date = end_date
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = MINUTES_PER_DAY // slot_minutes
+        self.num_days = (end_date - start_date).days + 1
+        shape = (self.num_days + 1, self.slots_per_day)
+        self.demand = {channel: np.zeros(shape, dtype=np.int32) for channel in CHANNELS}
+        self.demand_max = np.full(shape, np.iinfo(np.int32).max, dtype=np.int32)
+        self.supply = {channel: np.zeros(shape, dtype=np.int32) for channel in CHANNELS}
+
+    # ---- 座標変換 ----
+
+    def day_index(self, target_date: date) -> int:
+        """日付の行番号"""
+        return (target_date - self.start_date).days
+
+    def slot_range(self, target_date: date, start_time: time, end_time: time,
+                   end_date: Optional[date] = None) -> Tuple[int, int]:
+        """
+        時間帯を平坦化したスロット番号の半開区間 [start, end) に変換
+        （日をまたぐ場合は翌日の行に続く）
+        """
+        start_minute = self.day_index(target_date) * MINUTES_PER_DAY + time_to_minutes(start_time)
+        if end_date and end_date > target_date:
+            duration = (end_date - target_date).days * MINUTES_PER_DAY + time_to_minutes(end_time) - time_to_minutes(start_time)
+        else:
+            duration = span_minutes(start_time, end_time)
+        end_minute = start_minute + duration
+        return start_minute // self.slot_minutes, -(-end_minute // self.slot_minutes)
+
+    def slot_times(self) -> List[str]:
+        """1日分のスロット開始時刻ラベル（HH:MM）"""
+        return [
+            f"{(i * self.slot_minutes) // 60:02d}:{(i * self.slot_minutes) % 60:02d}"
+            for i in range(self.slots_per_day)
+        ]
+
+    def _add_intervals(self, target: np.ndarray, intervals: List[Tuple[int, int]]):
+        """区間ごとに +1 を加算（差分配列と累積和で一括計算）"""
+        if not intervals:
+            return
+        flat_size = target.size
+        bounds = np.clip(np.asarray(intervals, dtype=np.int64), 0, flat_size)
+        diff = np.zeros(flat_size + 1, dtype=np.int32)
+        np.add.at(diff, bounds[:, 0], 1)
+        np.add.at(diff, bounds[:, 1], -1)
+        target += np.cumsum(diff[:-1]).reshape(target.shape).astype(np.int32)
+
+    def _set_max(self, target: np.ndarray, start: int, end: int, value: int):
+        """区間の値を value との最大値で更新"""
+        flat = target.reshape(-1)
+        start, end = max(start, 0), min(end, flat.size)
+        if start < end:
+            np.maximum(flat[start:end], value, out=flat[start:end])
+
+    # ---- 需要 ----
+
+    def add_requirements(self, requirements_by_weekday: Dict[int, list]):
+        """
+        必要人数設定から需要を設定
+        （同じ時間に複数の設定が重なる場合は大きい方を採用）
+        """
+        for offset in range(self.num_days):
+            target_date = self.start_date + timedelta(days=offset)
+            for requirement in requirements_by_weekday.get(target_date.weekday(), []):
+                start, end = self.slot_range(target_date, requirement.start_time, requirement.end_time)
+                self._set_max(self.demand['staff'], start, end, requirement.required_staff)
+                self._set_max(self.demand['managers'], start, end, requirement.required_managers)
+                self._set_max(self.demand['hall'], start, end, requirement.required_hall_skill)
+                self._set_max(self.demand['kitchen'], start, end, requirement.required_kitchen_skill)
+
+    def add_shift_settings(self, store, shift_settings):
+        """
+        シフト設定から営業時間中の最小人数（需要）と最大人数（過剰の上限）を設定
+        """
+        if shift_settings is None:
+            return
+        for offset in range(self.num_days):
+            target_date = self.start_date + timedelta(days=offset)
+            is_weekend = target_date.weekday() >= 5
+            min_staff = shift_settings.weekend_min_staff if is_weekend else shift_settings.weekday_min_staff
+            max_staff = shift_settings.weekend_max_staff if is_weekend else shift_settings.weekday_max_staff
+            start, end = self.slot_range(target_date, store.opening_time, store.closing_time)
+            self._set_max(self.demand['staff'], start, end, min_staff)
+            flat = self.demand_max.reshape(-1)
+            flat[max(start, 0):min(end, flat.size)] = max_staff
+
+    # ---- 供給 ----
+
+    def add_shifts(self, shifts: Iterable, staff: Dict[int, object]):
+        """
+        シフトを供給として加算
+
+        Args:
+            shifts: staff_id, date, start_time, end_time, end_date 属性を持つシフト
+                    （Shift、ShiftSlot、生成結果のどれでも可）
+            staff: スタッフID → Staff
+        """
+        intervals = {channel: [] for channel in CHANNELS}
+        for shift in shifts:
+            if not (self.start_date - timedelta(days=1) <= shift.date <= self.end_date):
+                continue
+            start, end = self.slot_range(shift.date, shift.start_time, shift.end_time, shift.end_date)
+            member = staff.get(shift.staff_id)
+            intervals['staff'].append((start, end))
+            if member is None:
+                continue
+            if member.is_manager:
+                intervals['managers'].append((start, end))
+            if member.hall_skill_level >= SKILLED_LEVEL:
+                intervals['hall'].append((start, end))
+            if member.kitchen_skill_level >= SKILLED_LEVEL:
+                intervals['kitchen'].append((start, end))
+        for channel in CHANNELS:
+            self._add_intervals(self.supply[channel], intervals[channel])
+
+    def add_generated_shifts(self, generated_shifts: List[Dict]):
+        """AIShiftGeneratorの生成結果（辞書のリスト）を供給として加算"""
+        rows = [
+            GridShift(s['staff'].id, s['date'], s['start_time'], s['end_time'], s.get('end_date'))
+            for s in generated_shifts
+        ]
+        self.add_shifts(rows, {s['staff'].id: s['staff'] for s in generated_shifts})
+
+    # ---- 集計 ----
+
+    def coverage(self) -> 'CoverageReport':
+        """不足・過剰を計算"""
+        return CoverageReport(self)
+
+
+class GridShift:
+    """時間グリッドに載せるシフト（生成結果など、モデル以外の入力用）"""
+    __slots__ = ('staff_id', 'date', 'start_time', 'end_time', 'end_date')
+
+    def __init__(self, staff_id, date, start_time, end_time, end_date=None):
+        self.staff_id = staff_id
+        self.date = date
+        self.start_time = start_time
+        self.end_time = end_time
+        self.end_date = end_date
+
+
+class CoverageReport:
+    """時間グリッドの充足状況（いずれも (日数, スロット数) の配列）"""
+
+    def __init__(self, grid: TimeGrid):
+        self.grid = grid
+        days = slice(0, grid.num_days)
+        self.shortage = {
+            channel: np.maximum(grid.demand[channel][days] - grid.supply[channel][days], 0)
+            for channel in CHANNELS
+        }
+        self.overstaffing = np.maximum(grid.supply['staff'][days] - grid.demand_max[days], 0)
+
+    def shortage_minutes_by_day(self, channel: str = 'staff') -> np.ndarray:
+        """日ごとの不足人×分"""
+        return self.shortage[channel].sum(axis=1) * self.grid.slot_minutes
+
+    def overstaffing_minutes_by_day(self) -> np.ndarray:
+        """日ごとの過剰人×分"""
+        return self.overstaffing.sum(axis=1) * self.grid.slot_minutes
+
+    def has_shortage(self) -> bool:
+        """いずれかのチャネルに不足があるか"""
+        return any(bool(values.any()) for values in self.shortage.values())
+
+    def day_summary(self) -> Dict[date, Dict[str, int]]:
+        """不足または過剰がある日の集計"""
+        summary = {}
+        shortage_by_channel = {channel: self.shortage_minutes_by_day(channel) for channel in CHANNELS}
+        over = self.overstaffing_minutes_by_day()
+        for offset in np.flatnonzero(sum(shortage_by_channel.values()) + over):
+            target_date = self.grid.start_date + timedelta(days=int(offset))
+            summary[target_date] = {
+                f'{channel}_shortage_minutes': int(shortage_by_channel[channel][offset])
+                for channel in CHANNELS
+            }
+            summary[target_date]['overstaffing_minutes'] = int(over[offset])
+        return summary
+
+    def messages(self) -> List[str]:
+        """不足している日と時間帯の説明"""
+        labels = {'staff': '人数', 'managers': '責任者', 'hall': 'ホールスキル', 'kitchen': 'キッチンスキル'}
+        result = []
+        slot_times = self.grid.slot_times()
+        for channel in CHANNELS:
+            for offset in np.flatnonzero(self.shortage[channel].any(axis=1)):
+                row = self.shortage[channel][offset]
+                first = int(np.flatnonzero(row)[0])
+                last = int(np.flatnonzero(row)[-1])
+                target_date = self.grid.start_date + timedelta(days=int(offset))
+                end_label = slot_times[last + 1] if last + 1 < len(slot_times) else '24:00'
+                result.append(
+                    f"{target_date.strftime('%Y-%m-%d')} {slot_times[first]}〜{end_label} の"
+                    f"{labels[channel]}が最大{int(row.max())}人不足しています"
+                )
+        return result
+
+    def day_profile(self, target_date: date) -> Dict[str, List[int]]:
+        """1日分の需要・供給（ガントチャート表示用）"""
+        offset = self.grid.day_index(target_date)
+        return {
+            'slot_minutes': self.grid.slot_minutes,
+            'demand': self.grid.demand['staff'][offset].tolist(),
+            'supply': self.grid.supply['staff'][offset].tolist(),
+        }
+
+
+def build_store_grid(store, start_date: date, end_date: date,
+                     slot_minutes: int = DEFAULT_SLOT_MINUTES) -> TimeGrid:
+    """
+    店舗の必要人数設定・シフト設定・既存シフトから時間グリッドを作成（クエリは固定回数）
+    """
+    from accounts.models import Staff, StaffRequirement
+    from shift.models import Shift, ShiftSettings
+
+    grid = TimeGrid(start_date, end_date, slot_minutes)
+
+    requirements_by_weekday = {}
+    for requirement in StaffRequirement.objects.filter(store=store):
+        requirements_by_weekday.setdefault(requirement.day_of_week, []).append(requirement)
+    grid.add_requirements(requirements_by_weekday)
+    grid.add_shift_settings(store, ShiftSettings.objects.filter(store=store).first())
+
+    staff = {member.id: member for member in Staff.objects.filter(store=store)}
+    shifts = Shift.objects.filter(
+        store=store,
+        date__range=[start_date - timedelta(days=1), end_date]
+    ).only('staff_id', 'date', 'start_time', 'end_time', 'end_date')
+    grid.add_shifts(shifts, staff)
+    return grid
@@ -0,0 +1,34 @@
+"""
+希望シフト・シフトの削除記録（ScheduleTombstone）の作成
+削除を行う箇所（希望の一括提出・差分再生成の作り直し・シフト削除画面）から、
+削除前に取得済みの行をまとめて1クエリで記録する（差分再生成で削除のあった日を判定するため）
+"""
+from datetime import timedelta
+from typing import Iterable
+from shift.models import ScheduleTombstone
+from shift.rollups import shift_dates
+
+
+def _request_end_date(shift_request):
+    """希望がかかる最後の日（日をまたぐ場合は翌日以降）"""
+    end_date = shift_request.end_date or shift_request.date
+    if shift_request.start_time and shift_request.end_time and shift_request.end_time <= shift_request.start_time:
+        end_date = max(end_date, shift_request.date + timedelta(days=1))
+    return end_date
+
+
+def record_deleted_requests(store_id: int, shift_requests: Iterable):
+    """削除した希望シフトを記録"""
+    ScheduleTombstone.objects.bulk_create([
+        ScheduleTombstone(store_id=store_id, kind='shift_request',
+                          date=shift_request.date, end_date=_request_end_date(shift_request))
+        for shift_request in shift_requests
+    ])
+
+
+def record_deleted_shifts(store_id: int, shifts: Iterable):
+    """削除したシフトを記録（Shift と problem_snapshot.ShiftSlot のどちらでも可）"""
+    ScheduleTombstone.objects.bulk_create([
+        ScheduleTombstone(store_id=store_id, kind='shift', date=shift.date, end_date=max(shift_dates(shift)))
+        for shift in shifts
+    ])
@@ -0,0 +1,15 @@
+"""
+シフト機能の共通ユーティリティ（画面・API・集計処理から共通で使う）
+"""
+
+
+def get_staff_name_japanese(user):
+    """日本語形式の名前を取得（姓 名の順）"""
+    if user.last_name and user.first_name:
+        return f"{user.last_name} {user.first_name}".strip()
+    elif user.last_name:
+        return user.last_name
+    elif user.first_name:
+        return user.first_name
+    else:
+        return user.username
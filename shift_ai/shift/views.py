@@ -7,7 +7,10 @@ from django.core.paginator import Paginator
 from django.db.models import Q
 from datetime import datetime, date, timedelta
 from .models import Shift, ShiftRequest
-from .ai_shift_generator import AIShiftGenerator
+from .generation import ShiftConstraintError, generate_and_save_shifts
+from .rollups import update_shifts
+from .solvers import get_solver
+from .tombstones import record_deleted_requests, record_deleted_shifts
 from accounts.models import Store, Staff
 
 
@@ -33,11 +36,14 @@ def shift_creation(request):
         start_date_obj = today
         end_date_obj = today + timedelta(days=30)
     
-    # 既存のシフトを取得
+    # 既存のシフトを取得（勤務時間・人件費はデータベース側で計算）
     existing_shifts = Shift.objects.filter(
         store=store,
         date__range=[start_date_obj, end_date_obj]
-    ).order_by('date', 'start_time')
+    ).select_related('staff', 'staff__user').with_cost().order_by('date', 'start_time')
+    
+    # 確定シフトの人件費合計（1クエリ）
+    confirmed_cost = existing_shifts.filter(is_confirmed=True).totals()['cost']
     
     # 希望シフトを取得
     shift_requests = ShiftRequest.objects.filter(
@@ -50,6 +56,7 @@ def shift_creation(request):
         'start_date': start_date_obj,
         'end_date': end_date_obj,
         'existing_shifts': existing_shifts,
+        'confirmed_cost': confirmed_cost,
         'shift_requests': shift_requests,
     }
     
@@ -75,40 +82,18 @@ def generate_ai_shifts(request):
         except ValueError:
             return JsonResponse({'error': '無効な日付形式です。'}, status=400)
         
-        # AIシフト生成
-        generator = AIShiftGenerator(store)
-        generated_shifts = generator.generate_shifts(start_date_obj, end_date_obj)
-        
-        # 制約チェック
-        errors = generator.validate_shift_constraints(generated_shifts)
-        if errors:
-            return JsonResponse({'error': 'シフト制約エラー', 'details': errors}, status=400)
-        
-        # シフトを保存
-        created_shifts = []
-        for shift_data in generated_shifts:
-            shift, created = Shift.objects.get_or_create(
-                store=shift_data['store'],
-                staff=shift_data['staff'],
-                date=shift_data['date'],
-                start_time=shift_data['start_time'],
-                defaults={
-                    'end_time': shift_data['end_time'],
-                    'is_confirmed': shift_data['is_confirmed']
-                }
-            )
-            if created:
-                created_shifts.append(shift)
-        
-        # 人件費計算
-        total_cost = generator.calculate_shift_cost(generated_shifts)
+        # AIシフト生成（ソルバーと制限時間は任意指定）
+        try:
+            time_limit = float(request.POST['time_limit']) if request.POST.get('time_limit') else None
+            solver = get_solver(request.POST.get('solver') or None, time_limit=time_limit)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        try:
+            result = generate_and_save_shifts(store, start_date_obj, end_date_obj, solver=solver)
+        except ShiftConstraintError as e:
+            return JsonResponse({'error': 'シフト制約エラー', 'details': e.details}, status=400)
         
-        return JsonResponse({
-            'success': True,
-            'created_count': len(created_shifts),
-            'total_cost': total_cost,
-            'message': f'{len(created_shifts)}件のシフトを生成しました。'
-        })
+        return JsonResponse({'success': True, **result})
     
     return JsonResponse({'error': '無効なリクエストです。'}, status=400)
 
@@ -159,6 +144,7 @@ def delete_shift(request, shift_id):
     
     if request.method == 'POST':
         shift.delete()
+        record_deleted_shifts(store.id, [shift])
         messages.success(request, "シフトを削除しました。")
     
     return redirect('shift_creation')
@@ -180,10 +166,10 @@ def confirm_shifts(request):
             return JsonResponse({'error': 'シフトが選択されていません。'}, status=400)
         
         # シフトを確定
-        updated_count = Shift.objects.filter(
-            id__in=shift_ids,
-            store=store
-        ).update(is_confirmed=True)
+        updated_count = update_shifts(
+            Shift.objects.filter(id__in=shift_ids, store=store),
+            is_confirmed=True
+        )
         
         return JsonResponse({
             'success': True,
@@ -233,11 +219,14 @@ def staff_shift_requests(request):
                     date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
                     
                     # 既存の希望を削除
-                    ShiftRequest.objects.filter(
+                    existing_requests = list(ShiftRequest.objects.filter(
                         staff=staff,
                         date=date_obj,
                         request_type=request_type
-                    ).delete()
+                    ))
+                    if existing_requests:
+                        ShiftRequest.objects.filter(id__in=[r.id for r in existing_requests]).delete()
+                        record_deleted_requests(staff.store_id, existing_requests)
                     
                     # 新しい希望を作成
                     shift_request = ShiftRequest.objects.create(
@@ -288,8 +277,8 @@ def staff_shift_view(request):
         date__range=[month_start, month_end]
     ).order_by('date', 'start_time')
     
-    # 勤務時間集計
-    total_hours = sum(shift.duration_hours for shift in shifts.filter(is_confirmed=True))
+    # 勤務時間集計（データベース側で1クエリ）
+    total_hours = shifts.filter(is_confirmed=True).totals()['hours']
     
     # スキルレベルのパーセンテージ計算
     hall_skill_percentage = staff.hall_skill_level * 20
@@ -3,6 +3,9 @@ ASGI config for shift_ai project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+チャットのリアルタイム配信（shift.live、Server-Sent Events）は ASGI で起動した場合のみ有効:
+    uvicorn shift_ai.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
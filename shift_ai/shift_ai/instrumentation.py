@@ -0,0 +1,199 @@
+"""
+リクエスト計測ミドルウェア
+ビュー（URL名）ごとにSQLクエリ数・SQL時間・全体時間・テンプレート描画時間を記録し、
+直近のサンプルからパーセンタイルを集計する。クエリ数が予算を超えたビューは警告ログを出す
+
+設定:
+    PERF_INSTRUMENTATION: 計測の有効/無効（デフォルトは DEBUG と同じ）
+    PERF_SAMPLE_SIZE: ビューごとに保持するサンプル数（デフォルト 500）
+    PERF_DEFAULT_QUERY_BUDGET: クエリ数の予算（デフォルト 50、None で警告なし）
+    PERF_QUERY_BUDGETS: ビュー名ごとの予算 {'admin_shift:shift_calendar': 20, ...}
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as DjangoBackendTemplate
+
+logger = logging.getLogger('shift_ai.performance')
+
+METRIC_FIELDS = ('queries', 'sql_ms', 'total_ms', 'template_ms')
+PERCENTILES = (50, 90, 95, 99)
+
+_current_sample = contextvars.ContextVar('perf_current_sample', default=None)
+
+
+def query_budget_for(view_name: str) -> Optional[int]:
+    """ビューのクエリ数予算"""
+    budgets = getattr(settings, 'PERF_QUERY_BUDGETS', {})
+    if view_name in budgets:
+        return budgets[view_name]
+    return getattr(settings, 'PERF_DEFAULT_QUERY_BUDGET', 50)
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """ソート済みの値のパーセンタイル（最近接順位法）"""
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, -(-len(sorted_values) * percent // 100) - 1))
+    return sorted_values[int(rank)]
+
+
+class MetricsRegistry:
+    """ビューごとの直近サンプル（プロセス内で保持）"""
+
+    def __init__(self, sample_size: int = 500):
+        self.sample_size = sample_size
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, view_name: str, sample: Dict[str, float]):
+        with self._lock:
+            if view_name not in self._samples:
+                self._samples[view_name] = deque(maxlen=self.sample_size)
+                self._counts[view_name] = 0
+            self._samples[view_name].append(sample)
+            self._counts[view_name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def summary(self) -> Dict[str, Dict]:
+        """ビューごとのパーセンタイル集計"""
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for view_name, samples in sorted(snapshot.items()):
+            stats = {'requests': counts[view_name], 'samples': len(samples), 'query_budget': query_budget_for(view_name)}
+            for field in METRIC_FIELDS:
+                values = sorted(sample[field] for sample in samples)
+                stats[field] = {f'p{p}': round(percentile(values, p), 2) for p in PERCENTILES}
+                stats[field]['max'] = round(values[-1], 2) if values else 0
+            result[view_name] = stats
+        return result
+
+
+registry = MetricsRegistry(getattr(settings, 'PERF_SAMPLE_SIZE', 500))
+
+
+class _QueryRecorder:
+    """connection.execute_wrapper 用のクエリ数・時間の記録"""
+
+    def __init__(self, sample):
+        self.sample = sample
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sample['queries'] += 1
+            self.sample['sql_ms'] += (time.perf_counter() - started) * 1000
+
+
+_original_template_render = DjangoBackendTemplate.render
+
+
+def _instrumented_template_render(self, context=None, request=None):
+    """テンプレート描画時間を計測中のリクエストに加算（インクルードは外側の描画に含まれる）"""
+    sample = _current_sample.get()
+    if sample is None or sample.get('_rendering'):
+        return _original_template_render(self, context, request)
+    sample['_rendering'] = True
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, context, request)
+    finally:
+        sample['template_ms'] += (time.perf_counter() - started) * 1000
+        sample['_rendering'] = False
+
+
+DjangoBackendTemplate.render = _instrumented_template_render
+
+
+def _add_execute_wrapper(recorder):
+    connections['default'].execute_wrappers.append(recorder)
+
+
+def _remove_execute_wrapper(recorder):
+    connections['default'].execute_wrappers.remove(recorder)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    ビューごとのクエリ数・処理時間を記録するミドルウェア（同期・非同期の両方に対応）
+    ストリーミングレスポンス（チャットの配信など）は本文の送信中に時間がかかるため記録しない
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_INSTRUMENTATION', settings.DEBUG)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        sample = {'queries': 0, 'sql_ms': 0.0, 'template_ms': 0.0}
+        token = _current_sample.set(sample)
+        started = time.perf_counter()
+        try:
+            with connections['default'].execute_wrapper(_QueryRecorder(sample)):
+                response = self.get_response(request)
+        finally:
+            _current_sample.reset(token)
+        return self._finish(request, response, sample, started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        sample = {'queries': 0, 'sql_ms': 0.0, 'template_ms': 0.0}
+        token = _current_sample.set(sample)
+        recorder = _QueryRecorder(sample)
+        started = time.perf_counter()
+        # 同期ビューのクエリはリクエストごとのスレッドで実行されるため、そのスレッドの接続に登録する
+        await sync_to_async(_add_execute_wrapper)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_execute_wrapper)(recorder)
+            _current_sample.reset(token)
+        return self._finish(request, response, sample, started)
+
+    def _finish(self, request, response, sample, started):
+        sample['total_ms'] = (time.perf_counter() - started) * 1000
+        sample.pop('_rendering', None)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None or response.streaming:
+            return response
+        view_name = match.view_name
+        registry.record(view_name, sample)
+
+        response['Server-Timing'] = (
+            f"sql;dur={sample['sql_ms']:.1f};desc=\"{sample['queries']} queries\", "
+            f"tpl;dur={sample['template_ms']:.1f}, total;dur={sample['total_ms']:.1f}"
+        )
+
+        budget = query_budget_for(view_name)
+        if budget is not None and sample['queries'] > budget:
+            logger.warning(
+                "Query budget exceeded: %s ran %d queries (budget %d) in %.1fms [%s]",
+                view_name, sample['queries'], budget, sample['total_ms'], request.path
+            )
+        return response
@@ -0,0 +1,102 @@
+"""
+主要な画面のクエリが索引を使っているかを EXPLAIN で確認する
+
+SQLite では EXPLAIN QUERY PLAN の "SCAN <テーブル>"（索引なしの全件走査）、
+PostgreSQL では "Seq Scan on <テーブル>" を対象テーブルについて検出する。
+PostgreSQL は件数が少ないと索引があっても全件走査を選ぶため、確認中は enable_seqscan を無効にして
+「索引で実行できるか」を判定する
+"""
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Callable, List, NamedTuple, Tuple
+from django.db import connection, transaction
+from django.db.models import Q
+
+
+class HotQuery(NamedTuple):
+    """確認対象のクエリ"""
+    name: str
+    tables: Tuple[str, ...]        # 全件走査してはいけないテーブル
+    build: Callable                # 引数なしでクエリセットを返す
+
+
+class PlanResult(NamedTuple):
+    name: str
+    ok: bool
+    full_scans: List[str]
+    plan: str
+
+
+def hot_queries() -> List[HotQuery]:
+    """画面で使っている代表的なクエリ（値は任意、実行計画のみ確認する）"""
+    from eval.models import AttendanceRecord
+    from shift.models import ChatMessage, DailyStoreStats, Shift, ShiftRequest
+
+    store_id, staff_id, room_id = 1, 1, 1
+    month_start = date(2026, 11, 1)
+    month_end = date(2026, 11, 30)
+    sent_before = datetime(2026, 11, 1, tzinfo=dt_timezone.utc)
+
+    return [
+        HotQuery('shift_store_month', ('shift_shift',), lambda: Shift.objects.filter(
+            store_id=store_id, date__range=[month_start, month_end]
+        )),
+        HotQuery('shift_store_month_with_carry_in', ('shift_shift',), lambda: Shift.objects.filter(
+            Q(date__range=[month_start, month_end])
+            | Q(date=month_start - timedelta(days=1))
+            | Q(date__lt=month_start, end_date__gte=month_start),
+            store_id=store_id
+        )),
+        HotQuery('shift_staff_month', ('shift_shift',), lambda: Shift.objects.filter(
+            staff_id=staff_id, date__range=[month_start, month_end]
+        )),
+        HotQuery('shiftrequest_staff_month', ('shift_shiftrequest',), lambda: ShiftRequest.objects.filter(
+            staff_id=staff_id, date__range=[month_start, month_end]
+        )),
+        HotQuery('shiftrequest_store_month', ('shift_shiftrequest', 'accounts_staff'),
+                 lambda: ShiftRequest.objects.filter(
+                     staff__store_id=store_id, date__range=[month_start, month_end]
+                 )),
+        HotQuery('attendance_staff_month', ('eval_attendancerecord',), lambda: AttendanceRecord.objects.filter(
+            staff_id=staff_id, date__range=[month_start, month_end]
+        )),
+        HotQuery('chatmessage_unread', ('shift_chatmessage',), lambda: ChatMessage.objects.filter(
+            room_id=room_id, is_read=False
+        ).exclude(sender_id=staff_id)),
+        HotQuery('chatmessage_history', ('shift_chatmessage',), lambda: ChatMessage.objects.filter(
+            Q(created_at__lt=sent_before) | Q(created_at=sent_before, id__lt=1), room_id=room_id
+        ).order_by('-created_at', '-id')[:51]),
+        HotQuery('daily_stats_store_month', ('shift_dailystorestats',), lambda: DailyStoreStats.objects.filter(
+            store_id=store_id, date__range=[month_start, month_end]
+        )),
+    ]
+
+
+def full_scans(plan: str, tables: Tuple[str, ...], vendor: str) -> List[str]:
+    """実行計画から対象テーブルの全件走査を抽出"""
+    if vendor == 'postgresql':
+        pattern = re.compile(r'Seq Scan on (\w+)')
+    else:
+        # "SCAN t USING (COVERING) INDEX" は索引全体の走査のため全件走査として扱う
+        pattern = re.compile(r'\bSCAN (\w+)')
+    return [table for table in pattern.findall(plan) if table in tables]
+
+
+def explain(queryset) -> str:
+    """クエリセットの実行計画（PostgreSQL では全件走査を抑止して取得）"""
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def check_query_plans(queries=None) -> List[PlanResult]:
+    """各クエリの実行計画を確認"""
+    results = []
+    for query in queries or hot_queries():
+        plan = explain(query.build())
+        scans = full_scans(plan, query.tables, connection.vendor)
+        results.append(PlanResult(query.name, not scans, scans, plan))
+    return results
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'shift_ai.instrumentation.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,10 +81,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # 並列生成（複数プロセスからの同時書き込み）でロック待ちせずに失敗しないようにする
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 
+# Cache
+# カレンダーの表示データは生成ワーカー等の別プロセスからの無効化も反映されるようファイルキャッシュに置く
+# （チェックアウトごとに分けるためプロジェクト内に置く。テストでは各テストクラスで LocMem に置き換える）
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'calendar': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(BASE_DIR / '.cache' / 'calendar'),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -187,5 +209,44 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'shift_ai.performance': {
+            'handlers': ['file'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
+
+# テスト実行時は django.log に書き込まない
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    LOGGING['handlers']['file'] = {'class': 'logging.NullHandler'}
+
+# シフト生成ソルバー設定
+# 'auto': OR-Toolsがあれば CP-SAT、なければ貪欲法 / 'cpsat' / 'greedy'
+SHIFT_SOLVER_BACKEND = 'auto'
+SHIFT_SOLVER_TIME_LIMIT = 10  # 秒
+
+# リクエスト計測（ビューごとのクエリ数・処理時間）
+# 集計結果は管理画面の /admin-panel/api/performance/ で確認できる
+PERF_INSTRUMENTATION = DEBUG
+PERF_SAMPLE_SIZE = 500
+PERF_DEFAULT_QUERY_BUDGET = 50  # これを超えるクエリを発行したビューは警告ログを出す
+PERF_QUERY_BUDGETS = {
+    'admin_shift:shift_calendar': 20,
+    'admin_shift:submission_status': 20,
+    'admin_shift:chat_list': 20,
+    'staff_shift:shift_swap_list': 20,
+    'staff_shift:shift_swap_list_api': 20,
+    'staff_shift:shift_swap_my_requests': 20,
+}
+
+# シフトカレンダーの表示データのキャッシュ（シフト・スタッフ・必要人数の変更で無効化）
+CALENDAR_CACHE_ALIAS = 'calendar'
+CALENDAR_CACHE_TIMEOUT = 60 * 60  # 秒
+
+# チャットのリアルタイム配信（ASGI で起動した場合のみ有効）
+# 複数プロセスで起動する場合は Redis（互換サーバー可）を指定する:
+# CHAT_CHANNEL_LAYER = {'BACKEND': 'shift.live.RedisChannelLayer', 'OPTIONS': {'url': 'redis://localhost:6379/0'}}
+CHAT_CHANNEL_LAYER = {'BACKEND': 'shift.live.InMemoryChannelLayer'}
+CHAT_STREAM_HEARTBEAT = 15  # 秒
+CHAT_STREAM_MAX_SECONDS = 5 * 60  # 秒（以降はブラウザが自動で再接続する）
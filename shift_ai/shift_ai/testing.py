@@ -0,0 +1,92 @@
+"""
+テスト用ヘルパー：URLごとのクエリ数予算の検証
+
+使用例（tests.py）:
+    from django.test import TestCase
+    from shift_ai.testing import QueryBudgetMixin
+
+    class AdminShiftQueryBudgetTests(QueryBudgetMixin, TestCase):
+        def test_admin_pages(self):
+            self.client.force_login(self.manager.user)
+            self.assertQueryBudgets(
+                prefixes=['admin_shift', 'admin_accounts', 'admin_eval'],
+                url_kwargs={'admin_shift:shift_detail': {'shift_id': self.shift.id}},
+            )
+
+予算は settings.PERF_QUERY_BUDGETS / PERF_DEFAULT_QUERY_BUDGET と共通
+"""
+from importlib import import_module
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, URLPattern, reverse
+from shift_ai.instrumentation import query_budget_for
+
+# 予算を検証するURL設定モジュール
+BUDGET_URLCONFS = [
+    'shift.admin_urls',
+    'shift.staff_urls',
+    'accounts.admin_urls',
+    'accounts.staff_urls',
+    'eval.admin_urls',
+    'eval.staff_urls',
+]
+
+
+def iter_budget_urls(url_kwargs: Optional[Dict[str, dict]] = None,
+                     prefixes: Optional[Iterable[str]] = None) -> Iterable[Tuple[str, Optional[str]]]:
+    """
+    検証対象の (ビュー名, URL) を順に返す
+    引数が必要なURLで url_kwargs に指定がないものは URL を None として返す
+    """
+    url_kwargs = url_kwargs or {}
+    prefixes = set(prefixes) if prefixes else None
+    for module_name in BUDGET_URLCONFS:
+        module = import_module(module_name)
+        namespace = module.app_name
+        if prefixes and namespace not in prefixes:
+            continue
+        for pattern in module.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            view_name = f'{namespace}:{pattern.name}'
+            try:
+                url = reverse(view_name, kwargs=url_kwargs.get(view_name))
+            except NoReverseMatch:
+                url = None
+            yield view_name, url
+
+
+def measure_url_queries(client, url: str) -> Tuple[int, int]:
+    """URLにGETしたときの (ステータスコード, クエリ数)"""
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(url)
+    return response.status_code, len(captured.captured_queries)
+
+
+def check_query_budgets(client, url_kwargs: Optional[Dict[str, dict]] = None,
+                        prefixes: Optional[Iterable[str]] = None,
+                        skip: Iterable[str] = ()) -> List[str]:
+    """
+    各URLのクエリ数を予算と比較し、超過したものの説明を返す
+    （引数が不足して URL を組み立てられないビューとスキップ指定のビューは対象外）
+    """
+    violations = []
+    skip = set(skip)
+    for view_name, url in iter_budget_urls(url_kwargs, prefixes):
+        if url is None or view_name in skip:
+            continue
+        status_code, queries = measure_url_queries(client, url)
+        budget = query_budget_for(view_name)
+        if budget is not None and queries > budget:
+            violations.append(f'{view_name} ({url}): {queries} queries > budget {budget} [status {status_code}]')
+    return violations
+
+
+class QueryBudgetMixin:
+    """TestCase に assertQueryBudgets を追加する"""
+
+    def assertQueryBudgets(self, url_kwargs=None, prefixes=None, skip=(), client=None):
+        violations = check_query_budgets(client or self.client, url_kwargs, prefixes, skip)
+        if violations:
+            self.fail('クエリ数の予算を超過したURLがあります:\n' + '\n'.join(violations))